@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -10,6 +10,10 @@ import re
 import subprocess
 import json
 import sys
+import orjson
+import time
+import socket
+import metrics
 
 app = Flask(__name__)
 
@@ -139,20 +143,113 @@ def login():
         print(f"Error: {e}")
         return jsonify({'message': 'Login failed'}), 500
 
+def is_profiling_admin(req):
+    token = os.environ.get('PROFILING_ADMIN_TOKEN')
+    return bool(token) and req.headers.get('X-Profiling-Token') == token
+
+AGENT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'teamX_v2', 'main.py'))
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
 # Helper to invoke main.py in API mode
-def query_python_agent(query, role, region):
-    agent_path = os.path.abspath(os.path.join(
-        os.path.dirname(__file__),
-        '..', 'teamX_v2', 'main.py'
-    ))
-    payload = json.dumps({'query': query, 'user_role': role, 'user_region': region})
+def query_python_agent(query, role, region, user_id=None, profile=False, page_token=None):
+    start_time = time.time()
+    metrics.agent_started()
+    agent_resp = _run_python_agent(query, role, region, user_id, profile, page_token)
+    outcome = 'timeout' if 'TimeoutExpired' in str(agent_resp.get('error', '')) else 'error' if agent_resp.get('error') else 'ok'
+    metrics.agent_finished(outcome, time.time() - start_time)
+    return agent_resp
+
+def _run_via_fork_server(agent_socket, payload):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(30)
+        sock.connect(agent_socket)
+        sock.sendall(payload.encode())
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return orjson.loads(b"".join(chunks))
+
+def _stream_python_agent(payload):
+    """Yield the agent's raw output for a streaming (export) payload, chunk by chunk."""
+    agent_socket = os.environ.get('AGENT_SOCKET')
+    if agent_socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(30)
+            sock.connect(agent_socket)
+            sock.sendall(payload.encode())
+            sock.shutdown(socket.SHUT_WR)
+        except OSError as e:
+            sock.close()
+            print(f"Fork server unavailable, falling back to subprocess: {e}")
+        else:
+            def from_socket():
+                with sock:
+                    while True:
+                        chunk = sock.recv(65536)
+                        if not chunk:
+                            break
+                        yield chunk
+            return from_socket()
+
+    proc = subprocess.Popen(
+        [sys.executable, AGENT_PATH, '--api-mode'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(AGENT_PATH)
+    )
+    proc.stdin.write(payload.encode())
+    proc.stdin.close()
+
+    def from_process():
+        try:
+            while True:
+                chunk = proc.stdout.read(65536)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+    return from_process()
+
+def _run_python_agent(query, role, region, user_id, profile=False, page_token=None):
+    payload = json.dumps({'query': query, 'user_role': role, 'user_region': region, 'user_id': user_id,
+                          'profile': profile, 'page_token': page_token})
+    # Prefer the preforked workers (main.py --fork-server) when one is configured
+    agent_socket = os.environ.get('AGENT_SOCKET')
+    if agent_socket:
+        try:
+            return _run_via_fork_server(agent_socket, payload)
+        except socket.timeout as e:
+            return {
+                'summary': 'Agent timeout occurred.',
+                'accessDenied': False,
+                'documentUrl': None,
+                'charts': [],
+                'prediction_results': '',
+                'error': f'TimeoutExpired: {e}'
+            }
+        except (OSError, ValueError) as e:
+            print(f"Fork server unavailable, falling back to subprocess: {e}")
     try:
         result = subprocess.run(
-            [sys.executable, agent_path, '--api-mode'],
+            [sys.executable, AGENT_PATH, '--api-mode'],
             input=payload,
             text=True,
             capture_output=True,
-            cwd=os.path.dirname(agent_path),
+            cwd=os.path.dirname(AGENT_PATH),
             timeout=30  # kill if no response in 30s
         )
     except subprocess.TimeoutExpired as e:
@@ -183,7 +280,7 @@ def query_python_agent(query, role, region):
             'error': result.stderr.strip()
         }
     try:
-        return json.loads(result.stdout)
+        return orjson.loads(result.stdout)
     except Exception as e:
         return {
             'summary': 'Invalid response from agent.',
@@ -206,8 +303,10 @@ def process_query():
             return jsonify({'message': 'Missing request body'}), 400
             
         query = data.get('query', '')
+        # Continuation token from an earlier response's nextPageToken
+        page_token = data.get('pageToken')
         
-        if not query:
+        if not query and not page_token:
             return jsonify({'message': 'Query is required'}), 400
         
         # For development, allow queries without authentication
@@ -231,10 +330,11 @@ def process_query():
                     region = user['region']
                     
                     # Save query to history for authenticated users
-                    cur.execute(
-                        'INSERT INTO query_history (user_id, query) VALUES (%s, %s)',
-                        (user_id, query)
-                    )
+                    if query:
+                        cur.execute(
+                            'INSERT INTO query_history (user_id, query) VALUES (%s, %s)',
+                            (user_id, query)
+                        )
                 conn.close()
             except Exception as e:
                 print(f"Database error: {e}")
@@ -242,27 +342,49 @@ def process_query():
                 role = "Global" 
                 region = "Global"
         
+        if page_token:
+            agent_resp = query_python_agent('', role, region, user_id, page_token=page_token)
+            return app.response_class(orjson.dumps({
+                'sqlResults':    agent_resp.get('sql_results'),
+                'offset':        agent_resp.get('offset'),
+                'nextPageToken': agent_resp.get('next_page_token'),
+                'error':         agent_resp.get('error'),
+            }), status=400 if agent_resp.get('error') else 200, mimetype='application/json')
+
+        # Per-request profiling is only honoured with the admin token
+        profile = bool(data.get('profile')) and is_profiling_admin(request)
+
         # invoke Python agent instead of local access control
-        agent_resp = query_python_agent(query, role, region)
-        print(f"Agent response: {agent_resp}")
+        agent_resp = query_python_agent(query, role, region, user_id, profile)
+        print(f"Agent response: status={agent_resp.get('status')} accessDenied={agent_resp.get('accessDenied', False)}")
         response_payload = {
             'answer':            agent_resp.get('summary', ''),
             'accessDenied':      agent_resp.get('accessDenied', False),
             'documentUrl':       agent_resp.get('documentUrl'),
             'charts':            agent_resp.get('charts', []),
             'predictionResults': agent_resp.get('prediction_results', ''),
+            'predictionVersion': agent_resp.get('prediction_version'),
             'proactiveSuggestions': agent_resp.get('proactive_suggestions', []),
             'leaderboardPosition': agent_resp.get('leaderboard_position'),
             'complianceScore': agent_resp.get('compliance_score'),
             'accessAttemptLogged': agent_resp.get('audit_log', ''),
+            # First page of SQL rows only; further pages via {"pageToken": nextPageToken}
+            'sqlResults': agent_resp.get('sql_results'),
+            'truncated': agent_resp.get('truncated', False),
+            'nextPageToken': agent_resp.get('next_page_token'),
+            'planCache': agent_resp.get('plan_cache'),
+            # Set when the answer came from a materialized rollup: source, data_through, refreshed_at, age_seconds
+            'freshness': agent_resp.get('freshness'),
             'debug': {
                 'role':       role,
                 'region':     region,
                 'fromAgent':  True,
-                'agentError': agent_resp.get('error')    # include agent stderr or parse error
+                'agentError': agent_resp.get('error'),    # include agent stderr or parse error
+                'profile':    agent_resp.get('profile')
             }
         }
-        return jsonify(response_payload), 200
+        # orjson avoids a second slow encode of large agent payloads
+        return app.response_class(orjson.dumps(response_payload), status=200, mimetype='application/json')
         
     except Exception as e:
         print(f"Error processing query: {str(e)}")
@@ -271,6 +393,39 @@ def process_query():
             'error': str(e)
         }), 500
 
+@app.route('/api/export', methods=['POST'])
+def export_results():
+    """Stream a full SQL result as CSV or Parquet, addressed by a nextPageToken."""
+    data = request.get_json() or {}
+    token = data.get('token')
+    fmt = data.get('format', 'csv')
+    if not token:
+        return jsonify({'message': 'token is required'}), 400
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'message': f'Unsupported format: {fmt}'}), 400
+
+    # Same development defaults as /api/query
+    role, region = "planning_manager", "all"
+    payload = json.dumps({'export_token': token, 'format': fmt, 'user_role': role, 'user_region': region})
+    try:
+        chunks = _stream_python_agent(payload)
+        first = next(chunks, b'')
+    except Exception as e:
+        return jsonify({'message': f'Export failed: {str(e)}', 'error': str(e)}), 500
+    # The agent answers with a JSON error instead of data when the token is rejected
+    if first.startswith(b'{'):
+        body = first + b''.join(chunks)
+        return app.response_class(body, status=400, mimetype='application/json')
+
+    def generate():
+        yield first
+        yield from chunks
+    return app.response_class(
+        stream_with_context(generate()),
+        mimetype=EXPORT_MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename=results.{fmt}'}
+    )
+
 @app.route('/api/history', methods=['GET'])
 @jwt_required()
 def get_query_history():
@@ -291,6 +446,15 @@ def get_query_history():
         print(f"Error: {e}")
         return jsonify({'message': 'Failed to fetch history'}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus scrape target: backend and agent-worker metrics aggregated in Redis
+    try:
+        return app.response_class(metrics.render(), status=200, mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        print(f"Error rendering metrics: {e}")
+        return jsonify({'message': 'Metrics unavailable'}), 503
+
 # Debugging route to test API connection
 @app.route('/test', methods=['GET'])
 def test_route():
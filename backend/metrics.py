@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import socket
+import redis
+
+# Shared with teamX_v2/utils/metrics.py: agent processes flush their metrics to
+# these Redis hashes, the backend adds its own, and /metrics renders the sum.
+#   metrics:registry   name -> {"type", "help", "buckets"}
+#   metrics:c:<name>   <labels> -> counter value
+#   metrics:h:<name>   <labels>|le=<bucket> / |sum / |count -> cumulative values
+#   metrics:g:<name>   <labels>|<worker> -> gauge value (summed over workers)
+#   metrics:workers    <worker> -> heartbeat deadline of agent workers; the gauges
+#                      of workers past it (killed, timed out) are dropped on render
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_client = redis.Redis(
+    host=os.environ.get('REDIS_HOST', 'localhost'),
+    port=int(os.environ.get('REDIS_PORT', 6379)),
+    decode_responses=True,
+    socket_timeout=0.5,
+)
+
+_BACKEND_METRICS = {
+    "backend_request_latency_seconds": {"type": "histogram", "help": "/api/query latency by outcome", "buckets": list(LATENCY_BUCKETS)},
+    "backend_agent_runs_total": {"type": "counter", "help": "Agent subprocess runs by outcome"},
+    "backend_agent_workers_busy": {"type": "gauge", "help": "Agent subprocesses currently running"},
+}
+_registered = False
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+def _safe(fn):
+    # Metrics must never fail a request
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except redis.RedisError as e:
+            print(f"Metrics error: {e}")
+    return wrapper
+
+
+def _register(pipe):
+    if not _registered:
+        pipe.hset("metrics:registry", mapping={name: json.dumps(desc) for name, desc in _BACKEND_METRICS.items()})
+
+
+def _execute(pipe):
+    # Registered only once a pipeline carrying the registration has gone through
+    global _registered
+    pipe.execute()
+    _registered = True
+
+
+@_safe
+def agent_started():
+    pipe = _client.pipeline(transaction=False)
+    _register(pipe)
+    pipe.hincrbyfloat("metrics:g:backend_agent_workers_busy", f"|{WORKER_ID}", 1)
+    _execute(pipe)
+
+
+@_safe
+def agent_finished(outcome, latency_seconds):
+    pipe = _client.pipeline(transaction=False)
+    _register(pipe)
+    pipe.hincrbyfloat("metrics:g:backend_agent_workers_busy", f"|{WORKER_ID}", -1)
+    pipe.hincrbyfloat("metrics:c:backend_agent_runs_total", _labels(outcome=outcome), 1)
+    key = _labels(outcome=outcome)
+    for bound in LATENCY_BUCKETS:
+        if latency_seconds <= bound:
+            pipe.hincrbyfloat("metrics:h:backend_request_latency_seconds", f"{key}|le={bound}", 1)
+    pipe.hincrbyfloat("metrics:h:backend_request_latency_seconds", f"{key}|le=+Inf", 1)
+    pipe.hincrbyfloat("metrics:h:backend_request_latency_seconds", f"{key}|sum", latency_seconds)
+    pipe.hincrbyfloat("metrics:h:backend_request_latency_seconds", f"{key}|count", 1)
+    _execute(pipe)
+
+
+def _with_label(labels, extra):
+    return f"{{{labels},{extra}}}" if labels else f"{{{extra}}}"
+
+
+def render():
+    """Render every registered metric in the Prometheus text exposition format."""
+    registry = _client.hgetall("metrics:registry")
+    names = sorted(registry)
+    pipe = _client.pipeline(transaction=False)
+    for name in names:
+        kind = json.loads(registry[name])["type"]
+        pipe.hgetall(f"metrics:{kind[0]}:{name}")
+    pipe.zrangebyscore("metrics:workers", "-inf", time.time())
+    *values, expired = pipe.execute()
+    expired = set(expired)
+    cleanup = _client.pipeline(transaction=False)
+
+    lines = []
+    for name, fields in zip(names, values):
+        desc = json.loads(registry[name])
+        lines.append(f"# HELP {name} {desc['help']}")
+        lines.append(f"# TYPE {name} {desc['type']}")
+        if desc["type"] == "counter":
+            for labels, value in sorted(fields.items()):
+                lines.append(f"{name}{{{labels}}} {float(value)}" if labels else f"{name} {float(value)}")
+        elif desc["type"] == "gauge":
+            totals = {}
+            for field, value in fields.items():
+                labels, worker = field.rsplit("|", 1)
+                if worker in expired:
+                    cleanup.hdel(f"metrics:g:{name}", field)
+                    continue
+                totals[labels] = totals.get(labels, 0.0) + float(value)
+            for labels, value in sorted(totals.items()):
+                lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+        else:
+            series = {}
+            for field, value in fields.items():
+                labels, part = field.rsplit("|", 1)
+                series.setdefault(labels, {})[part] = float(value)
+            bounds = [str(b) for b in desc.get("buckets", [])] + ["+Inf"]
+            for labels, parts in sorted(series.items()):
+                for bound in bounds:
+                    le = 'le="' + bound + '"'
+                    lines.append(f"{name}_bucket{_with_label(labels, le)} {parts.get('le=' + bound, 0.0)}")
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {parts.get('sum', 0.0)}")
+                lines.append(f"{name}_count{suffix} {parts.get('count', 0.0)}")
+    if expired:
+        cleanup.zrem("metrics:workers", *expired)
+        cleanup.execute()
+    return "\n".join(lines) + "\n"
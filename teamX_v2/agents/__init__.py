@@ -1,21 +1,27 @@
-from .base_agent import BaseAgent
-from .query_classifier_agent import QueryClassifierAgent
-from .document_retrieval_agent import DocumentRetrievalAgent
-from .sql_agent import SQLAgent
-from .web_search_agent import WebSearchAgent
-from .predictive_agent import PredictiveAgent
-from .explanation_agent import ExplanationAgent
-from .learning_module_agent import LearningModuleAgent
-from .master_agent import MasterAgent
+import importlib
 
-__all__ = [
-    "BaseAgent",
-    "QueryClassifierAgent",
-    "DocumentRetrievalAgent",
-    "SQLAgent",
-    "WebSearchAgent",
-    "PredictiveAgent",
-    "ExplanationAgent",
-    "LearningModuleAgent",
-    "MasterAgent",
-]
\ No newline at end of file
+# Agents are imported on first attribute access, so importing the package does
+# not pull in torch, transformers, sentence_transformers or pandas.
+_EXPORTS = {
+    "BaseAgent": ".base_agent",
+    "AgentResources": ".resources",
+    "QueryClassifierAgent": ".query_classifier_agent",
+    "DocumentRetrievalAgent": ".document_retrieval_agent",
+    "SQLAgent": ".sql_agent",
+    "WebSearchAgent": ".web_search_agent",
+    "PredictiveAgent": ".predictive_agent",
+    "ExplanationAgent": ".explanation_agent",
+    "LearningModuleAgent": ".learning_module_agent",
+    "MasterAgent": ".master_agent",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
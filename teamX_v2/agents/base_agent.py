@@ -1,41 +1,66 @@
 
 import json
+import time
 import aiohttp
 import asyncio
 import logging
-from cachetools import TTLCache
-import hashlib
+from contextlib import asynccontextmanager
+from utils.tracing import span
+from utils.memory_cache import get_cache
+from utils.cache_keys import content_key
+from utils.metrics import record_cache, LLM_CALLS, LLM_TOKENS, LLM_RATE_LIMITED
+from .speculation import record_llm_usage, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
 class BaseAgent:
-    def __init__(self, api_key: str, url: str, serper_api_key: str, redis_client=None):
+    def __init__(self, api_key: str, url: str, serper_api_key: str, redis_client=None, resources=None):
         self.api_key = api_key
         self.url = url
         self.serper_api_key = serper_api_key
-        self.redis_client = redis_client
-        self.llm_cache = TTLCache(maxsize=1000, ttl=7200)
+        self.resources = resources
+        self.redis_client = redis_client if redis_client is not None else getattr(resources, "redis_client", None)
+        # Shared by all agents; keys include the prompt hash and model
+        self.llm_cache = get_cache("llm")
+
+    @asynccontextmanager
+    async def http_session(self):
+        """The shared HTTP session when built with resources, else a per-call session."""
+        if self.resources is not None:
+            yield await self.resources.http_session()
+        else:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+                yield session
 
     async def call_llm(self, prompt: str, model_id: str = "claude-3-haiku") -> dict:
         """
         Call the LLM with the specified prompt and model.
         Uses Claude 3 Haiku by default for efficiency.
         """
-        prompt_hash = hashlib.md5(prompt.encode()).hexdigest()
-        cache_key = f"llm:{prompt_hash}:{model_id}"
-        
-        # Check Redis cache first
-        if self.redis_client:
-            cached_result = await self.redis_client.get(cache_key)
-            if cached_result:
-                logger.info("LLM Redis cache hit")
-                return json.loads(cached_result)
-
-        # Check in-memory cache as fallback
-        if cache_key in self.llm_cache:
-            logger.info("LLM in-memory cache hit")
-            return self.llm_cache[cache_key]
+        with span("call_llm", agent=type(self).__name__, model=model_id):
+            cache_key = content_key("llm", model_id, prompt)
+
+            # Check Redis cache first
+            if self.redis_client:
+                cached_result = await self.redis_client.get(cache_key)
+                record_cache("llm_redis", bool(cached_result))
+                if cached_result:
+                    logger.info("LLM Redis cache hit")
+                    return json.loads(cached_result)
+
+            # Check in-memory cache as fallback
+            hit = cache_key in self.llm_cache
+            record_cache("llm_memory", hit)
+            if hit:
+                logger.info("LLM in-memory cache hit")
+                return self.llm_cache[cache_key]
 
+            result = await self._request_llm(prompt, model_id, cache_key, time.perf_counter())
+            outcome = "error" if isinstance(result, dict) and "error" in result else "ok"
+            LLM_CALLS.inc(agent=type(self).__name__, model=model_id, outcome=outcome)
+            return result
+
+    async def _request_llm(self, prompt: str, model_id: str, cache_key: str, start: float) -> dict:
         # Construct payload matching the API's expected format
         payload = {
             "api_key": self.api_key,
@@ -53,16 +78,18 @@ class BaseAgent:
         max_retries = 3
         retry_delay = 1
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+        async with self.http_session() as session:
             for retry in range(max_retries):
                 try:
                     async with session.post(self.url, headers=headers, json=payload) as response:
                         response_text = await response.text()
+                        if response.status == 429:
+                            LLM_RATE_LIMITED.inc(model=model_id)
                         if response.status != 200:
                             logger.error(f"API request failed with status {response.status}: {response_text}")
                             return {"error": f"Bad request: {response_text}"}
                         result = json.loads(response_text)
-                        logger.info(f"Raw API response: {result}")
+                        logger.info("Raw API response: %s", result, extra={"sampled": True})
 
                         # Parse the response according to the API's format
                         if "response" not in result or "content" not in result["response"]:
@@ -74,14 +101,22 @@ class BaseAgent:
                             logger.error(f"Empty response from LLM with model {model_id}")
                             return {"error": "Empty response from LLM."}
 
+                        usage = result["response"].get("usage") or {}
+                        prompt_tokens = usage.get("input_tokens", estimate_tokens(prompt))
+                        completion_tokens = usage.get("output_tokens", estimate_tokens(full_response))
+                        record_llm_usage(prompt_tokens, completion_tokens)
+                        LLM_TOKENS.inc(prompt_tokens, model=model_id, kind="prompt")
+                        LLM_TOKENS.inc(completion_tokens, model=model_id, kind="completion")
+
                         # Cache the result
                         if self.redis_client:
                             await self.redis_client.setex(cache_key, 7200, json.dumps(full_response))
-                        self.llm_cache[cache_key] = full_response
+                        self.llm_cache.set(cache_key, full_response, time.perf_counter() - start)
                         return full_response
 
                 except aiohttp.ClientResponseError as http_err:
                     if http_err.status == 429:
+                        LLM_RATE_LIMITED.inc(model=model_id)
                         logger.warning(f"Rate limit hit with {model_id}, retrying in {retry_delay} seconds...")
                         await asyncio.sleep(retry_delay)
                         retry_delay *= 2
@@ -1,35 +1,52 @@
 import time
 import logging
 from typing import Dict, List, Optional, Any
-from functools import lru_cache
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
-from sentence_transformers import SentenceTransformer, util
-from cachetools import TTLCache
 from config.settings import USER_ROLES, ROLE_HIERARCHY
+from utils.tracing import traced
+from utils.metrics import record_cache
+from utils.memory_cache import get_cache
+from utils.cache_keys import content_key
 from .base_agent import BaseAgent
 
 logger = logging.getLogger(__name__)
 
 class DocumentRetrievalAgent(BaseAgent):
-    def __init__(self, engine, embedding_model: SentenceTransformer, api_key: str, url: str, serper_api_key: str):
-        super().__init__(api_key, url, serper_api_key)
-        self.engine = engine
-        self.embedding_model = embedding_model
-        self.retrieval_cache = TTLCache(maxsize=5000, ttl=7200)
+    def __init__(self, resources, api_key: str, url: str, serper_api_key: str):
+        super().__init__(api_key, url, serper_api_key, resources=resources)
+        self.retrieval_cache = get_cache("retrieval")
+        self.embedding_cache = get_cache("embedding")
 
-    @lru_cache(maxsize=2000)
+    @property
+    def engine(self):
+        return self.resources.engine
+
+    @property
+    def embedding_model(self):
+        return self.resources.embedding_model
+
+    @traced("embed")
     async def embed_query(self, query: str) -> Optional[List[float]]:
+        hit = query in self.embedding_cache
+        record_cache("embedding", hit)
+        if hit:
+            return self.embedding_cache[query]
         try:
             start_time = time.time()
-            embedding = self.embedding_model.encode(query, batch_size=32).tolist()
+            # Encode on the governor's embedding executor so retrieval can overlap with intent classification
+            embedding = (await self.resources.governor.run(
+                "embedding", lambda: self.embedding_model.encode(query, batch_size=32)
+            )).tolist()
             end_time = time.time()
             logger.info(f"Embedding latency: {(end_time - start_time) * 1000:.2f} ms")
+            self.embedding_cache.set(query, embedding, end_time - start_time)
             return embedding
         except Exception as e:
             logger.error(f"Error in embedding query: {str(e)}")
             return None
 
+    @traced("retrieve")
     async def retrieve_documents(
         self,
         query: str,
@@ -38,8 +55,11 @@ class DocumentRetrievalAgent(BaseAgent):
         min_similarity: float = 0.2,
         user_role: str = "supply_chain_manager"
     ) -> List[Dict[str, Any]]:
-        cache_key = (query, frozenset(filters.items()) if filters else None)
-        if cache_key in self.retrieval_cache:
+        # Results are filtered by role, so the role is part of the key
+        cache_key = content_key("retrieval", query, filters, top_k, min_similarity, user_role)
+        hit = cache_key in self.retrieval_cache
+        record_cache("retrieval", hit)
+        if hit:
             logger.info("Retrieval cache hit")
             return self.retrieval_cache[cache_key]
 
@@ -114,7 +134,7 @@ class DocumentRetrievalAgent(BaseAgent):
 
         end_time = time.time()
         logger.info(f"Total retrieval latency: {(end_time - start_time) * 1000:.2f} ms")
-        self.retrieval_cache[cache_key] = results
+        self.retrieval_cache.set(cache_key, results, end_time - start_time)
         return results
 
     async def summarize_documents(self, documents: List[Dict[str, Any]], query: str) -> str:
@@ -0,0 +1,163 @@
+import re
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from config.settings import FEW_SHOT
+from .speculation import estimate_tokens
+from .sql_plan_cache import is_read_only_select
+
+logger = logging.getLogger(__name__)
+
+_EXAMPLE = re.compile(r"Question:\s*(.+?)\s*\nSQL:\s*(.+?)(?=\n\s*\n|\s*\Z)", re.DOTALL)
+_TABLE_LINE = re.compile(r"^-\s*(\w+):")
+_INDEX_LINE = re.compile(r"^-\s*(CREATE\s+INDEX\s+\w+\s+ON\s+(\w+).*)$", re.MULTILINE | re.IGNORECASE)
+_SQL_TABLE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?![\w.])", re.IGNORECASE)
+
+
+def parse_examples(text: str) -> List[Dict[str, str]]:
+    """Question/SQL pairs from the few_shot_examples prompt block."""
+    return [{"question": q.strip(), "sql": " ".join(sql.split())} for q, sql in _EXAMPLE.findall(text)]
+
+
+def parse_schema(text: str) -> Dict[str, Dict[str, Any]]:
+    """Per-table description line and index statements from the schema prompt block."""
+    tables = {}
+    for line in text.splitlines():
+        match = _TABLE_LINE.match(line.strip())
+        if match:
+            tables[match.group(1)] = {"line": line.strip(), "indexes": []}
+    for statement, table in _INDEX_LINE.findall(text):
+        if table in tables:
+            tables[table]["indexes"].append(f"- {statement.strip()}")
+    return tables
+
+
+def render_schema(tables: Dict[str, Dict[str, Any]], names: Sequence[str]) -> str:
+    lines = ["Tables:"] + [tables[name]["line"] for name in names]
+    indexes = [index for name in names for index in tables[name]["indexes"]]
+    if indexes:
+        lines += ["", "Indexes:"] + indexes
+    return "\n".join(lines) + "\n"
+
+
+class FewShotExample:
+    __slots__ = ("question", "sql", "tables", "verified")
+
+    def __init__(self, question: str, sql: str, tables: List[str], verified: bool = False):
+        self.question = question
+        self.sql = sql
+        self.tables = tables
+        self.verified = verified
+
+
+class ExampleStore:
+    """
+    Few-shot NL-to-SQL examples, selected per question instead of sending all of
+    them. The caller scores examples against the question (cosine similarity of
+    MiniLM embeddings, in example order); select() keeps the k best and renders
+    only the schema tables those examples and the question touch. Verified
+    question/SQL pairs from production are appended to a Redis list and join the
+    pool in every worker, re-read every FEW_SHOT["refresh_interval"] seconds.
+    """
+    def __init__(self, examples_text: str, schema_text: str, redis_client=None, k: int = FEW_SHOT["k"]):
+        self.redis_client = redis_client
+        self.k = k
+        self.full_prompt_tokens = estimate_tokens(examples_text) + estimate_tokens(schema_text)
+        self.tables = parse_schema(schema_text)
+        self.schema_text = schema_text
+        self.examples = [FewShotExample(e["question"], e["sql"], self.tables_in(e["sql"]))
+                         for e in parse_examples(examples_text)]
+        self.base_count = len(self.examples)
+        self._verified_loaded = 0.0
+
+    @property
+    def questions(self) -> List[str]:
+        return [e.question for e in self.examples]
+
+    @property
+    def base_questions(self) -> List[str]:
+        return self.questions[:self.base_count]
+
+    @staticmethod
+    def tables_in(sql: str) -> List[str]:
+        return sorted({t.lower() for t in _SQL_TABLE.findall(sql)})
+
+    @staticmethod
+    def tables_named_in(question: str, tables: Sequence[str]) -> List[str]:
+        words = set(re.findall(r"\w+", question.lower()))
+        return sorted(t for t in tables if t in words or t.rstrip("s") in words)
+
+    async def load_verified(self):
+        """Re-read the verified pairs (added by any process) once refresh_interval has passed."""
+        if not self.redis_client or time.monotonic() - self._verified_loaded < FEW_SHOT["refresh_interval"]:
+            return
+        try:
+            entries = [json.loads(raw) for raw in await self.redis_client.lrange(FEW_SHOT["redis_key"], 0, -1)]
+        except Exception as e:
+            logger.warning(f"Failed to load verified examples: {str(e)}")
+            return
+        # The Redis list is the source of truth: it is trimmed to max_verified
+        del self.examples[self.base_count:]
+        for entry in entries:
+            self._append(entry["question"], entry["sql"])
+        self._verified_loaded = time.monotonic()
+
+    def _append(self, question: str, sql: str) -> bool:
+        if question in self.questions:
+            return False
+        self.examples.append(FewShotExample(question, " ".join(sql.split()), self.tables_in(sql), verified=True))
+        return True
+
+    async def add_verified(self, question: str, sql: str) -> Dict[str, Any]:
+        if not is_read_only_select(sql):
+            return {"error": "Only single SELECT statements can be added as examples."}
+        await self.load_verified()
+        if not self._append(question.strip(), sql):
+            return {"error": "An example with this question already exists."}
+        if self.redis_client:
+            try:
+                await self.redis_client.rpush(FEW_SHOT["redis_key"], json.dumps({"question": question.strip(), "sql": sql}))
+                await self.redis_client.ltrim(FEW_SHOT["redis_key"], -FEW_SHOT["max_verified"], -1)
+            except Exception as e:
+                logger.warning(f"Failed to persist verified example: {str(e)}")
+        return {"status": "added", "examples": len(self.examples)}
+
+    def select(self, question: str, scores: Optional[np.ndarray] = None, k: Optional[int] = None,
+               tables: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Prompt context for one question: the k best-scoring examples and the
+        schema of the tables they use. Without scores (embedding model still
+        loading) examples are ranked by word overlap with the question. tables
+        (e.g. a role-filtered catalog) replaces the static schema; examples that
+        query tables outside it are ranked last.
+        """
+        k = k or self.k
+        if scores is None:
+            words = set(re.findall(r"\w+", question.lower()))
+            scores = np.array([len(words & set(re.findall(r"\w+", q.lower()))) for q in self.questions], dtype=np.float32)
+        scores = np.asarray(scores, dtype=np.float32)
+        if tables is None:
+            tables = self.tables
+        else:
+            outside = [bool(set(e.tables) - set(tables)) for e in self.examples]
+            scores = np.where(outside, scores - 1e6, scores)
+        chosen = [self.examples[i] for i in np.argsort(-scores, kind="stable")[:k]]
+
+        names = set(self.tables_named_in(question, tables))
+        for example in chosen:
+            names.update(example.tables)
+        # Keep the schema's own table order
+        names = [t for t in tables if t in names]
+        if names:
+            schema = render_schema(tables, names)
+        else:
+            schema = self.schema_text if tables is self.tables else render_schema(tables, list(tables))
+        examples = "\n".join(f"Example {i}:\nQuestion: {e.question}\nSQL: {e.sql}\n" for i, e in enumerate(chosen, start=1))
+        return {
+            "examples": examples,
+            "schema": schema,
+            "tables": names,
+            "prompt_tokens": {"before": self.full_prompt_tokens, "after": estimate_tokens(examples) + estimate_tokens(schema)},
+        }
@@ -1,35 +1,42 @@
+import time
 import logging
-from typing import List, Dict, Optional, Any
-from cachetools import TTLCache
+from typing import List, Dict, Optional, Any, Union
+from utils.result_set import ResultSet
+from utils.tracing import traced
+from utils.metrics import record_cache
+from utils.memory_cache import get_cache
+from utils.cache_keys import content_key
 from .base_agent import BaseAgent
-from .predictive_agent import PredictiveAgent
 
 logger = logging.getLogger(__name__)
 
 class ExplanationAgent(BaseAgent):
-    def __init__(self, api_key: str, url: str, serper_api_key: str, engine):
-        super().__init__(api_key, url, serper_api_key)
-        self.explanation_cache = TTLCache(maxsize=1000, ttl=7200)
-        self.predictive_agent = PredictiveAgent(engine)
+    def __init__(self, api_key: str, url: str, serper_api_key: str, resources=None):
+        super().__init__(api_key, url, serper_api_key, resources=resources)
+        self.explanation_cache = get_cache("explanation")
 
+    @traced("explanation")
     async def explain_sql_results(
         self,
         sql_query: str,
-        sql_results: List[Dict[str, Any]],
+        sql_results: Union[ResultSet, List[Dict[str, Any]]],
         document_results: List[Dict[str, Any]],
         question: str,
         web_search_knowledge: str,
         prediction_results: Optional[List[Dict[str, Any]]] = None
     ) -> str:
-        cache_key = (sql_query, str(sql_results), str(document_results), question, str(prediction_results))
-        if cache_key in self.explanation_cache:
+        sql_results = ResultSet.coerce(sql_results)
+        cache_key = content_key("explanation", sql_query, sql_results, document_results, question, prediction_results)
+        hit = cache_key in self.explanation_cache
+        record_cache("explanation", hit)
+        if hit:
             logger.info("Explanation cache hit")
             return self.explanation_cache[cache_key]
 
         if not sql_results and not document_results and not prediction_results:
             return "I couldn't find any results to explain. Let's try a different query!"
 
-        sql_results_str = " ".join([str(row) for row in sql_results[:5]]) if sql_results else "No SQL results available."
+        sql_results_str = " ".join([str(row) for row in sql_results.head(5).to_records()]) if sql_results else "No SQL results available."
         doc_results_str = " ".join([f"Document ID {res['doc_id']}, Chunk ID {res['chunk_id']} from {res['file_name']}: {res['chunk']}" for res in document_results]) if document_results else "No document retrieval results available."
         prediction_str = " ".join([f"Shipping Mode: {res['shipping_mode']}, Predicted Late Delivery Risk: {res['avg_predicted_late_risk']:.3f}" for res in prediction_results]) if prediction_results else ""
 
@@ -59,6 +66,7 @@ Tasks:
 
 Return the explanation as plain text.
 """
+        start = time.perf_counter()
         explanation = await self.call_llm(prompt)
         if isinstance(explanation, dict) and "error" in explanation:
             explanation = f"Failed to generate explanation: {explanation['error']}. Let's try a different approach!"
@@ -66,5 +74,5 @@ Return the explanation as plain text.
             explanation = "I couldn't generate an explanation due to an error with the language model. Here's the raw data instead."
 
         explanation = explanation.replace("\n", " ")
-        self.explanation_cache[cache_key] = explanation
+        self.explanation_cache.set(cache_key, explanation, time.perf_counter() - start)
         return explanation
\ No newline at end of file
@@ -1,20 +1,62 @@
+import os
+import json
+import time
 import logging
-from cachetools import TTLCache
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from config.settings import LEARNING_PACK
+from utils.metrics import record_cache
+from utils.memory_cache import get_cache
+from utils.cache_keys import content_digest
 from .base_agent import BaseAgent
 
 logger = logging.getLogger(__name__)
 
+
+def load_pack(path: str) -> Dict[str, Any]:
+    """The learning-content pack at path, or an empty pack if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            pack = json.load(f)
+        logger.info(f"Loaded learning pack {pack['version']} ({len(pack['topics'])} topics)")
+        return pack
+    except (OSError, ValueError, KeyError) as e:
+        logger.info(f"No learning pack loaded: {str(e)}")
+        return {"version": None, "topics": {}}
+
+
 class LearningModuleAgent(BaseAgent):
-    def __init__(self, api_key: str, url: str, serper_api_key: str):
-        super().__init__(api_key, url, serper_api_key)
-        self.learning_cache = TTLCache(maxsize=500, ttl=7200)
+    def __init__(self, api_key: str, url: str, serper_api_key: str, resources=None):
+        super().__init__(api_key, url, serper_api_key, resources=resources)
+        self.learning_cache = get_cache("learning")
+        self.pack = load_pack(LEARNING_PACK["path"])
+
+    @property
+    def topics(self) -> List[str]:
+        """Topics questions are matched against: the pack's, plus configured ones not yet built."""
+        return list(self.pack["topics"]) + [t for t in LEARNING_PACK["topics"] if t not in self.pack["topics"]]
 
     async def provide_learning_content(self, topic: str) -> str:
+        packed = self.pack["topics"].get(topic)
+        record_cache("learning_pack", packed is not None)
+        if packed is not None:
+            return packed
+
         cache_key = f"learning:{topic}"
-        if cache_key in self.learning_cache:
+        hit = cache_key in self.learning_cache
+        record_cache("learning", hit)
+        if hit:
             logger.info("Learning module cache hit")
             return self.learning_cache[cache_key]
 
+        start = time.perf_counter()
+        content = await self.generate(topic)
+        if content is None:
+            content = f"Failed to generate learning content for {topic}."
+        self.learning_cache.set(cache_key, content, time.perf_counter() - start)
+        return content
+
+    async def generate(self, topic: str) -> Optional[str]:
         prompt = f"""
 Provide a brief educational explanation (100-150 words) on the supply chain topic: "{topic}".
 Include a definition, its importance in supply chain management, and a simple example.
@@ -26,6 +68,27 @@ Explanation:
 """
         content = await self.call_llm(prompt)
         if isinstance(content, dict) and "error" in content:
-            content = f"Failed to generate learning content for {topic}: {content['error']}"
-        self.learning_cache[cache_key] = content
-        return content
\ No newline at end of file
+            logger.error(f"Failed to generate learning content for {topic}: {content['error']}")
+            return None
+        return content
+
+    async def build_pack(self, topics: List[str], path: str) -> Dict[str, Any]:
+        """Generate content for every topic and write it, versioned by its digest, to path."""
+        contents, failed = {}, []
+        for topic in topics:
+            content = await self.generate(topic)
+            if content is None:
+                failed.append(topic)
+            else:
+                contents[topic] = content
+        pack = {
+            "version": content_digest(contents)[:12],
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "topics": contents,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(pack, f, indent=2)
+        os.replace(tmp_path, path)
+        self.pack = pack
+        return {"version": pack["version"], "topics": len(contents), "failed": failed, "path": path}
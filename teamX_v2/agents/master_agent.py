@@ -1,38 +1,85 @@
 
 import re
+import copy
 import time
 import asyncio
 import logging
-import numpy as np
-import pandas as pd
 from typing import Dict, List, Optional, Any, Tuple
-from collections import deque
-from sentence_transformers import SentenceTransformer, util
-from tabulate import tabulate
+import numpy as np
 from utils.validation_utils import validate_query
+from utils.session_store import SessionStore, UserSession
+from utils.leaderboard import LeaderboardWriter
+from utils.result_set import ResultSet
+from utils.tracing import start_trace, span, traced, set_trace_attribute, TraceExporter
+from utils.metrics import MetricsFlusher, REQUEST_LATENCY, WORKERS_BUSY, SQL_PROMPT_TOKENS
+from utils.profiling import profile as profile_block
+from utils.memory_cache import cache_report
+from utils.snapshot import load_embeddings, save_embeddings
+from config.settings import SPECULATIVE_EXECUTION, SESSION_STORE, LEADERBOARD, TRACING, METRICS, PROFILING, SQL_PLAN_CACHE, SCHEMA_CATALOG, ROLLUPS, PAGINATION, LEARNING_PACK
 from .query_classifier_agent import QueryClassifierAgent
 from .document_retrieval_agent import DocumentRetrievalAgent
 from .sql_agent import SQLAgent
+from .sql_plan_cache import SQLPlanCache, render
+from .example_store import ExampleStore
+from .schema_catalog import SchemaCatalog
+from .sql_guard import SQLGuard, SQLBudgetExceeded
+from .rollups import RollupStore
+from .prediction_cube import PredictionCube
+from .result_pages import ResultPager
 from .web_search_agent import WebSearchAgent
 from .explanation_agent import ExplanationAgent
 from .learning_module_agent import LearningModuleAgent
-from .predictive_agent import PredictiveAgent
+from .resources import AgentResources
+from .speculation import Speculator
 
 logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger('audit')
+
+# Keys of an execute_sql result that are passed through to the response
+SQL_RESULT_METADATA = ("truncated", "next_page_token", "freshness", "plan_cache")
+
+
+def _cos_sim(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    # Cosine similarity of one vector against each row of matrix
+    matrix = np.atleast_2d(matrix)
+    query = np.asarray(query, dtype=np.float32).ravel()
+    return (matrix @ query) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
 
 class MasterAgent:
-    def __init__(self, engine, embedding_model: SentenceTransformer, schema: str, few_shot_examples: str, api_key: str, url: str, serper_api_key: str, redis_client, intent_classifier):
-        self.engine = engine
-        self.embedding_model = embedding_model
+    def __init__(
+        self,
+        engine=None,
+        embedding_model=None,
+        schema: str = "",
+        few_shot_examples: str = "",
+        api_key: str = "",
+        url: str = "",
+        serper_api_key: str = "",
+        redis_client=None,
+        intent_classifier=None,
+        resources: Optional[AgentResources] = None
+    ):
+        # Agents share one copy of each heavy object through the resource container.
+        # Passing engine/redis_client/embedding_model directly wraps them in one.
+        self.resources = resources or AgentResources(engine=engine, redis_client=redis_client, embedding_model=embedding_model)
+        self.engine = self.resources.engine
+        self.redis_client = self.resources.redis_client
         self.intent_classifier = intent_classifier
-        self.query_classifier = QueryClassifierAgent(redis_client)
-        self.doc_retrieval = DocumentRetrievalAgent(engine, embedding_model, api_key, url, serper_api_key)
-        self.sql_agent = SQLAgent(engine, schema, few_shot_examples, api_key, url, serper_api_key, redis_client)
-        self.web_search = WebSearchAgent(api_key, url, serper_api_key)
-        self.explanation = ExplanationAgent(api_key, url, serper_api_key, engine)
-        self.learning_module = LearningModuleAgent(api_key, url, serper_api_key)
-        self.predictive = PredictiveAgent(engine)
-        self.redis_client = redis_client
+        self.query_classifier = QueryClassifierAgent(self.resources)
+        self.doc_retrieval = DocumentRetrievalAgent(self.resources, api_key, url, serper_api_key)
+        self.sql_agent = SQLAgent(self.engine, schema, few_shot_examples, api_key, url, serper_api_key, self.redis_client)
+        self.sql_plans = SQLPlanCache(self.engine, self.redis_client)
+        self.examples = ExampleStore(few_shot_examples, schema, self.redis_client)
+        self.schema_catalog = SchemaCatalog(self.engine, self.redis_client)
+        self.sql_guard = SQLGuard(self.engine, self.redis_client)
+        self.rollups = RollupStore(self.engine)
+        self.pager = ResultPager(self.engine, self.redis_client)
+        self.web_search = WebSearchAgent(api_key, url, serper_api_key, self.resources)
+        self.explanation = ExplanationAgent(api_key, url, serper_api_key, self.resources)
+        self.learning_module = LearningModuleAgent(api_key, url, serper_api_key, self.resources)
+        self.predictive = self.resources.predictive
+        self.prediction_cube = PredictionCube(self.engine, self.predictive)
+        self.speculation_config = SPECULATIVE_EXECUTION
         self.column_descriptions = {
             'segment': 'customer segment',
             'order_count': 'number of orders',
@@ -61,14 +108,69 @@ class MasterAgent:
             "What are load optimization strategies in our logistics policy?",
             "What is the trend of late delivery risks over the years?"
         ]
-        self.common_question_embeddings = self.embedding_model.encode(self.common_questions)
-        self.conversation_memory = deque(maxlen=10)
-        self.compliance_score = 100
-        self.compliance_history = []
-        self.badges = []
-        self.query_count = 0
-        self.successful_queries = 0
-        self.user_id = "default_user"
+        self.suggestion_candidates = [
+            "Would you like to see the distribution of orders by customer segment and region?",
+            "Would you like to know which shipping mode has the highest average late delivery risk?",
+            "Would you like to explore our Transportation and Logistics policy for optimal shipping modes?",
+            "Would you like to see the total profit by customer segment for a specific year?",
+            "Would you like to learn more about load optimization strategies?",
+            "Would you like to see the trend of late delivery risks over the years?"
+        ]
+        # Encoded lazily, or memory-mapped from the snapshot by preload_snapshot()
+        self._text_embeddings: Dict[str, np.ndarray] = {}
+        self._verified_questions: List[str] = []
+        self.sessions = SessionStore(self.redis_client, **SESSION_STORE)
+        self.leaderboard = LeaderboardWriter(self.redis_client, **LEADERBOARD)
+        self.metrics = MetricsFlusher(self.redis_client, METRICS["flush_interval"], self.engine)
+        self.trace_exporter = TraceExporter() if TRACING["enabled"] else None
+
+    @property
+    def embedding_model(self):
+        return self.resources.embedding_model
+
+    def _snapshot_texts(self) -> Dict[str, List[str]]:
+        return {
+            "common_questions": self.common_questions,
+            "suggestion_candidates": self.suggestion_candidates,
+            "few_shot_examples": self.examples.base_questions,
+            "learning_topics": [f"What is {topic}?" for topic in self.learning_module.topics],
+        }
+
+    async def encode(self, texts):
+        # MiniLM runs on the governor's embedding executor, off the event loop
+        return await self.resources.governor.run("embedding", lambda: self.embedding_model.encode(texts))
+
+    async def text_embeddings(self, name: str) -> np.ndarray:
+        embeddings = self._text_embeddings.get(name)
+        if embeddings is None:
+            texts = self._snapshot_texts()[name]
+            embeddings = load_embeddings(name, texts, self.resources.settings["embedding_model"])
+            if embeddings is None:
+                embeddings = await self.encode(texts)
+            self._text_embeddings[name] = embeddings
+        return embeddings
+
+    def preload_snapshot(self) -> List[str]:
+        """Memory-map every precomputed embedding set that has a valid snapshot."""
+        model_name = self.resources.settings["embedding_model"]
+        for name, texts in self._snapshot_texts().items():
+            embeddings = load_embeddings(name, texts, model_name)
+            if embeddings is not None:
+                self._text_embeddings[name] = embeddings
+        return list(self._text_embeddings)
+
+    def build_snapshot(self):
+        model_name = self.resources.settings["embedding_model"]
+        for name, texts in self._snapshot_texts().items():
+            save_embeddings(name, texts, self.embedding_model.encode(texts), model_name)
+
+    async def close(self):
+        # Write back any session and leaderboard state still pending in the batch
+        await self.leaderboard.close()
+        await self.sessions.close()
+        await self.metrics.close()
+        await self.web_search.close()
+        await self.resources.close()
 
     async def show_help_menu(self) -> str:
         help_text = """
@@ -85,22 +187,44 @@ Commands:
 """
         return help_text
 
+    @traced("suggestions")
     async def suggest_alternative_queries(self, question: str) -> List[str]:
-        question_embedding = self.embedding_model.encode(question)
-        similarities = util.cos_sim(question_embedding, self.common_question_embeddings)[0]
-        top_indices = similarities.argsort(descending=True)[:3]
+        if not self.resources.embedding_ready:
+            # Don't hold a rejected query on the model load; rank by word overlap instead
+            words = set(re.findall(r"\w+", question.lower()))
+            overlap = [len(words & set(re.findall(r"\w+", q.lower()))) for q in self.common_questions]
+            top_indices = sorted(range(len(overlap)), key=lambda i: -overlap[i])[:3]
+            return [self.common_questions[idx] for idx in top_indices]
+        question_embedding = await self.encode(question)
+        similarities = _cos_sim(question_embedding, await self.text_embeddings("common_questions"))
+        top_indices = np.argsort(-similarities)[:3]
         suggestions = [self.common_questions[idx] for idx in top_indices]
         return suggestions
 
-    async def infer_context(self, question: str) -> str:
+    async def match_learning_topic(self, question: str) -> Optional[str]:
+        """The learning topic the question asks about, if any."""
+        topics = self.learning_module.topics
+        if not topics:
+            return None
+        if not self.resources.embedding_ready:
+            question_lower = question.lower()
+            if "what is" in question_lower:
+                return next((topic for topic in topics if topic in question_lower), None)
+            return None
+        similarities = _cos_sim(await self.encode(question), await self.text_embeddings("learning_topics"))
+        best = int(np.argmax(similarities))
+        return topics[best] if similarities[best] >= LEARNING_PACK["min_similarity"] else None
+
+    @traced("infer_context")
+    async def infer_context(self, question: str, session: UserSession) -> str:
         question_lower = question.lower()
         follow_up_keywords = ["it", "this", "that", "do we have policy", "are we following", "tell me more", "explain more"]
-        if any(keyword in question_lower for keyword in follow_up_keywords) and self.conversation_memory:
-            question_embedding = self.embedding_model.encode(question_lower)
-            for past_entry in reversed(self.conversation_memory):
-                past_question = past_entry["question"].lower()
-                past_embedding = self.embedding_model.encode(past_question)
-                similarity = util.cos_sim(question_embedding, past_embedding)[0].item()
+        if any(keyword in question_lower for keyword in follow_up_keywords) and session.conversation_memory:
+            past_questions = [entry["question"].lower() for entry in reversed(session.conversation_memory)]
+            # One batched encode instead of one call per remembered question
+            embeddings = await self.encode([question_lower] + past_questions)
+            similarities = _cos_sim(embeddings[0], embeddings[1:])
+            for past_question, similarity in zip(past_questions, similarities):
                 if similarity > 0.8:
                     if "sustainability" in past_question:
                         return f"Regarding sustainability practices: {question}"
@@ -114,23 +238,16 @@ Commands:
                         return f"Regarding shipping and logistics: {question}"
         return question
 
+    @traced("suggestions")
     async def generate_proactive_suggestions(self, user_role: str, last_question: str) -> List[str]:
         suggestions = []
         last_question_lower = last_question.lower()
-        last_question_embedding = self.embedding_model.encode(last_question_lower)
-        suggestion_candidates = [
-            "Would you like to see the distribution of orders by customer segment and region?",
-            "Would you like to know which shipping mode has the highest average late delivery risk?",
-            "Would you like to explore our Transportation and Logistics policy for optimal shipping modes?",
-            "Would you like to see the total profit by customer segment for a specific year?",
-            "Would you like to learn more about load optimization strategies?",
-            "Would you like to see the trend of late delivery risks over the years?"
-        ]
-        suggestion_embeddings = self.embedding_model.encode(suggestion_candidates)
-        similarities = util.cos_sim(last_question_embedding, suggestion_embeddings)[0]
-        filtered_indices = [i for i, sim in enumerate(similarities) if sim < 0.95]
-        if filtered_indices:
-            top_indices = similarities[filtered_indices].argsort(descending=True)[:2]
+        last_question_embedding = await self.encode(last_question_lower)
+        suggestion_candidates = self.suggestion_candidates
+        similarities = _cos_sim(last_question_embedding, await self.text_embeddings("suggestion_candidates"))
+        filtered_indices = np.flatnonzero(similarities < 0.95)
+        if len(filtered_indices):
+            top_indices = filtered_indices[np.argsort(-similarities[filtered_indices])[:2]]
             suggestions = [suggestion_candidates[i] for i in top_indices]
 
         if "finance_manager" in user_role and "profit" not in last_question_lower:
@@ -140,36 +257,224 @@ Commands:
 
         return suggestions[:3]
 
-    async def update_leaderboard(self) -> int:
-        await self.redis_client.zadd("leaderboard", {self.user_id: self.compliance_score})
-        rank = await self.redis_client.zrevrank("leaderboard", self.user_id)
-        return rank + 1 if rank is not None else 1
-
-    async def award_badge(self):
-        self.query_count += 1
-        if self.query_count == 5:
-            self.badges.append("Explorer: Asked 5 questions")
+    def speculation_policy(self, user_role: str, speculative: Optional[bool]) -> Optional[Dict[str, bool]]:
+        enabled = self.speculation_config.get("enabled", False) if speculative is None else speculative
+        if not enabled:
+            return None
+        return self.speculation_config.get("roles", {}).get(user_role, self.speculation_config.get("default", {}))
+
+    @traced("leaderboard")
+    async def update_leaderboard(self, session: UserSession) -> Tuple[int, float]:
+        # Queued for the next batched ZADD; rank comes from the local snapshot
+        self.leaderboard.submit(session.user_id, session.compliance_score)
+        return await self.leaderboard.rank(session.user_id, session.compliance_score)
+
+    async def award_badge(self, session: UserSession):
+        session.query_count += 1
+        if session.query_count == 5:
+            session.badges.append("Explorer: Asked 5 questions")
             return "Congratulations! You've earned the 'Explorer' badge for asking 5 questions!"
-        if self.successful_queries == 3:
-            self.badges.append("Achiever: 3 successful queries in a row")
+        if session.successful_queries == 3:
+            session.badges.append("Achiever: 3 successful queries in a row")
             return "Great job! You've earned the 'Achiever' badge for 3 successful queries in a row!"
-        if self.query_count == 10 and "Policy Expert" not in [badge.split(":")[0] for badge in self.badges]:
-            policy_queries = sum(1 for entry in self.conversation_memory if "policy" in entry["question"].lower())
-            if policy_queries >= 5:
-                self.badges.append("Policy Expert: Asked 5 policy-related questions")
+        if session.query_count == 10 and "Policy Expert" not in [badge.split(":")[0] for badge in session.badges]:
+            if session.policy_queries >= 5:
+                session.badges.append("Policy Expert: Asked 5 policy-related questions")
                 return "Awesome! You've earned the 'Policy Expert' badge for asking 5 policy-related questions!"
         return None
 
+    async def few_shot_context(self, question: str, user_role: Optional[str] = None) -> Dict[str, Any]:
+        """Schema and few-shot examples for the SQL prompt, picked by similarity to the question."""
+        await self.examples.load_verified()
+        # Introspected, role-filtered schema when the database is reachable; static schema otherwise
+        tables = None
+        if SCHEMA_CATALOG["enabled"] and await self.schema_catalog.load():
+            tables = self.schema_catalog.tables_for(user_role)
+        scores = None
+        if self.resources.embedding_ready and self.examples.base_count:
+            verified = self.examples.questions[self.examples.base_count:]
+            verified_embeddings = self._text_embeddings.get("verified_examples")
+            # The verified pool is re-read from Redis, so re-encode whenever it changed
+            if verified and (verified_embeddings is None or verified != self._verified_questions):
+                verified_embeddings = self._text_embeddings["verified_examples"] = await self.encode(verified)
+                self._verified_questions = verified
+            matrix = await self.text_embeddings("few_shot_examples")
+            if verified:
+                matrix = np.vstack([matrix, verified_embeddings])
+            scores = _cos_sim(await self.encode(question), matrix)
+        context = self.examples.select(question, scores, tables=tables)
+        tokens = context["prompt_tokens"]
+        SQL_PROMPT_TOKENS.observe(tokens["before"], context="full")
+        SQL_PROMPT_TOKENS.observe(tokens["after"], context="selected")
+        set_trace_attribute("sql_prompt_tokens_before", tokens["before"])
+        set_trace_attribute("sql_prompt_tokens_after", tokens["after"])
+        logger.info(f"SQL prompt context: {tokens['before']} -> {tokens['after']} tokens (tables: {', '.join(context['tables'])})")
+        return context
+
+    async def add_verified_example(self, question: str, sql: str) -> Dict[str, Any]:
+        return await self.examples.add_verified(question, sql)
+
+    @staticmethod
+    def _copy_sql_metadata(response: Dict[str, Any], sql_result: Dict[str, Any]):
+        for key in SQL_RESULT_METADATA:
+            if key in sql_result:
+                response[key] = sql_result[key]
+
+    async def _add_next_page(self, result: Dict[str, Any], sql: str, params, columns: List[str], user_role: str, user_region: str):
+        # Only the first page travels with the response; the rest is fetched by token
+        result["truncated"] = True
+        if sql:
+            query = {"sql": sql, "params": params, "columns": columns}
+            result["next_page_token"] = await self.pager.issue(query, user_role, user_region, len(result["results"]))
+
+    async def fetch_page(self, token: str, user_role: str, user_region: str) -> Dict[str, Any]:
+        """Next page of an earlier SQL result, addressed by its continuation token."""
+        with span("sql_page"):
+            return await self.pager.page(token, user_role, user_region)
+
+    async def export_results(self, token: str, user_role: str, user_region: str, fmt: str = "csv"):
+        """Streamed CSV/Parquet bytes of a full SQL result, or an error dict."""
+        return await self.pager.export(token, user_role, user_region, fmt)
+
+    @staticmethod
+    def _guard_rejection(guard) -> Dict[str, Any]:
+        # Surfaces as complexity feedback, so handle_query retries with simplify=True
+        return {
+            "error": guard.rejection,
+            "complexity_feedback": "Narrow the question (a year, market or segment) or ask for an aggregate instead of row-level data.",
+            "sql_query": guard.statement or "",
+        }
+
+    async def execute_sql(self, question: str, **kwargs) -> Any:
+        user_role, user_region = kwargs.get("user_role"), kwargs.get("user_region")
+        with span("sql", simplify=kwargs.get("simplify", False)):
+            if ROLLUPS["enabled"]:
+                try:
+                    answer = await self.rollups.answer(question, user_role, user_region)
+                except Exception as e:
+                    logger.warning(f"Rollup query failed, answering live: {str(e)}")
+                    answer = None
+                if answer:
+                    set_trace_attribute("sql_source", answer["freshness"]["source"])
+                    return answer
+            # A simplify retry follows a rejection, so the cached plan is not tried again
+            if SQL_PLAN_CACHE["enabled"] and not kwargs.get("simplify"):
+                plan = await self.sql_plans.lookup(question, user_role, user_region)
+                if plan:
+                    # Re-costed with this question's literals under the same guard as generated SQL
+                    async with self.sql_guard.guarded(user_role, PAGINATION["first_page"]) as guard:
+                        try:
+                            results, truncated = await self.sql_plans.execute(plan, guard.budget["statement_timeout_ms"],
+                                                                              guard.row_cap)
+                        except SQLBudgetExceeded:
+                            results = None
+                        except Exception as e:
+                            logger.warning(f"Cached SQL plan failed, regenerating: {str(e)}")
+                            await self.sql_plans.evict(plan["key"])
+                            results = None
+                    if guard.rejection:
+                        set_trace_attribute("sql_plan", "rejected")
+                        return self._guard_rejection(guard)
+                    if results is not None:
+                        set_trace_attribute("sql_plan", "hit")
+                        # Placeholders are rendered back to this question's literals for the summary,
+                        # explanation prompt and UI; paging keeps the parameterized statement
+                        response = {"results": results, "sql_query": render(plan["sql"], plan["params"]),
+                                    "sql_params": plan["params"], "plan_cache": "hit"}
+                        if truncated:
+                            await self._add_next_page(response, plan["sql"], plan["params"], results.columns, user_role, user_region)
+                        return response
+            start = time.perf_counter()
+            context = await self.few_shot_context(question, user_role)
+            # Per-call copy so concurrent queries never see each other's prompt context
+            sql_agent = copy.copy(self.sql_agent)
+            sql_agent.schema, sql_agent.few_shot_examples = context["schema"], context["examples"]
+            async with self.sql_guard.guarded(user_role, PAGINATION["first_page"]) as guard:
+                try:
+                    result = await sql_agent.execute_sql_query(question, **kwargs)
+                except SQLBudgetExceeded:
+                    result = None
+            if guard.rejection:
+                return self._guard_rejection(guard)
+            if isinstance(result, dict) and "error" not in result and result.get("results") is not None:
+                results = ResultSet.coerce(result["results"])
+                if len(results) > guard.row_cap:
+                    result = {**result, "results": results.head(guard.row_cap)}
+                    await self._add_next_page(result, result.get("sql_query", ""), {}, results.columns, user_role, user_region)
+            if SQL_PLAN_CACHE["enabled"] and isinstance(result, dict) and "error" not in result and result.get("sql_query"):
+                columns = ResultSet.coerce(result.get("results")).columns
+                await self.sql_plans.store(question, user_role, user_region, result["sql_query"], columns,
+                                           time.perf_counter() - start)
+            return result
+
     async def handle_query(
+        self,
+        question: str,
+        *args,
+        debug: bool = False,
+        profile: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Answer a question, recording per-stage spans and metrics. The trace is
+        exported to the local trace file and, when debug is set, returned under
+        response["trace"]. With profile set, the request is sampled and its
+        flamegraph/allocation report paths are returned under response["profile"].
+        """
+        self.metrics.start()
+        WORKERS_BUSY.inc()
+        try:
+            with profile_block("handle_query", profile, PROFILING["output_dir"], PROFILING["interval"],
+                               PROFILING["top_allocations"]) as profile_files:
+                with start_trace("handle_query", user_role=kwargs.get("user_role", "supply_chain_manager")) as trace:
+                    response = await self._handle_query(question, *args, **kwargs)
+        finally:
+            WORKERS_BUSY.dec()
+            self.resources.governor.sample()
+            REQUEST_LATENCY.observe(trace.root.duration_ms / 1000, intent=trace.root.attributes.get("intent", "none"))
+        self.record_audit(response.pop("audit_events", []), kwargs.get("user_id", "default_user"),
+                          kwargs.get("user_role", "supply_chain_manager"), kwargs.get("user_region", "all"))
+        if self.trace_exporter:
+            self.trace_exporter.export(trace)
+        if debug:
+            response["trace"] = trace.to_dict()
+            response["caches"] = cache_report()
+            response["cpu"] = self.resources.governor.stats()
+        if profile_files:
+            response["profile"] = profile_files
+        return response
+
+    @staticmethod
+    def log_access(response: Dict[str, Any], outcome: str, message: str, append: bool = False):
+        """
+        Record an access decision ("allowed"/"denied"). Every decision is kept
+        for the audit store; append only controls whether the audit_log text
+        shown to the user adds to or replaces the previous line.
+        """
+        line = f"Access attempt logged: {message}"
+        response["audit_events"].append((outcome, line))
+        response["audit_log"] = f"{response['audit_log']}\n{line}" if append and response["audit_log"] else line
+
+    def record_audit(self, audit_events: List[Tuple[str, str]], user_id: str, user_role: str, user_region: str):
+        # Queued to the audit store by the logging listener thread; never blocks the request
+        for outcome, line in audit_events:
+            audit_logger.info(line, extra={"user_id": user_id, "role": user_role, "region": user_region, "outcome": outcome})
+
+    async def _handle_query(
         self,
         question: str,
         top_k: int = 5,
         filters: Optional[Dict[str, str]] = None,
         simplify: bool = False,
         user_role: str = "supply_chain_manager",
-        user_region: str = "all"
+        user_region: str = "all",
+        speculative: Optional[bool] = None,
+        user_id: str = "default_user"
     ) -> Dict[str, Any]:
         start_time = time.time()
+        self.sessions.start()
+        self.leaderboard.start()
+        session = await self.sessions.get(user_id)
 
         response = {
             "status": "success",
@@ -187,18 +492,21 @@ Commands:
             "latency_ms": 0.0,
             "suggestions": [],
             "audit_log": "",
-            "compliance_score": self.compliance_score,
+            "audit_events": [],
+            "compliance_score": session.compliance_score,
             "proactive_suggestions": [],
             "badges": [],
-            "leaderboard_position": 0
+            "leaderboard_position": 0,
+            "leaderboard_staleness_ms": 0.0,
+            "speculation": {}
         }
 
         # Handle "go back to query" command
         go_back_match = re.match(r"go back to query (\d+)", question.lower())
         if go_back_match:
             query_index = int(go_back_match.group(1)) - 1
-            if 0 <= query_index < len(self.conversation_memory):
-                past_entry = list(self.conversation_memory)[query_index]
+            if 0 <= query_index < len(session.conversation_memory):
+                past_entry = list(session.conversation_memory)[query_index]
                 response["summary"] = f"Revisiting query {query_index + 1}: {past_entry['question']}\n{past_entry['response']}"
                 end_time = time.time()
                 response["latency_ms"] = (end_time - start_time) * 1000
@@ -212,11 +520,12 @@ Commands:
         if question.lower().startswith("voice:"):
             question = question[6:].strip()
 
-        contextual_question = await self.infer_context(question)
+        contextual_question = await self.infer_context(question, session)
         if contextual_question != question:
             question = contextual_question
 
-        is_valid, error_message = validate_query(question, self.compliance_score, self.compliance_history)
+        with span("validate"):
+            is_valid, error_message = validate_query(question, session.compliance_score, session.compliance_history)
         if not is_valid:
             response["errors"].append(error_message)
             response["summary"] = error_message
@@ -224,12 +533,35 @@ Commands:
             suggestions = await self.suggest_alternative_queries(question)
             response["suggestions"] = suggestions
             response["summary"] += f"\nSuggestions: {', '.join(suggestions)}"
+            self.sessions.mark_dirty(session)
             end_time = time.time()
             response["latency_ms"] = (end_time - start_time) * 1000
             return response
 
-        query_type = await self.query_classifier.classify_query(question)
+        # Speculatively start data branches so classification is off the critical path
+        speculator = None
+        policy = self.speculation_policy(user_role, speculative)
+        if policy:
+            speculator = Speculator(policy)
+            speculator.start("retrieval", lambda: self.doc_retrieval.retrieve_documents(question, top_k, filters, min_similarity=0.2, user_role=user_role))
+            speculator.start("sql", lambda: self.execute_sql(question, simplify=simplify, user_role=user_role, user_region=user_region))
+
+        classify_start = time.time()
+        try:
+            with span("classify"):
+                query_type = await self.query_classifier.classify_query(question)
+        except Exception:
+            if speculator:
+                await speculator.resolve({}, (time.time() - classify_start) * 1000)
+            raise
+        if speculator:
+            await speculator.resolve(
+                {"retrieval": query_type["requires_retrieval"], "sql": query_type["requires_sql"]},
+                (time.time() - classify_start) * 1000
+            )
+            response["speculation"] = speculator.report
         logger.info(f"Query intent classification: {query_type}")
+        set_trace_attribute("intent", "+".join(k[len("requires_"):] for k, v in query_type.items() if v) or "none")
 
         # Split query into parts for hybrid queries
         query_parts = [part.strip() for part in question.split(" and ") if part.strip()]
@@ -238,19 +570,20 @@ Commands:
             # Process SQL part
             sql_part = next((part for part in query_parts if "top" in part.lower() or "order value" in part.lower()), None)
             if sql_part and query_type["requires_sql"]:
-                sql_result = await self.sql_agent.execute_sql_query(sql_part, simplify=simplify, user_role=user_role, user_region=user_region)
+                sql_result = await self.execute_sql(sql_part, simplify=simplify, user_role=user_role, user_region=user_region)
                 if isinstance(sql_result, dict) and "error" not in sql_result:
-                    response["sql_results"] = sql_result["results"]
+                    response["sql_results"] = ResultSet.coerce(sql_result["results"])
                     response["sql_query"] = sql_result["sql_query"].replace("\n", " ")
-                    response["audit_log"] = f"Access attempt logged: User role '{user_role}' executed SQL query successfully."
-                    self.compliance_score += 2
-                    self.compliance_history.append("Successful SQL query (+2 points)")
-                    self.successful_queries += 1
+                    self._copy_sql_metadata(response, sql_result)
+                    self.log_access(response, "allowed", f"User role '{user_role}' executed SQL query successfully.")
+                    session.compliance_score += 2
+                    session.compliance_history.append("Successful SQL query (+2 points)")
+                    session.successful_queries += 1
                 elif isinstance(sql_result, dict) and "error" in sql_result:
                     response["errors"].append(sql_result["error"])
-                    response["audit_log"] = f"Access attempt logged: {sql_result['error']}"
-                    self.compliance_score -= 3
-                    self.compliance_history.append("SQL access violation (-3 points)")
+                    self.log_access(response, "denied", sql_result["error"])
+                    session.compliance_score -= 3
+                    session.compliance_history.append("SQL access violation (-3 points)")
                 else:
                     response["errors"].append(f"SQL execution failed: {str(sql_result)}")
 
@@ -261,46 +594,47 @@ Commands:
                 if isinstance(doc_result, dict) and "error" not in doc_result:
                     response["document_results"] = doc_result
                     response["document_summary"] = await self.doc_retrieval.summarize_documents(response["document_results"], retrieval_part)
-                    response["audit_log"] += f"\nAccess attempt logged: User role '{user_role}' accessed documents successfully."
-                    self.compliance_score += 2
-                    self.compliance_history.append("Successful document access (+2 points)")
+                    self.log_access(response, "allowed", f"User role '{user_role}' accessed documents successfully.", append=True)
+                    session.compliance_score += 2
+                    session.compliance_history.append("Successful document access (+2 points)")
                 elif isinstance(doc_result, dict) and "error" in doc_result:
                     response["errors"].append(doc_result["error"])
-                    response["audit_log"] += f"\nAccess attempt logged: {doc_result['error']}"
-                    self.compliance_score -= 3
-                    self.compliance_history.append("Access violation (-3 points)")
+                    self.log_access(response, "denied", doc_result["error"], append=True)
+                    session.compliance_score -= 3
+                    session.compliance_history.append("Access violation (-3 points)")
                 else:
                     response["errors"].append(f"Document retrieval failed: {str(doc_result)}")
         else:
             # Handle single-intent queries
             if not query_type["requires_retrieval"] and not query_type["requires_sql"]:
-                self.compliance_score -= 2
-                self.compliance_history.append("Unrelated query intent (-2 points)")
+                session.compliance_score -= 2
+                session.compliance_history.append("Unrelated query intent (-2 points)")
                 response["errors"].append("The question doesn't seem to require data retrieval or SQL querying. Please ask a supply chain-related question.")
                 response["summary"] = "The question doesn't seem to require data retrieval or SQL querying. Please ask a supply chain-related question."
                 response["status"] = "error"
                 suggestions = await self.suggest_alternative_queries(question)
                 response["suggestions"] = suggestions
                 response["summary"] += f"\nSuggestions: {', '.join(suggestions)}"
+                self.sessions.mark_dirty(session)
                 end_time = time.time()
                 response["latency_ms"] = (end_time - start_time) * 1000
                 return response
 
-            learning_topic = None
-            question_lower = question.lower()
-            if "what is" in question_lower and ("load optimization" in question_lower or "sustainability" in question_lower):
-                topic_match = re.search(r'what is (load optimization|sustainability)\?', question_lower)
-                if topic_match:
-                    learning_topic = topic_match.group(1)
+            learning_topic = await self.match_learning_topic(question)
 
             # Parallelize independent tasks
-            doc_task = self.doc_retrieval.retrieve_documents(question, top_k, filters, min_similarity=0.2, user_role=user_role) if query_type["requires_retrieval"] else asyncio.sleep(0)
-            web_task = self.web_search.web_search(f"{question} supply chain context") if query_type["requires_explanation"] else asyncio.sleep(0)
+            speculative_doc_task = speculator.take("retrieval") if speculator else None
+            speculative_sql_task = speculator.take("sql") if speculator else None
+            doc_task = speculative_doc_task if speculative_doc_task else self.doc_retrieval.retrieve_documents(question, top_k, filters, min_similarity=0.2, user_role=user_role) if query_type["requires_retrieval"] else asyncio.sleep(0)
+            web_task = self.web_search.web_search(self.web_search.context_query(question)) if query_type["requires_explanation"] else asyncio.sleep(0)
             learning_task = self.learning_module.provide_learning_content(learning_topic) if learning_topic else asyncio.sleep(0)
             doc_result, web_search_result, learning_content = await asyncio.gather(doc_task, web_task, learning_task)
 
             # Dependent task: SQL query
-            sql_result = await self.sql_agent.execute_sql_query(question, simplify=simplify, user_role=user_role, user_region=user_region) if query_type["requires_sql"] else None
+            if speculative_sql_task:
+                sql_result = await speculative_sql_task
+            else:
+                sql_result = await self.execute_sql(question, simplify=simplify, user_role=user_role, user_region=user_region) if query_type["requires_sql"] else None
 
             if learning_topic:
                 response["learning_content"] = learning_content
@@ -318,10 +652,10 @@ Commands:
                 if isinstance(doc_result, Exception):
                     response["errors"].append(f"Document retrieval failed: {str(doc_result)}")
                 elif isinstance(doc_result, dict) and "error" in doc_result:
-                    self.compliance_score -= 3
-                    self.compliance_history.append("Access violation (-3 points)")
+                    session.compliance_score -= 3
+                    session.compliance_history.append("Access violation (-3 points)")
                     response["errors"].append(doc_result["error"])
-                    response["audit_log"] = f"Access attempt logged: {doc_result['error']}"
+                    self.log_access(response, "denied", doc_result["error"])
                     response["suggestions"] = [
                         "Try querying operational data like order counts or shipping details.",
                         "Would you like to explore logistics policies instead?"
@@ -330,9 +664,9 @@ Commands:
                     response["document_results"] = doc_result
                     doc_summary = await self.doc_retrieval.summarize_documents(doc_result, question)
                     response["document_summary"] = doc_summary
-                    response["audit_log"] = f"Access attempt logged: User role '{user_role}' accessed documents successfully."
-                    self.compliance_score += 2
-                    self.compliance_history.append("Successful document access (+2 points)")
+                    self.log_access(response, "allowed", f"User role '{user_role}' accessed documents successfully.")
+                    session.compliance_score += 2
+                    session.compliance_history.append("Successful document access (+2 points)")
                 else:
                     response["errors"].append("I couldn't find any relevant documents for your query.")
 
@@ -345,17 +679,22 @@ Commands:
                         response["errors"].append(sql_result["error"])
                         response["summary"] = f"{sql_result['error']} Automatically simplifying the query..."
                         response["status"] = "error"
-                        sql_result = await self.sql_agent.execute_sql_query(question, simplify=True, user_role=user_role, user_region=user_region)
+                        sql_result = await self.execute_sql(question, simplify=True, user_role=user_role, user_region=user_region)
                         if isinstance(sql_result, dict) and "error" not in sql_result:
-                            response["sql_results"] = sql_result["results"]
+                            response["sql_results"] = ResultSet.coerce(sql_result["results"])
                             response["sql_query"] = sql_result["sql_query"].replace("\n", " ")
+                            self._copy_sql_metadata(response, sql_result)
                     elif "requires_prediction" in sql_result:
                         market_match = re.search(r'in (\w+(?:\s+\w+)*)\s+in\s+\d{4}', question)
                         year_match = re.search(r'\b(\d{4})\b', question)
                         if market_match and year_match:
                             market = market_match.group(1)
                             year = int(year_match.group(1))
-                            prediction_results = await self.predictive.predict_late_delivery_risk(market, year)
+                            cached = await self.prediction_cube.lookup(market, year)
+                            if cached:
+                                prediction_results, response["prediction_version"] = cached
+                            else:
+                                prediction_results = await self.predictive.predict_late_delivery_risk(market, year)
                             if prediction_results:
                                 response["prediction_results"] = prediction_results
                             else:
@@ -363,236 +702,35 @@ Commands:
                         else:
                             response["errors"].append("Could not extract market or year from the question for prediction")
                     else:
-                        self.compliance_score -= 3
-                        self.compliance_history.append("SQL access violation (-3 points)")
+                        session.compliance_score -= 3
+                        session.compliance_history.append("SQL access violation (-3 points)")
                         response["errors"].append(sql_result["error"])
-                        response["audit_log"] = f"Access attempt logged: {sql_result['error']}"
+                        self.log_access(response, "denied", sql_result["error"])
                         response["suggestions"] = [
                             "Try querying operational data like order counts or shipping details.",
                             "Would you like to explore logistics policies instead?"
                         ]
                 else:
-                    response["sql_results"] = sql_result["results"]
+                    response["sql_results"] = ResultSet.coerce(sql_result["results"])
                     response["sql_query"] = sql_result["sql_query"].replace("\n", " ")
-                    response["audit_log"] = f"Access attempt logged: User role '{user_role}' executed SQL query successfully."
-                    self.compliance_score += 2
-                    self.compliance_history.append("Successful SQL query (+2 points)")
-                    self.successful_queries += 1
-
-        # Chart generation for SQL results
-        if response["sql_results"]:
-            if "segment" in response["sql_results"][0] and "total_order_value" in response["sql_results"][0]:
-                labels = [row["segment"] for row in response["sql_results"]]
-                values = [row["total_order_value"] for row in response["sql_results"]]
-                chart = {
-                    "type": "pie",
-                    "data": {
-                        "labels": labels,
-                        "datasets": [{
-                            "label": "Total Order Value ($)",
-                            "data": values,
-                            "backgroundColor": ["#4CAF50", "#2196F3", "#FF9800", "#F44336", "#9C27B0"],
-                            "borderColor": ["#388E3C", "#1976D2", "#F57C00", "#D32F2F", "#7B1FA2"],
-                            "borderWidth": 1
-                        }]
-                    },
-                    "options": {
-                        "plugins": {
-                            "legend": {
-                                "display": True,
-                                "position": "right"
-                            },
-                            "title": {
-                                "display": True,
-                                "text": "Total Order Value by Customer Segment"
-                            }
-                        }
-                    }
-                }
-                response["charts"].append(chart)
-            elif "segment" in response["sql_results"][0] and "region" in response["sql_results"][0] and "order_count" in response["sql_results"][0]:
-                df = pd.DataFrame(response["sql_results"])
-                segments = df["segment"].unique()
-                regions = df["region"].unique()
-                datasets = []
-                colors = ["#4CAF50", "#2196F3", "#FF9800", "#F44336", "#9C27B0"]
-                for i, segment in enumerate(segments):
-                    segment_data = df[df["segment"] == segment]
-                    values = []
-                    for region in regions:
-                        value = segment_data[segment_data["region"] == region]["order_count"].values
-                        values.append(float(value[0]) if value else 0)
-                    datasets.append({
-                        "label": segment,
-                        "data": values,
-                        "backgroundColor": colors[i % len(colors)],
-                        "borderColor": colors[i % len(colors)],
-                        "borderWidth": 1
-                    })
-                chart = {
-                    "type": "bar",
-                    "data": {
-                        "labels": list(regions),
-                        "datasets": datasets
-                    },
-                    "options": {
-                        "scales": {
-                            "y": {
-                                "beginAtZero": True,
-                                "title": {
-                                    "display": True,
-                                    "text": "Number of Orders"
-                                }
-                            },
-                            "x": {
-                                "title": {
-                                    "display": True,
-                                    "text": "Region"
-                                }
-                            }
-                        },
-                        "plugins": {
-                            "legend": {
-                                "display": True,
-                                "position": "top"
-                            },
-                            "title": {
-                                "display": True,
-                                "text": "Distribution of Orders by Customer Segment and Region"
-                            }
-                        }
-                    }
-                }
-                response["charts"].append(chart)
-            elif "customer_id" in response["sql_results"][0] and "total_order_value" in response["sql_results"][0]:
-                labels = [f"Customer {row['customer_id']}" for row in response["sql_results"]]
-                values = [row["total_order_value"] for row in response["sql_results"]]
-                chart = {
-                    "type": "bar",
-                    "data": {
-                        "labels": labels,
-                        "datasets": [{
-                            "label": "Total Order Value ($)",
-                            "data": values,
-                            "backgroundColor": ["#4CAF50", "#2196F3", "#FF9800", "#F44336", "#9C27B0", "#673AB7", "#FF5722", "#795548", "#607D8B", "#E91E63"],
-                            "borderColor": ["#388E3C", "#1976D2", "#F57C00", "#D32F2F", "#7B1FA2", "#512DA8", "#E64A19", "#5D4037", "#455A64", "#C2185B"],
-                            "borderWidth": 1
-                        }]
-                    },
-                    "options": {
-                        "scales": {
-                            "y": {
-                                "beginAtZero": True,
-                                "title": {
-                                    "display": True,
-                                    "text": "Total Order Value ($)"
-                                }
-                            },
-                            "x": {
-                                "title": {
-                                    "display": True,
-                                    "text": "Customer"
-                                }
-                            }
-                        },
-                        "plugins": {
-                            "legend": {
-                                "display": False
-                            },
-                            "title": {
-                                "display": True,
-                                "text": "Top 10 Customers by Total Order Value"
-                            }
-                        }
-                    }
-                }
-                response["charts"].append(chart)
-            elif "year" in response["sql_results"][0] and "avg_late_risk" in response["sql_results"][0]:
-                labels = [str(row["year"]) for row in response["sql_results"]]
-                values = [row["avg_late_risk"] for row in response["sql_results"]]
-                chart = {
-                    "type": "line",
-                    "data": {
-                        "labels": labels,
-                        "datasets": [{
-                            "label": "Average Late Delivery Risk",
-                            "data": values,
-                            "borderColor": "#4CAF50",
-                            "backgroundColor": "rgba(76, 175, 80, 0.2)",
-                            "fill": True,
-                            "tension": 0.3
-                        }]
-                    },
-                    "options": {
-                        "scales": {
-                            "y": {
-                                "beginAtZero": True,
-                                "title": {
-                                    "display": True,
-                                    "text": "Average Late Delivery Risk"
-                                }
-                            },
-                            "x": {
-                                "title": {
-                                    "display": True,
-                                    "text": "Year"
-                                }
-                            }
-                        },
-                        "plugins": {
-                            "legend": {
-                                "display": True
-                            },
-                            "title": {
-                                "display": True,
-                                "text": "Trend of Late Delivery Risks Over Years"
-                            }
-                        }
-                    }
-                }
-                response["charts"].append(chart)
-
-        # Chart generation for prediction results
-        if response["prediction_results"]:
-            labels = [row["shipping_mode"] for row in response["prediction_results"]]
-            values = [row["avg_predicted_late_risk"] for row in response["prediction_results"]]
-            chart = {
-                "type": "bar",
-                "data": {
-                    "labels": labels,
-                    "datasets": [{
-                        "label": "Predicted Late Delivery Risk",
-                        "data": values,
-                        "backgroundColor": ["#4CAF50", "#2196F3", "#FF9800", "#F44336"],
-                        "borderColor": ["#388E3C", "#1976D2", "#F57C00", "#D32F2F"],
-                        "borderWidth": 1
-                    }]
-                },
-                "options": {
-                    "scales": {
-                        "y": {
-                            "beginAtZero": True,
-                            "title": {
-                                "display": True,
-                                "text": "Predicted Risk"
-                            }
-                        },
-                        "x": {
-                            "title": {
-                                "display": True,
-                                "text": "Shipping Mode"
-                            }
-                        }
-                    },
-                    "plugins": {
-                        "title": {
-                            "display": True,
-                            "text": "Predicted Late Delivery Risks by Shipping Mode"
-                        }
-                    }
-                }
-            }
-            response["charts"].append(chart)
+                    self._copy_sql_metadata(response, sql_result)
+                    self.log_access(response, "allowed", f"User role '{user_role}' executed SQL query successfully.")
+                    session.compliance_score += 2
+                    session.compliance_history.append("Successful SQL query (+2 points)")
+                    session.successful_queries += 1
+
+        if speculator:
+            await speculator.discard_unconsumed()
+
+        # Chart generation for SQL and prediction results (pandas is imported on first use)
+        from utils.chart_utils import build_sql_chart, build_prediction_chart
+        # A truncated result only carries its first page: say so rather than chart it as the whole
+        sql_chart = build_sql_chart(response["sql_results"], partial=response.get("truncated", False))
+        if sql_chart:
+            response["charts"].append(sql_chart)
+        prediction_chart = build_prediction_chart(response["prediction_results"])
+        if prediction_chart:
+            response["charts"].append(prediction_chart)
 
         # Explanation for SQL and prediction results
         if (query_type["requires_sql"] and (response["sql_results"] or response["prediction_results"]) and query_type["requires_explanation"]) or prediction_results:
@@ -616,23 +754,27 @@ Commands:
                 doc_summary.append(f"- From {res['file_name']} (Doc ID {res['doc_id']}, Chunk ID {res['chunk_id']}): {chunk[:200]}... (Similarity: {res['similarity']:.4f})")
             summary_parts.append("Relevant policies and documents:\n" + "\n".join(doc_summary))
 
+        from tabulate import tabulate
         if response["sql_results"]:
-            table_data = []
-            headers = list(response["sql_results"][0].keys())
-            for row in response["sql_results"][:5]:
-                formatted_row = []
-                for key, value in row.items():
-                    if isinstance(value, float) and ("profit" in key.lower() or "total_order_value" in key.lower() or "total_sales" in key.lower()):
-                        formatted_row.append(f"${value:,.2f}")
-                    elif "avg_late_risk" in key or "on_time_delivery_rate" in key:
-                        formatted_row.append(f"{float(value):.3f}")
-                    else:
-                        formatted_row.append(str(value))
-                table_data.append(formatted_row)
+            # Format the first rows column by column instead of row dict by row dict
+            head = response["sql_results"].head(5)
+            headers = head.columns
+            formatted_columns = []
+            for key in headers:
+                column = head.column(key)
+                if column.dtype.kind == "f" and ("profit" in key.lower() or "total_order_value" in key.lower() or "total_sales" in key.lower()):
+                    formatted_columns.append([f"${value:,.2f}" for value in column.tolist()])
+                elif "avg_late_risk" in key or "on_time_delivery_rate" in key:
+                    formatted_columns.append([f"{float(value):.3f}" for value in column.tolist()])
+                else:
+                    formatted_columns.append([str(value) for value in column.tolist()])
+            table_data = list(zip(*formatted_columns))
             table = tabulate(table_data, headers=[self.column_descriptions.get(h, h) for h in headers], tablefmt="grid")
             summary_parts.append(f"Database results:\n{table}")
             if response["charts"]:
                 summary_parts.append("Check out the chart below to visualize the results!")
+                if response["charts"][0].get("partial"):
+                    summary_parts.append("The chart covers only the rows shown; export the result to chart all of it.")
 
         if response["prediction_results"]:
             pred_table_data = []
@@ -667,20 +809,24 @@ Commands:
             response["proactive_suggestions"] = proactive_suggestions
             response["summary"] += f"\nProactive Suggestions: {', '.join(proactive_suggestions)}"
 
-        badge_message = await self.award_badge()
+        badge_message = await self.award_badge(session)
         if badge_message:
             response["badges"].append(badge_message)
             response["summary"] += f"\n{badge_message}"
 
-        response["leaderboard_position"] = await self.update_leaderboard()
+        response["leaderboard_position"], staleness = await self.update_leaderboard(session)
+        response["leaderboard_staleness_ms"] = staleness * 1000
         response["summary"] += f"\nLeaderboard Position: {response['leaderboard_position']}"
-        response["compliance_score"] = self.compliance_score
-        response["summary"] += f"\nCompliance Score: {self.compliance_score}"
+        response["compliance_score"] = session.compliance_score
+        response["summary"] += f"\nCompliance Score: {session.compliance_score}"
 
-        self.conversation_memory.append({
+        session.conversation_memory.append({
             "question": original_question,
             "response": response["summary"]
         })
+        if "policy" in original_question.lower():
+            session.policy_queries += 1
+        self.sessions.mark_dirty(session)
 
         end_time = time.time()
         response["latency_ms"] = (end_time - start_time) * 1000
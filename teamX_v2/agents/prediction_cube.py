@@ -0,0 +1,142 @@
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.sql import text
+from config.settings import PREDICTION_CUBE
+from utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+_DDL = [
+    """CREATE TABLE IF NOT EXISTS prediction_cube (
+        market VARCHAR NOT NULL, year INTEGER NOT NULL, shipping_mode VARCHAR NOT NULL,
+        avg_predicted_late_risk DOUBLE PRECISION NOT NULL, rank INTEGER NOT NULL,
+        PRIMARY KEY (market, year, shipping_mode))""",
+    """CREATE TABLE IF NOT EXISTS prediction_cube_versions (
+        version SERIAL PRIMARY KEY, watermark TIMESTAMP NOT NULL, built_at TIMESTAMPTZ NOT NULL, cells INTEGER NOT NULL)""",
+]
+
+Cell = Tuple[str, int]
+
+
+def cell_key(market: str, year: int) -> Cell:
+    return market.strip().lower(), int(year)
+
+
+def group_cells(rows: Iterable[Tuple[str, int, str, float]]) -> Dict[Cell, List[Dict[str, Any]]]:
+    """{(market, year): [{shipping_mode, avg_predicted_late_risk}, ...]} from rows ordered by rank."""
+    cells: Dict[Cell, List[Dict[str, Any]]] = {}
+    for market, year, shipping_mode, risk in rows:
+        cells.setdefault(cell_key(market, year), []).append(
+            {"shipping_mode": shipping_mode, "avg_predicted_late_risk": float(risk)})
+    return cells
+
+
+class PredictionCube:
+    """
+    Late-delivery-risk predictions scored offline for every (market, year,
+    shipping_mode) cell and served from memory. build() rescores the cells with
+    orders from the last build's watermark day on and publishes a new
+    version; readers re-check the latest version every version_ttl seconds and
+    reload the whole (small) table when it moved. Cells that are missing fall
+    back to live scoring in the caller.
+    """
+    def __init__(self, engine, predictive=None):
+        self.engine = engine
+        self.predictive = predictive
+        self.version: Optional[int] = None
+        self._cells: Dict[Cell, List[Dict[str, Any]]] = {}
+        self._checked = 0.0
+
+    async def create(self):
+        async with self.engine.begin() as conn:
+            for ddl in _DDL:
+                await conn.execute(text(ddl))
+
+    async def build(self, full: bool = False) -> Dict[str, Any]:
+        """Score the (market, year) cells with orders from the watermark's day on (every cell, if full)."""
+        await self.create()
+        start = time.perf_counter()
+        async with self.engine.connect() as conn:
+            until = (await conn.execute(text("SELECT max(order_date) FROM orders"))).scalar()
+            if until is None:
+                return {}
+            since = None if full else (await conn.execute(text(
+                "SELECT watermark FROM prediction_cube_versions ORDER BY version DESC LIMIT 1"))).scalar()
+            if since is None:
+                since = datetime(1, 1, 1)
+            # From the start of the watermark's day, as in the rollups: orders that land
+            # later at or just below the watermark still get their cell rescored
+            pairs = (await conn.execute(text(
+                "SELECT DISTINCT market, CAST(EXTRACT(YEAR FROM order_date) AS INTEGER) FROM orders "
+                "WHERE market IS NOT NULL AND order_date >= :since AND order_date <= :until"
+            ), {"since": datetime.combine(since.date(), datetime.min.time()), "until": until})).fetchall()
+
+        # Score outside the write transaction: the model reads through its own connections
+        scored, failed = {}, []
+        for market, year in pairs:
+            try:
+                results = await self.predictive.predict_late_delivery_risk(market, year)
+            except Exception as e:
+                logger.warning(f"Scoring {market} {year} failed: {str(e)}")
+                results = None
+            if results:
+                scored[(market, year)] = results
+            else:
+                failed.append(f"{market} {year}")
+
+        # A failed cell keeps the old watermark so the next build retries it
+        watermark = since if failed else until
+        async with self.engine.begin() as conn:
+            if full:
+                await conn.execute(text("TRUNCATE prediction_cube"))
+            for (market, year), results in scored.items():
+                await conn.execute(text("DELETE FROM prediction_cube WHERE market = :market AND year = :year"),
+                                   {"market": market, "year": year})
+                await conn.execute(text(
+                    "INSERT INTO prediction_cube (market, year, shipping_mode, avg_predicted_late_risk, rank) "
+                    "VALUES (:market, :year, :shipping_mode, :risk, :rank)"
+                ), [{"market": market, "year": year, "shipping_mode": row["shipping_mode"],
+                     "risk": row["avg_predicted_late_risk"], "rank": rank} for rank, row in enumerate(results)])
+            version = self.version
+            if scored:
+                cells = (await conn.execute(text("SELECT count(DISTINCT (market, year)) FROM prediction_cube"))).scalar()
+                version = (await conn.execute(text(
+                    "INSERT INTO prediction_cube_versions (watermark, built_at, cells) VALUES (:watermark, now(), :cells) "
+                    "RETURNING version"
+                ), {"watermark": watermark, "cells": cells})).scalar()
+        self._checked = 0.0
+        report = {"version": version, "watermark": watermark.isoformat(), "scored": len(scored),
+                  "failed": failed, "ms": round((time.perf_counter() - start) * 1000, 1)}
+        logger.info(f"Prediction cube v{version}: {len(scored)} cells scored, {len(failed)} failed in {report['ms']} ms")
+        return report
+
+    async def refresh_version(self) -> Optional[int]:
+        if time.monotonic() - self._checked < PREDICTION_CUBE["version_ttl"]:
+            return self.version
+        self._checked = time.monotonic()
+        try:
+            async with self.engine.connect() as conn:
+                version = (await conn.execute(text("SELECT max(version) FROM prediction_cube_versions"))).scalar()
+                if version is not None and version != self.version:
+                    rows = (await conn.execute(text(
+                        "SELECT market, year, shipping_mode, avg_predicted_late_risk FROM prediction_cube "
+                        "ORDER BY market, year, rank"))).fetchall()
+                    self._cells = group_cells(rows)
+                    self.version = version
+                    logger.info(f"Loaded prediction cube v{version} ({len(self._cells)} cells)")
+        except Exception as e:
+            logger.debug(f"Prediction cube unavailable: {str(e)}")
+        return self.version
+
+    async def lookup(self, market: str, year: int) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """(predictions, version) for the cell, or None on a miss."""
+        if not PREDICTION_CUBE["enabled"]:
+            return None
+        version = await self.refresh_version()
+        results = self._cells.get(cell_key(market, year))
+        record_cache("prediction_cube", results is not None)
+        if results is None:
+            return None
+        return [dict(row) for row in results], version
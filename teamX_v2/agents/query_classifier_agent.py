@@ -3,18 +3,14 @@ import logging
 import json
 import hashlib
 from typing import Dict
-from transformers import BertTokenizer, BertForSequenceClassification
-import torch
-from redis.asyncio import Redis
+from utils.metrics import record_cache, CLASSIFIER_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 
 class QueryClassifierAgent:
-    def __init__(self, redis_client: Redis):
-        self.redis_client = redis_client
-        self.tokenizer = BertTokenizer.from_pretrained('./bert_finetuned')
-        self.model = BertForSequenceClassification.from_pretrained('./bert_finetuned')
-        self.model.eval()
+    def __init__(self, resources):
+        self.resources = resources
+        self.redis_client = resources.redis_client
         self.intent_map = {0: "mixed", 1: "retrieval", 2: "sql", 3: "predictive", 4: "explanation"}
 
     async def classify_query(self, query: str) -> Dict[str, bool]:
@@ -28,6 +24,7 @@ class QueryClassifierAgent:
 
         # Check Redis cache
         cached_result = await self.redis_client.get(cache_key)
+        record_cache("classification", bool(cached_result))
         if cached_result:
             logger.info("Query classification Redis cache hit")
             return json.loads(cached_result)  # Parse the cached JSON string
@@ -39,6 +36,8 @@ class QueryClassifierAgent:
         else:
             query_parts = [query]
 
+        CLASSIFIER_BATCH_SIZE.observe(len(query_parts))
+
         # Initialize intent flags
         classification = {
             "requires_retrieval": False,
@@ -77,10 +76,16 @@ class QueryClassifierAgent:
         """
         Classify a single query part using BERT.
         """
+        # Run BERT on its own thread-budgeted executor so speculative branches keep the event loop
+        return await self.resources.governor.run("classifier", self._classify_single_query_sync, query)
+
+    def _classify_single_query_sync(self, query: str) -> str:
+        import torch
         # Tokenize and classify using BERT
-        inputs = self.tokenizer(query, return_tensors="pt", padding=True, truncation=True, max_length=128)
+        tokenizer, model = self.resources.classifier
+        inputs = tokenizer(query, return_tensors="pt", padding=True, truncation=True, max_length=128)
         with torch.no_grad():
-            outputs = self.model(**inputs)
+            outputs = model(**inputs)
         logits = outputs.logits
         predicted_class = torch.argmax(logits, dim=1).item()
         intent = self.intent_map.get(predicted_class, "retrieval")  # Default to retrieval if intent not in map
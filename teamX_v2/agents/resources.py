@@ -0,0 +1,140 @@
+import time
+import logging
+import threading
+from typing import Any, Optional, Tuple
+import aiohttp
+from sqlalchemy.ext.asyncio import create_async_engine
+from config.settings import RESOURCES, CPU_GOVERNOR
+from utils.cache_utils import setup_redis
+from utils.memory_cache import ByteBoundedCache, get_cache
+from utils.startup import startup_timer
+from utils.cpu_governor import CPUGovernor
+
+logger = logging.getLogger(__name__)
+
+
+class AgentResources:
+    """
+    Owns the heavy, process-wide objects the agents share: database engine,
+    Redis client, HTTP session, embedding model, intent classifier and the
+    PredictiveAgent. Each is built on first use and exactly once; close()
+    releases whatever was built here, in reverse order. Objects passed in by the
+    caller are shared but left for the caller to close, and the module-level
+    caches handed out by cache() belong to the process, not the container.
+    """
+    def __init__(self, engine=None, redis_client=None, embedding_model=None, settings: Optional[dict] = None,
+                 governor: Optional[CPUGovernor] = None):
+        self.settings = {**RESOURCES, **(settings or {})}
+        self._governor = governor
+        self._engine = engine
+        self._redis_client = redis_client
+        self._embedding_model = embedding_model
+        self._classifier: Optional[Tuple[Any, Any]] = None
+        self._predictive = None
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._owned = set()
+        self._lock = threading.Lock()
+
+    async def start(self):
+        """Connect the async clients the agents need at construction time."""
+        if self._redis_client is None:
+            self._redis_client = await setup_redis(self.settings["redis_host"], self.settings["redis_port"])
+            self._owned.add("redis")
+        return self
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = create_async_engine(
+                self.settings["database_url"],
+                echo=False,
+                pool_size=self.settings["pool_size"],
+                max_overflow=self.settings["max_overflow"],
+            )
+            self._owned.add("engine")
+        return self._engine
+
+    @property
+    def redis_client(self):
+        return self._redis_client
+
+    async def http_session(self) -> aiohttp.ClientSession:
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.settings["http_timeout"])
+            )
+        return self._http_session
+
+    @property
+    def embedding_model(self):
+        # Loaded on first use; the lock keeps worker threads from loading it twice
+        if self._embedding_model is None:
+            with self._lock:
+                if self._embedding_model is None:
+                    start = time.perf_counter()
+                    from sentence_transformers import SentenceTransformer
+                    self._embedding_model = SentenceTransformer(self.settings["embedding_model"])
+                    startup_timer.record("embedding_model", (time.perf_counter() - start) * 1000)
+        return self._embedding_model
+
+    @property
+    def embedding_ready(self) -> bool:
+        return self._embedding_model is not None
+
+    @property
+    def classifier(self) -> Tuple[Any, Any]:
+        """(tokenizer, model) of the fine-tuned BERT intent classifier."""
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    start = time.perf_counter()
+                    from transformers import BertTokenizer, BertForSequenceClassification
+                    path = self.settings["classifier_path"]
+                    model = BertForSequenceClassification.from_pretrained(path)
+                    model.eval()
+                    self._classifier = (BertTokenizer.from_pretrained(path), model)
+                    startup_timer.record("classifier", (time.perf_counter() - start) * 1000)
+        return self._classifier
+
+    def warm_up(self):
+        """Materialize the models in a background thread so the first request need not wait for them."""
+        def load():
+            try:
+                self.embedding_model
+                self.classifier
+            except Exception as e:
+                logger.error(f"Model warm-up failed: {str(e)}")
+        threading.Thread(target=load, name="model-warm-up", daemon=True).start()
+
+    @property
+    def predictive(self):
+        if self._predictive is None:
+            from .predictive_agent import PredictiveAgent
+            self._predictive = PredictiveAgent(self.engine)
+        return self._predictive
+
+    @property
+    def governor(self) -> CPUGovernor:
+        if self._governor is None:
+            self._governor = CPUGovernor(CPU_GOVERNOR["cores"], CPU_GOVERNOR["workers"])
+            self._owned.add("governor")
+        return self._governor
+
+    def cache(self, namespace: str) -> ByteBoundedCache:
+        return get_cache(namespace)
+
+    async def close(self):
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._http_session = None
+        if "governor" in self._owned and self._governor is not None:
+            self._governor.shutdown()
+            self._governor = None
+        if "redis" in self._owned and self._redis_client is not None:
+            await self._redis_client.close()
+            self._redis_client = None
+        if "engine" in self._owned and self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+        self._owned.clear()
+        self._predictive = None
@@ -0,0 +1,196 @@
+import io
+import os
+import csv
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from sqlalchemy.sql import text
+from config.settings import PAGINATION
+from utils.result_set import ResultSet
+from .sql_guard import role_budget, ordered_subquery
+
+logger = logging.getLogger(__name__)
+
+# A query to page through: {"sql": ..., "params": {...} | [...], "columns": [...]}.
+# Named params (dict) run through SQLAlchemy; positional params (list, $n
+# placeholders from the plan cache) run on the asyncpg connection directly.
+Query = Dict[str, Any]
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose bytes are drained after every batch."""
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+class ResultPager:
+    """
+    Pages and exports SQL results with server-side cursors. The first page of a
+    result is returned inline; the rest is reachable through an opaque, signed
+    continuation token that binds the statement to the caller's role and region,
+    so a client can resume but never choose the SQL. Pages re-run the statement
+    with OFFSET/LIMIT in a deterministic order (see ordered_subquery); exports
+    stream it batch by batch as CSV or Parquet.
+    """
+    def __init__(self, engine, redis_client=None):
+        self.engine = engine
+        self.redis_client = redis_client
+        self._secret: Optional[bytes] = None
+
+    async def secret(self) -> bytes:
+        # Every worker must verify every other worker's tokens: use the configured
+        # secret, else one generated once and shared through Redis
+        if self._secret is None:
+            configured = os.environ.get(PAGINATION["secret_env"])
+            if configured:
+                self._secret = configured.encode()
+            elif self.redis_client:
+                await self.redis_client.set(PAGINATION["secret_key"], os.urandom(32).hex(), nx=True)
+                shared = await self.redis_client.get(PAGINATION["secret_key"])
+                self._secret = shared if isinstance(shared, bytes) else shared.encode()
+            else:
+                logger.warning("No result token secret configured; tokens are only valid in this process")
+                self._secret = os.urandom(32)
+        return self._secret
+
+    async def issue(self, query: Query, user_role: str, user_region: str, offset: int) -> str:
+        body = json.dumps({"q": query, "r": user_role, "g": user_region, "o": offset,
+                           "e": int(time.time()) + PAGINATION["token_ttl"]}, separators=(",", ":")).encode()
+        signature = hmac.new(await self.secret(), body, hashlib.sha256).digest()
+        return f"{_b64encode(body)}.{_b64encode(signature)}"
+
+    async def read(self, token: str, user_role: str, user_region: str) -> Dict[str, Any]:
+        try:
+            body_part, signature_part = token.split(".", 1)
+            body = _b64decode(body_part)
+            expected = hmac.new(await self.secret(), body, hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, _b64decode(signature_part)):
+                return {"error": "Invalid page token."}
+            payload = json.loads(body)
+        except (ValueError, TypeError):
+            return {"error": "Invalid page token."}
+        if payload["e"] < time.time():
+            return {"error": "Page token expired; run the query again."}
+        if payload["r"] != user_role or payload["g"] != user_region:
+            return {"error": "Access restricted: page token was issued for a different role or region."}
+        return payload
+
+    async def iter_rows(self, query: Query, user_role: str, offset: int = 0,
+                        limit: Optional[int] = None) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """(columns, rows) batches of the query from offset, read through a server-side cursor."""
+        sql = f"{ordered_subquery(query['sql'], 'page_source')} OFFSET {int(offset)}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        timeout = int(role_budget(user_role)["statement_timeout_ms"])
+        batch_size = PAGINATION["batch_size"]
+        params = query.get("params") or {}
+        async with self.engine.connect() as conn:
+            if isinstance(params, list):
+                driver = (await conn.get_raw_connection()).driver_connection
+                async with driver.transaction():
+                    await driver.execute(f"SET LOCAL statement_timeout = {timeout}")
+                    statement = await driver.prepare(sql)
+                    columns = [attribute.name for attribute in statement.get_attributes()]
+                    batch = []
+                    async for row in statement.cursor(*params, prefetch=batch_size):
+                        batch.append(tuple(row))
+                        if len(batch) >= batch_size:
+                            yield columns, batch
+                            batch = []
+                    yield columns, batch
+            else:
+                async with conn.begin():
+                    await conn.execute(text(f"SET LOCAL statement_timeout = {timeout}"))
+                    result = await conn.stream(text(sql), params)
+                    columns = list(result.keys())
+                    emitted = False
+                    async for batch in result.partitions(batch_size):
+                        emitted = True
+                        yield columns, [tuple(row) for row in batch]
+                    if not emitted:
+                        yield columns, []
+
+    async def page(self, token: str, user_role: str, user_region: str) -> Dict[str, Any]:
+        payload = await self.read(token, user_role, user_region)
+        if "error" in payload:
+            return payload
+        offset, page_size = payload["o"], PAGINATION["page_size"]
+        row_cap = role_budget(user_role)["row_cap"]
+        if offset >= row_cap:
+            return {"error": f"Row limit of {row_cap} reached for role '{user_role}'; use export for the full result."}
+        limit = min(page_size, row_cap - offset)
+        columns, rows = payload["q"].get("columns", []), []
+        async for columns, batch in self.iter_rows(payload["q"], user_role, offset, limit + 1):
+            rows.extend(batch)
+        response = {"sql_results": ResultSet.from_rows(columns, rows[:limit]), "offset": offset}
+        if len(rows) > limit and offset + limit < row_cap:
+            response["next_page_token"] = await self.issue(payload["q"], user_role, user_region, offset + limit)
+        return response
+
+    async def export(self, token: str, user_role: str, user_region: str, fmt: str = "csv") -> Union[Dict[str, Any], AsyncIterator[bytes]]:
+        """Byte stream of the token's full result (from row 0), or an error dict."""
+        payload = await self.read(token, user_role, user_region)
+        if "error" in payload:
+            return payload
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return {"error": "Parquet export requires pyarrow."}
+            return self._export_parquet(payload["q"], user_role)
+        if fmt != "csv":
+            return {"error": f"Unsupported export format '{fmt}'."}
+        return self._export_csv(payload["q"], user_role)
+
+    async def _export_csv(self, query: Query, user_role: str) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header = False
+        async for columns, rows in self.iter_rows(query, user_role, 0, PAGINATION["export_row_cap"]):
+            if not header:
+                writer.writerow(columns)
+                header = True
+            writer.writerows(rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    async def _export_parquet(self, query: Query, user_role: str) -> AsyncIterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        sink = _ChunkSink()
+        writer = None
+        async for columns, rows in self.iter_rows(query, user_role, 0, PAGINATION["export_row_cap"]):
+            # One row group per batch; the schema is fixed by the first batch
+            table = pa.table({name: [row[i] for row in rows] for i, name in enumerate(columns)},
+                             schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+            yield sink.drain()
+        if writer is not None:
+            writer.close()
+        yield sink.drain()
@@ -0,0 +1,252 @@
+import re
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.sql import text
+from config.settings import ROLLUPS
+from utils.result_set import ResultSet
+from .sql_plan_cache import normalize_question
+from .schema_catalog import allowed_tables
+
+logger = logging.getLogger(__name__)
+
+# Daily-grain aggregates of the orders/order_items/shipping joins behind the
+# canonical dashboard questions. Each is refreshed incrementally from a
+# watermark on orders.order_date: the rollup rows from the watermark's day on
+# are cleared and re-aggregated from orders with order_date in
+# [start of that day, max], so orders that land later with a timestamp at or
+# just below the watermark are still folded in. Rows backdated to an earlier
+# day, child rows (order_items, shipping) that land after their order's day
+# was folded in, and later updates (e.g. to late_delivery_risk) are only picked
+# up by a full rebuild (main.py --refresh-rollups --full). answer() therefore
+# serves a rollup only when all its sources are declared append-only in
+# ROLLUPS["append_only"].
+ROLLUP_TABLES = {
+    "orders_by_day": {
+        "sources": ["orders", "customers"],
+        "ddl": """CREATE TABLE IF NOT EXISTS rollup_orders_by_day (
+            order_day DATE NOT NULL, market VARCHAR NOT NULL, segment VARCHAR NOT NULL,
+            order_count BIGINT NOT NULL, PRIMARY KEY (order_day, market, segment))""",
+        "clear": "DELETE FROM rollup_orders_by_day WHERE order_day >= :since",
+        "refresh": """INSERT INTO rollup_orders_by_day
+            SELECT o.order_date::date, COALESCE(o.market, 'Unknown'), COALESCE(c.segment, 'Unknown'), COUNT(o.order_id)
+            FROM orders o JOIN customers c ON o.customer_id = c.customer_id
+            WHERE o.order_date >= :since AND o.order_date <= :until GROUP BY 1, 2, 3""",
+    },
+    "profit_by_day": {
+        "sources": ["orders", "customers", "order_items"],
+        "ddl": """CREATE TABLE IF NOT EXISTS rollup_profit_by_day (
+            order_day DATE NOT NULL, market VARCHAR NOT NULL, segment VARCHAR NOT NULL,
+            total_profit DOUBLE PRECISION NOT NULL, PRIMARY KEY (order_day, market, segment))""",
+        "clear": "DELETE FROM rollup_profit_by_day WHERE order_day >= :since",
+        "refresh": """INSERT INTO rollup_profit_by_day
+            SELECT o.order_date::date, COALESCE(o.market, 'Unknown'), COALESCE(c.segment, 'Unknown'), SUM(oi.profit_per_order)
+            FROM orders o JOIN customers c ON o.customer_id = c.customer_id JOIN order_items oi ON o.order_id = oi.order_id
+            WHERE o.order_date >= :since AND o.order_date <= :until GROUP BY 1, 2, 3""",
+    },
+    "shipping_by_day": {
+        "sources": ["orders", "shipping"],
+        "ddl": """CREATE TABLE IF NOT EXISTS rollup_shipping_by_day (
+            order_day DATE NOT NULL, market VARCHAR NOT NULL, shipping_mode VARCHAR NOT NULL,
+            late_risk_sum BIGINT NOT NULL, shipment_count BIGINT NOT NULL, PRIMARY KEY (order_day, market, shipping_mode))""",
+        "clear": "DELETE FROM rollup_shipping_by_day WHERE order_day >= :since",
+        "refresh": """INSERT INTO rollup_shipping_by_day
+            SELECT o.order_date::date, COALESCE(o.market, 'Unknown'), COALESCE(s.shipping_mode, 'Unknown'),
+                   SUM(s.late_delivery_risk), COUNT(*)
+            FROM orders o JOIN shipping s ON o.order_id = s.order_id
+            WHERE o.order_date >= :since AND o.order_date <= :until GROUP BY 1, 2, 3""",
+    },
+    "customer_value": {
+        "sources": ["orders", "customers", "order_items"],
+        "ddl": """CREATE TABLE IF NOT EXISTS rollup_customer_value (
+            customer_id INTEGER PRIMARY KEY, total_order_value DOUBLE PRECISION NOT NULL)""",
+        # Not keyed by day: customers with orders in the window are re-totalled over all their orders
+        "clear": """DELETE FROM rollup_customer_value WHERE customer_id IN
+            (SELECT customer_id FROM orders WHERE order_date >= :since AND order_date <= :until)""",
+        "refresh": """INSERT INTO rollup_customer_value
+            SELECT o.customer_id, SUM(oi.profit_per_order)
+            FROM orders o JOIN order_items oi ON o.order_id = oi.order_id
+            WHERE o.order_date <= :until AND o.customer_id IN
+                (SELECT customer_id FROM orders WHERE order_date >= :since AND order_date <= :until)
+            GROUP BY 1""",
+    },
+}
+
+_WATERMARKS_DDL = """CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name VARCHAR PRIMARY KEY, watermark TIMESTAMP NOT NULL, refreshed_at TIMESTAMPTZ NOT NULL)"""
+
+
+def _values(literals, kind: str) -> List[Any]:
+    return [value for k, value in literals if k == kind]
+
+
+def _year_filter(literals, column: str = "order_day") -> Tuple[str, Dict[str, Any]]:
+    years = _values(literals, "year")
+    if not years:
+        return "", {}
+    return f" WHERE CAST(EXTRACT(YEAR FROM {column}) AS INTEGER) = ANY(:years)", {"years": years}
+
+
+def _orders_by_segment(literals):
+    return ("orders_by_day", "SELECT segment, SUM(order_count) AS order_count FROM rollup_orders_by_day "
+                             "GROUP BY segment ORDER BY segment", {})
+
+
+def _orders_by_segment_and_region(literals):
+    return ("orders_by_day", "SELECT segment, market AS region, SUM(order_count) AS order_count FROM rollup_orders_by_day "
+                             "GROUP BY segment, market ORDER BY segment, market", {})
+
+
+def _profit_by_segment(literals):
+    where, params = _year_filter(literals)
+    limit = _values(literals, "limit")
+    sql = f"SELECT segment, SUM(total_profit) AS total_profit FROM rollup_profit_by_day{where} GROUP BY segment ORDER BY total_profit DESC"
+    if limit:
+        sql += " LIMIT :limit"
+        params["limit"] = limit[0]
+    return "profit_by_day", sql, params
+
+
+def _late_risk_by_mode(literals, ascending: bool = False, on_time: bool = False):
+    where, params = _year_filter(literals)
+    markets = _values(literals, "market")
+    if markets:
+        where = (where + " AND" if where else " WHERE") + " market = :market"
+        params["market"] = markets[0]
+    value = "1 - SUM(late_risk_sum)::float / SUM(shipment_count)" if on_time else "SUM(late_risk_sum)::float / SUM(shipment_count)"
+    alias = "on_time_delivery_rate" if on_time else "avg_late_risk"
+    return ("shipping_by_day", f"SELECT shipping_mode, {value} AS {alias} FROM rollup_shipping_by_day{where} "
+                               f"GROUP BY shipping_mode ORDER BY {alias} {'ASC' if ascending else 'DESC'} LIMIT 1", params)
+
+
+def _late_risk_trend(literals):
+    return ("shipping_by_day", "SELECT EXTRACT(YEAR FROM order_day) AS year, SUM(late_risk_sum)::float / SUM(shipment_count) "
+                               "AS avg_late_risk FROM rollup_shipping_by_day GROUP BY 1 ORDER BY year", {})
+
+
+def _top_customers(literals):
+    return ("customer_value", "SELECT customer_id, total_order_value FROM rollup_customer_value "
+                              "ORDER BY total_order_value DESC LIMIT :limit", {"limit": _values(literals, "limit")[0]})
+
+
+# Question templates (see normalize_question, punctuation removed) answerable from a rollup
+ROUTES: List[Tuple[re.Pattern, Callable]] = [(re.compile(pattern), build) for pattern, build in [
+    (r"^(what is the )?total number of orders (per|by) customer segment$", _orders_by_segment),
+    (r"^(what is the )?distribution of orders by customer segment and region$", _orders_by_segment_and_region),
+    (r"^(what is the )?total profit by customer segment( (in|for) \{year\}| across \{year\} and \{year\})?( only top \{limit\} segments)?$",
+     _profit_by_segment),
+    (r"^which shipping mode has the highest average late delivery risk( for orders)?( in \{market\})?( in \{year\})?$",
+     _late_risk_by_mode),
+    (r"^which shipping mode has the lowest rate of on-time deliveries$",
+     lambda literals: _late_risk_by_mode(literals, ascending=True, on_time=True)),
+    (r"^(what is the )?trend of late delivery risks? over the years$", _late_risk_trend),
+    (r"^who are our top \{limit\} customers by total order value$", _top_customers),
+]]
+
+
+def route(question: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """(rollup, sql, params) answering the question from a rollup, or None."""
+    template, literals = normalize_question(question)
+    template = re.sub(r"\s+", " ", re.sub(r"[?,.!]", "", template)).strip()
+    for pattern, build in ROUTES:
+        if pattern.match(template):
+            return build(literals)
+    return None
+
+
+class RollupStore:
+    """
+    Maintains the rollup tables and answers matching questions from them. The
+    watermark/refresh time of each rollup is read at most every meta_ttl
+    seconds; rollups that are missing or older than max_staleness are skipped
+    and the question goes to the normal SQL path.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._meta_loaded = 0.0
+
+    async def create(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(text(_WATERMARKS_DDL))
+            for spec in ROLLUP_TABLES.values():
+                await conn.execute(text(spec["ddl"]))
+
+    async def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Re-aggregate each rollup from its watermark's day on (everything, if full)."""
+        await self.create()
+        report = {}
+        for name, spec in ROLLUP_TABLES.items():
+            start = time.perf_counter()
+            async with self.engine.begin() as conn:
+                until = (await conn.execute(text("SELECT max(order_date) FROM orders"))).scalar()
+                if until is None:
+                    continue
+                since = (await conn.execute(text("SELECT watermark FROM rollup_watermarks WHERE name = :name"),
+                                            {"name": name})).scalar()
+                if full or since is None:
+                    await conn.execute(text(f"TRUNCATE rollup_{name}"))
+                    since = datetime(1, 1, 1)
+                # Half-open at the start of the watermark's day: that day is always
+                # re-aggregated, so late orders at or below the watermark are not lost
+                window = {"since": datetime.combine(since.date(), datetime.min.time()), "until": until}
+                await conn.execute(text(spec["clear"]), window)
+                await conn.execute(text(spec["refresh"]), window)
+                # Watermark and data commit together, so readers never see one without the other
+                await conn.execute(text(
+                    "INSERT INTO rollup_watermarks (name, watermark, refreshed_at) VALUES (:name, :until, now()) "
+                    "ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, refreshed_at = EXCLUDED.refreshed_at"
+                ), {"name": name, "until": until})
+            report[name] = {"watermark": until.isoformat(), "ms": round((time.perf_counter() - start) * 1000, 1)}
+            logger.info(f"Rollup '{name}' refreshed up to {until} in {report[name]['ms']} ms")
+        self._meta_loaded = 0.0
+        return report
+
+    async def freshness(self) -> Dict[str, Dict[str, Any]]:
+        if time.monotonic() - self._meta_loaded < ROLLUPS["meta_ttl"]:
+            return self._meta
+        self._meta_loaded = time.monotonic()
+        try:
+            async with self.engine.connect() as conn:
+                rows = (await conn.execute(text("SELECT name, watermark, refreshed_at FROM rollup_watermarks"))).mappings().all()
+            self._meta = {row["name"]: {"watermark": row["watermark"], "refreshed_at": row["refreshed_at"]} for row in rows}
+        except Exception as e:
+            logger.debug(f"Rollups unavailable: {str(e)}")
+            self._meta = {}
+        return self._meta
+
+    async def answer(self, question: str, user_role: Optional[str], user_region: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Result dict shaped like the SQL agent's, or None if no usable rollup matches."""
+        if user_region not in (None, "", "all"):
+            return None
+        routed = route(question)
+        if routed is None:
+            return None
+        name, sql, params = routed
+        sources = set(ROLLUP_TABLES[name]["sources"])
+        if not sources <= set(allowed_tables(user_role)):
+            return None
+        if not sources <= set(ROLLUPS["append_only"]):
+            logger.debug(f"Rollup '{name}' has sources that are not append-only; answering live")
+            return None
+        meta = (await self.freshness()).get(name)
+        if meta is None:
+            return None
+        age = (datetime.now(timezone.utc) - meta["refreshed_at"]).total_seconds()
+        if age > ROLLUPS["max_staleness"]:
+            logger.info(f"Rollup '{name}' is {age:.0f}s old; answering live")
+            return None
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text(sql), params)
+            results = ResultSet.from_rows(list(result.keys()), result.fetchall())
+        return {
+            "results": results,
+            "sql_query": sql,
+            "freshness": {
+                "source": f"rollup_{name}",
+                "data_through": meta["watermark"].isoformat(),
+                "refreshed_at": meta["refreshed_at"].isoformat(),
+                "age_seconds": round(age, 1),
+            },
+        }
@@ -0,0 +1,199 @@
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional
+from sqlalchemy.sql import text
+from config.settings import SCHEMA_CATALOG, USER_ROLES, ROLE_HIERARCHY
+from utils.cache_keys import content_digest
+from .example_store import render_schema
+
+logger = logging.getLogger(__name__)
+
+# Cheap change detection: column layout, index definitions and the last
+# ANALYZE of each table. Any DDL or stats refresh changes the fingerprint.
+_FINGERPRINT_SQL = """
+SELECT
+    (SELECT md5(string_agg(table_name || '.' || column_name || ':' || data_type, ',' ORDER BY table_name, ordinal_position))
+     FROM information_schema.columns WHERE table_schema = :schema) AS columns,
+    (SELECT md5(string_agg(indexdef, ',' ORDER BY indexname)) FROM pg_indexes WHERE schemaname = :schema) AS indexes,
+    (SELECT max(greatest(last_analyze, last_autoanalyze))::text FROM pg_stat_user_tables WHERE schemaname = :schema) AS analyzed
+"""
+
+_COLUMNS_SQL = """
+SELECT table_name, column_name, data_type
+FROM information_schema.columns
+WHERE table_schema = :schema
+ORDER BY table_name, ordinal_position
+"""
+
+_KEYS_SQL = """
+SELECT tc.table_name, kcu.column_name, tc.constraint_type, ccu.table_name AS ref_table
+FROM information_schema.table_constraints tc
+JOIN information_schema.key_column_usage kcu
+  ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
+LEFT JOIN information_schema.constraint_column_usage ccu
+  ON tc.constraint_type = 'FOREIGN KEY' AND tc.constraint_name = ccu.constraint_name AND tc.table_schema = ccu.table_schema
+WHERE tc.table_schema = :schema AND tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY')
+"""
+
+_INDEXES_SQL = """
+SELECT tablename, indexdef FROM pg_indexes
+WHERE schemaname = :schema AND indexname NOT LIKE '%\\_pkey'
+ORDER BY tablename, indexname
+"""
+
+_STATS_SQL = """
+SELECT tablename, attname, n_distinct, (most_common_vals::text)::text[] AS common_values
+FROM pg_stats WHERE schemaname = :schema
+"""
+
+_ROWS_SQL = """
+SELECT c.relname, c.reltuples::bigint AS row_estimate
+FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = :schema AND c.relkind IN ('r', 'p')
+"""
+
+_TYPE_NAMES = {
+    "character varying": "VARCHAR",
+    "character": "CHAR",
+    "timestamp without time zone": "TIMESTAMP",
+    "timestamp with time zone": "TIMESTAMPTZ",
+    "double precision": "FLOAT",
+    "real": "FLOAT",
+}
+
+
+def allowed_tables(user_role: str) -> List[str]:
+    """Tables a role may query: its allowed_data plus that of the roles it oversees."""
+    allowed = set(USER_ROLES.get(user_role, {}).get("allowed_data", []))
+    for sub_role in ROLE_HIERARCHY.get(user_role, []):
+        allowed.update(USER_ROLES.get(sub_role, {}).get("allowed_data", []))
+    return sorted(allowed)
+
+
+def _describe_column(column: Dict[str, Any], rows: int, visible: set) -> str:
+    parts = [_TYPE_NAMES.get(column["type"], column["type"].upper())]
+    if column.get("pk"):
+        parts.append("PK")
+    if column.get("fk") and column["fk"] in visible:
+        parts.append(f"FK to {column['fk']}")
+    n_distinct = column.get("n_distinct")
+    if n_distinct:
+        # Negative n_distinct is a fraction of the row count
+        distinct = int(-n_distinct * rows) if n_distinct < 0 else int(n_distinct)
+        values = column.get("common_values") or []
+        if values and distinct <= SCHEMA_CATALOG["max_distinct_for_values"]:
+            shown = ", ".join(f"'{v}'" for v in values[:SCHEMA_CATALOG["max_common_values"]])
+            parts.append(f"{distinct} values: {shown}")
+        elif distinct > 0:
+            parts.append(f"~{distinct} distinct")
+    return f"{column['name']} ({', '.join(parts)})"
+
+
+class SchemaCatalog:
+    """
+    Prompt-ready schema descriptions introspected from Postgres (columns, keys,
+    indexes, row estimates and pg_stats cardinalities/common values). The
+    catalog is shared through Redis and rebuilt only when its fingerprint
+    changes; the fingerprint itself is re-checked at most every check_interval
+    seconds. Descriptions are filtered to the tables a role may query.
+    """
+    def __init__(self, engine, redis_client=None, schema: str = SCHEMA_CATALOG["schema"]):
+        self.engine = engine
+        self.redis_client = redis_client
+        self.schema = schema
+        self.catalog: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+
+    async def _fetch(self, conn, sql: str) -> List[Any]:
+        return (await conn.execute(text(sql), {"schema": self.schema})).mappings().all()
+
+    async def fingerprint(self, conn) -> str:
+        row = (await self._fetch(conn, _FINGERPRINT_SQL))[0]
+        return content_digest(dict(row))
+
+    async def introspect(self, conn) -> Dict[str, Dict[str, Any]]:
+        tables: Dict[str, Dict[str, Any]] = {}
+        for row in await self._fetch(conn, _COLUMNS_SQL):
+            table = tables.setdefault(row["table_name"], {"columns": {}, "indexes": [], "rows": 0})
+            table["columns"][row["column_name"]] = {"name": row["column_name"], "type": row["data_type"]}
+        for row in await self._fetch(conn, _KEYS_SQL):
+            column = tables.get(row["table_name"], {}).get("columns", {}).get(row["column_name"])
+            if column is None:
+                continue
+            if row["constraint_type"] == "PRIMARY KEY":
+                column["pk"] = True
+            elif row["ref_table"]:
+                column["fk"] = row["ref_table"]
+        for row in await self._fetch(conn, _INDEXES_SQL):
+            if row["tablename"] in tables:
+                tables[row["tablename"]]["indexes"].append(row["indexdef"])
+        for row in await self._fetch(conn, _STATS_SQL):
+            column = tables.get(row["tablename"], {}).get("columns", {}).get(row["attname"])
+            if column is not None:
+                column["n_distinct"] = row["n_distinct"]
+                column["common_values"] = list(row["common_values"] or [])
+        for row in await self._fetch(conn, _ROWS_SQL):
+            if row["relname"] in tables:
+                tables[row["relname"]]["rows"] = max(int(row["row_estimate"]), 0)
+        return tables
+
+    async def _read_shared(self) -> Optional[Dict[str, Any]]:
+        if not self.redis_client:
+            return None
+        try:
+            cached = await self.redis_client.get(SCHEMA_CATALOG["redis_key"])
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            logger.warning(f"Failed to read schema catalog from Redis: {str(e)}")
+            return None
+
+    async def _write_shared(self, catalog: Dict[str, Any]):
+        if self.redis_client:
+            try:
+                await self.redis_client.set(SCHEMA_CATALOG["redis_key"], json.dumps(catalog))
+            except Exception as e:
+                logger.warning(f"Failed to store schema catalog in Redis: {str(e)}")
+
+    async def load(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Current catalog, re-introspected only if the database changed. None if unavailable."""
+        now = time.time()
+        if not force and self.catalog and now - self._checked_at < SCHEMA_CATALOG["check_interval"]:
+            return self.catalog
+        shared = await self._read_shared()
+        if not force and shared and now - shared.get("checked_at", 0) < SCHEMA_CATALOG["check_interval"]:
+            self.catalog, self._checked_at = shared, shared["checked_at"]
+            return self.catalog
+        try:
+            async with self.engine.connect() as conn:
+                fingerprint = await self.fingerprint(conn)
+                current = self.catalog if self.catalog and self.catalog["fingerprint"] == fingerprint else shared
+                if force or not current or current.get("fingerprint") != fingerprint:
+                    start = time.perf_counter()
+                    current = {"fingerprint": fingerprint, "tables": await self.introspect(conn)}
+                    logger.info(f"Schema catalog rebuilt: {len(current['tables'])} tables in "
+                                f"{(time.perf_counter() - start) * 1000:.0f} ms")
+        except Exception as e:
+            logger.warning(f"Schema introspection failed, keeping previous catalog: {str(e)}")
+            return self.catalog or shared
+        current["checked_at"] = now
+        self.catalog, self._checked_at = current, now
+        await self._write_shared(current)
+        return self.catalog
+
+    def tables_for(self, user_role: str) -> Dict[str, Dict[str, Any]]:
+        """Role-filtered tables in the {"line", "indexes"} form ExampleStore renders."""
+        if not self.catalog:
+            return {}
+        visible = set(allowed_tables(user_role)) & set(self.catalog["tables"])
+        described = {}
+        for name in sorted(visible):
+            table = self.catalog["tables"][name]
+            columns = ", ".join(_describe_column(c, table["rows"], visible) for c in table["columns"].values())
+            rows = f" (~{table['rows']} rows)" if table["rows"] else ""
+            described[name] = {"line": f"- {name}{rows}: {columns}", "indexes": [f"- {d};" for d in table["indexes"]]}
+        return described
+
+    def render(self, user_role: str) -> str:
+        tables = self.tables_for(user_role)
+        return render_schema(tables, list(tables)) if tables else ""
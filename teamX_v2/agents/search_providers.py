@@ -0,0 +1,167 @@
+import os
+import re
+import math
+import asyncio
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A search result: {"snippet": str, "score": float in [0, 1], "source": str}
+SearchHit = Dict[str, Any]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by context for from how in is it of on or our the to we what which why with".split()
+)
+_K1, _B = 1.5, 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class SearchProvider(ABC):
+    """Answers a search query with up to num hits, best first."""
+    name = "base"
+
+    @abstractmethod
+    async def search(self, query: str, num: int) -> List[SearchHit]:
+        ...
+
+
+class SerperProvider(SearchProvider):
+    name = "serper"
+
+    def __init__(self, serper_api_key: str, http_session):
+        # http_session: async context manager factory yielding an aiohttp session
+        self.serper_api_key = serper_api_key
+        self.http_session = http_session
+
+    async def search(self, query: str, num: int) -> List[SearchHit]:
+        headers = {
+            "X-API-KEY": self.serper_api_key,
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "q": query,
+            "num": num
+        }
+        async with self.http_session() as session:
+            async with session.post("https://google.serper.dev/search", headers=headers, json=payload) as response:
+                response.raise_for_status()
+                result = await response.json()
+        # Serper ranks but does not score; its hits are taken as they come
+        return [{"snippet": item["snippet"], "score": 1.0, "source": item.get("link", "")}
+                for item in result.get("organic", [])[:num] if "snippet" in item]
+
+
+_INDEX_SCHEMA = """
+CREATE TABLE passages (id INTEGER PRIMARY KEY, text TEXT NOT NULL, source TEXT NOT NULL, length INTEGER NOT NULL);
+CREATE TABLE postings (term TEXT NOT NULL, passage_id INTEGER NOT NULL, tf INTEGER NOT NULL);
+CREATE TABLE stats (passages INTEGER NOT NULL, avg_length REAL NOT NULL);
+"""
+
+
+def build_index(corpus_dir: str, index_path: str) -> Dict[str, Any]:
+    """Index every paragraph of the .txt/.md files under corpus_dir into a SQLite BM25 postings file."""
+    passages, postings = [], []
+    for root, _, files in os.walk(corpus_dir):
+        for filename in sorted(files):
+            if not filename.endswith((".txt", ".md")):
+                continue
+            path = os.path.join(root, filename)
+            with open(path, encoding="utf-8") as f:
+                paragraphs = [" ".join(p.split()) for p in re.split(r"\n\s*\n", f.read())]
+            for paragraph in paragraphs:
+                terms = Counter(tokenize(paragraph))
+                if not terms:
+                    continue
+                passage_id = len(passages)
+                passages.append((passage_id, paragraph, os.path.relpath(path, corpus_dir), sum(terms.values())))
+                postings.extend((term, passage_id, tf) for term, tf in terms.items())
+    tmp_path = index_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            conn.executescript(_INDEX_SCHEMA)
+            conn.executemany("INSERT INTO passages VALUES (?, ?, ?, ?)", passages)
+            conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+            conn.execute("CREATE INDEX idx_postings_term ON postings (term)")
+            avg_length = sum(p[3] for p in passages) / len(passages) if passages else 0.0
+            conn.execute("INSERT INTO stats VALUES (?, ?)", (len(passages), avg_length))
+    finally:
+        conn.close()
+    os.replace(tmp_path, index_path)
+    terms = len({term for term, _, _ in postings})
+    logger.info(f"Indexed {len(passages)} passages, {terms} terms from {corpus_dir}")
+    return {"passages": len(passages), "terms": terms, "index_path": index_path}
+
+
+class LocalIndexProvider(SearchProvider):
+    """
+    BM25 over a curated reference corpus. The index is a SQLite postings file
+    opened read-only per process, and a search reads only the postings of its
+    own terms, so a one-request --api-mode process never loads the corpus.
+    Scores are normalized by the best score the query could reach, so a
+    threshold means the same thing for short and long queries.
+    """
+    name = "local"
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            try:
+                self._conn = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True, check_same_thread=False)
+                self._stats = self._conn.execute("SELECT passages, avg_length FROM stats").fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Local search index unavailable: {str(e)}")
+                self._conn, self._stats = None, (0, 0.0)
+        return self._conn
+
+    def _search(self, terms: List[str], num: int) -> List[SearchHit]:
+        with self._lock:
+            conn = self._connection()
+            count, avg_length = self._stats
+            if conn is None or not count:
+                return []
+            unique = sorted(set(terms))
+            placeholders = ",".join("?" * len(unique))
+            postings: Dict[str, List[tuple]] = {}
+            for term, passage_id, tf, length in conn.execute(
+                    f"SELECT o.term, o.passage_id, o.tf, p.length FROM postings o JOIN passages p ON p.id = o.passage_id "
+                    f"WHERE o.term IN ({placeholders})", unique):
+                postings.setdefault(term, []).append((passage_id, tf, length))
+            scores, best_possible = {}, 0.0
+            for term in terms:
+                posting = postings.get(term, ())
+                # Terms the corpus has never seen still count towards the best possible score
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                best_possible += idf * (_K1 + 1)
+                for passage_id, tf, length in posting:
+                    norm = tf + _K1 * (1 - _B + _B * length / avg_length)
+                    scores[passage_id] = scores.get(passage_id, 0.0) + idf * tf * (_K1 + 1) / norm
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:num]
+            passages = {pid: (text, source) for pid, text, source in conn.execute(
+                f"SELECT id, text, source FROM passages WHERE id IN ({','.join('?' * len(ranked))})",
+                [pid for pid, _ in ranked])} if ranked else {}
+        return [{"snippet": passages[pid][0], "score": min(score / best_possible, 1.0), "source": passages[pid][1]}
+                for pid, score in ranked]
+
+    async def search(self, query: str, num: int) -> List[SearchHit]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+        return await asyncio.to_thread(self._search, terms, num)
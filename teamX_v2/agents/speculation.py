@@ -0,0 +1,110 @@
+import time
+import asyncio
+import logging
+import contextvars
+from typing import Any, Awaitable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Usage ledger for the branch currently running; set per task so that LLM calls
+# made from a speculative branch are charged to that branch only.
+_branch_usage: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("branch_usage", default=None)
+
+
+def record_llm_usage(prompt_tokens: int, completion_tokens: int):
+    usage = _branch_usage.get()
+    if usage is not None:
+        usage["llm_calls"] += 1
+        usage["llm_tokens"] += prompt_tokens + completion_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic used when the LLM API does not report usage (~4 chars per token)
+    return max(1, len(text) // 4) if text else 0
+
+
+class SpeculativeBranch:
+    def __init__(self, name: str, coro: Awaitable[Any]):
+        self.name = name
+        self.usage = {"llm_calls": 0, "llm_tokens": 0}
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.task = asyncio.create_task(self._run(coro))
+
+    async def _run(self, coro: Awaitable[Any]) -> Any:
+        # create_task copied the caller's context, so this only affects this branch
+        _branch_usage.set(self.usage)
+        try:
+            return await coro
+        finally:
+            self.end_time = time.time()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return ((self.end_time or time.time()) - self.start_time) * 1000
+
+    async def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Discarded speculative branch '{self.name}' failed: {str(e)}")
+
+
+class Speculator:
+    """
+    Starts data branches (retrieval, SQL) concurrently with intent classification.
+    Once the intent is known, needed branches are adopted and the rest cancelled.
+    """
+    def __init__(self, policy: Dict[str, bool]):
+        self.policy = policy
+        self.branches: Dict[str, SpeculativeBranch] = {}
+        self.consumed = set()
+        self.report: Dict[str, Any] = {"branches": {}, "classification_ms": 0.0}
+
+    def start(self, name: str, coro_factory):
+        if self.policy.get(name):
+            self.branches[name] = SpeculativeBranch(name, coro_factory())
+
+    async def resolve(self, needed: Dict[str, bool], classification_ms: float):
+        self.report["classification_ms"] = classification_ms
+        for name, branch in self.branches.items():
+            if needed.get(name):
+                # Work done before classification finished came off the critical path
+                self.report["branches"][name] = {
+                    "used": True,
+                    "saved_ms": min(branch.elapsed_ms, classification_ms),
+                }
+            else:
+                await branch.cancel()
+                self.report["branches"][name] = self._waste(branch)
+        if self.branches:
+            logger.info(f"Speculative execution report: {self.report}")
+
+    def take(self, name: str) -> Optional[asyncio.Task]:
+        branch = self.branches.get(name)
+        if branch and self.report["branches"].get(name, {}).get("used"):
+            self.consumed.add(name)
+            return branch.task
+        return None
+
+    async def discard_unconsumed(self):
+        # Branches the intent needed but the caller did not adopt (e.g. hybrid queries
+        # that re-run each part separately) are wasted as well.
+        for name, branch in self.branches.items():
+            if name in self.consumed or not self.report["branches"].get(name, {}).get("used"):
+                continue
+            await branch.cancel()
+            self.report["branches"][name] = self._waste(branch)
+
+    @staticmethod
+    def _waste(branch: SpeculativeBranch) -> Dict[str, Any]:
+        return {
+            "used": False,
+            "wasted_ms": branch.elapsed_ms,
+            "wasted_llm_calls": branch.usage["llm_calls"],
+            "wasted_llm_tokens": branch.usage["llm_tokens"],
+        }
@@ -0,0 +1,203 @@
+import re
+import json
+import time
+import logging
+import contextvars
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from config.settings import SQL_GUARD
+from utils.cache_keys import content_digest
+from utils.metrics import SQL_GUARD_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+# Quoted strings/identifiers, comments and parentheses, in the order they can open
+_NESTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|[()]", re.DOTALL)
+
+def role_budget(user_role: Optional[str]) -> Dict[str, Any]:
+    return {**SQL_GUARD["budgets"]["default"], **SQL_GUARD["budgets"].get(user_role or "", {})}
+
+
+def has_order_by(sql: str) -> bool:
+    """True if the statement itself (not a subquery, window, string or comment) has an ORDER BY."""
+    parts, depth, last = [], 0, 0
+    for match in _NESTED.finditer(sql):
+        if depth == 0:
+            parts.append(sql[last:match.start()])
+        token = match.group()
+        depth += 1 if token == "(" else -1 if token == ")" and depth else 0
+        last = match.end()
+    if depth == 0:
+        parts.append(sql[last:])
+    return bool(_ORDER_BY.search(" ".join(parts)))
+
+
+def ordered_subquery(sql: str, alias: str) -> str:
+    """
+    The statement as a subquery named alias, ordered by the whole row when it
+    has no ORDER BY of its own, so every re-run (first page, later pages,
+    exports) returns its rows in the same order. The newline keeps a trailing
+    -- comment from swallowing the closing paren.
+    """
+    statement = sql.strip().rstrip(";").rstrip()
+    wrapped = f"SELECT * FROM ({statement}\n) AS {alias}"
+    return wrapped if has_order_by(statement) else f"{wrapped} ORDER BY {alias}"
+
+
+def cap_rows(sql: str, row_cap: int) -> str:
+    """Bound a statement to row_cap + 1 rows, so a truncated result can be detected."""
+    # Wrapping leaves the statement's own LIMIT/OFFSET/FETCH intact
+    return f"{ordered_subquery(sql, 'capped')} LIMIT {row_cap + 1}"
+
+
+def plan_shape(node: Dict[str, Any]) -> Tuple:
+    # Node types, join types and relations only: the same query shape gives the
+    # same fingerprint regardless of literal values or estimates
+    return (node.get("Node Type"), node.get("Join Type"), node.get("Relation Name"),
+            tuple(plan_shape(child) for child in node.get("Plans", [])))
+
+
+def _cartesian_joins(node: Dict[str, Any]) -> List[str]:
+    found = []
+    children = node.get("Plans", [])
+    if (node.get("Node Type") == "Nested Loop" and "Join Filter" not in node
+            and len(children) == 2 and all(c.get("Node Type") == "Seq Scan" for c in children)):
+        found.append(" x ".join(c.get("Relation Name", "?") for c in children))
+    for child in children:
+        found.extend(_cartesian_joins(child))
+    return found
+
+
+class GuardState:
+    """What the guard saw and decided for the statements of one guarded call."""
+    __slots__ = ("user_role", "budget", "row_cap", "offenders", "rejection", "fingerprint", "statement", "cost", "rows", "capped")
+
+    def __init__(self, user_role: Optional[str], budget: Dict[str, Any], offenders: set, row_limit: Optional[int] = None):
+        self.user_role = user_role
+        self.budget = budget
+        self.row_cap = min(budget["row_cap"], row_limit) if row_limit else budget["row_cap"]
+        self.offenders = offenders
+        self.rejection: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self.statement: Optional[str] = None
+        self.cost = 0.0
+        self.rows = 0.0
+        self.capped = False
+
+
+_guard_state: contextvars.ContextVar[Optional[GuardState]] = contextvars.ContextVar("sql_guard_state", default=None)
+
+
+class SQLBudgetExceeded(Exception):
+    pass
+
+
+class SQLGuard:
+    """
+    Preflight for generated SQL. While guarded() is active, every SELECT sent
+    through the engine is first EXPLAINed under a per-role statement_timeout;
+    statements over the role's cost or row budget, cartesian joins and plan
+    shapes that were rejected repeatedly are refused before they run, and the
+    rest are capped to the role's row limit. The hook runs inside SQLAlchemy's
+    execution, so it covers queries issued by the SQL agent itself; Redis I/O
+    for the offender list happens around the call, never inside the hook.
+    """
+    def __init__(self, engine, redis_client=None):
+        self.engine = engine
+        self.redis_client = redis_client
+        self._offenders: set = set()
+        self._offenders_loaded = 0.0
+        sync_engine = getattr(engine, "sync_engine", None)
+        if sync_engine is not None and not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute, retval=True)
+
+    async def load_offenders(self) -> set:
+        if not self.redis_client or time.monotonic() - self._offenders_loaded < SQL_GUARD["offender_refresh"]:
+            return self._offenders
+        try:
+            counts = await self.redis_client.hgetall(SQL_GUARD["offenders_key"])
+            self._offenders = {
+                (fp.decode() if isinstance(fp, bytes) else fp) for fp, count in counts.items()
+                if int(count) >= SQL_GUARD["offender_threshold"]
+            }
+            self._offenders_loaded = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Failed to load SQL plan offenders: {str(e)}")
+        return self._offenders
+
+    async def record_offense(self, state: GuardState):
+        if not self.redis_client or not state.fingerprint:
+            return
+        try:
+            count = await self.redis_client.hincrby(SQL_GUARD["offenders_key"], state.fingerprint, 1)
+            await self.redis_client.hset(f"{SQL_GUARD['offenders_key']}:sample", state.fingerprint,
+                                         json.dumps({"role": state.user_role, "cost": state.cost, "sql": state.statement}))
+            if count >= SQL_GUARD["offender_threshold"]:
+                self._offenders.add(state.fingerprint)
+        except Exception as e:
+            logger.warning(f"Failed to record SQL plan offense: {str(e)}")
+
+    @asynccontextmanager
+    async def guarded(self, user_role: Optional[str], row_limit: Optional[int] = None):
+        """Guard every statement executed through the engine in this context, returning at most row_limit rows."""
+        state = GuardState(user_role, role_budget(user_role), await self.load_offenders(), row_limit)
+        token = _guard_state.set(state)
+        try:
+            yield state
+        finally:
+            _guard_state.reset(token)
+            if state.rejection:
+                await self.record_offense(state)
+
+
+def _explain(cursor, statement: str, parameters) -> Dict[str, Any]:
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    plan = cursor.fetchall()[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def current_guard() -> Optional[GuardState]:
+    """State of the guarded() context around the caller, if any."""
+    return _guard_state.get()
+
+
+def check_plan(state: GuardState, statement: str, plan: Dict[str, Any]):
+    """Record an EXPLAIN plan on the guard state; raises SQLBudgetExceeded if it is over budget."""
+    budget = state.budget
+    state.statement = statement
+    state.fingerprint = content_digest(plan_shape(plan))
+    state.cost, state.rows = plan.get("Total Cost", 0.0), plan.get("Plan Rows", 0.0)
+
+    reason = None
+    cartesian = _cartesian_joins(plan)
+    if state.fingerprint in state.offenders:
+        reason = "this query shape has repeatedly exceeded the database budget"
+    elif cartesian:
+        reason = f"it joins {', '.join(cartesian)} without a join condition"
+    elif state.cost > budget["max_cost"]:
+        reason = f"its estimated cost {state.cost:,.0f} exceeds the {budget['max_cost']:,.0f} budget for role '{state.user_role}'"
+    elif state.rows > budget["max_rows"]:
+        reason = f"it is estimated to return {state.rows:,.0f} rows (limit {budget['max_rows']:,.0f})"
+    if reason:
+        state.rejection = f"Query rejected before execution: {reason}."
+        SQL_GUARD_DECISIONS.inc(decision="rejected")
+        logger.warning(f"SQL guard rejected plan {state.fingerprint} for role '{state.user_role}': {reason}")
+        raise SQLBudgetExceeded(state.rejection)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = _guard_state.get()
+    if state is None or executemany or not statement.lstrip().lower().startswith(("select", "with")):
+        return statement, parameters
+    # SET LOCAL lasts until the end of the current transaction, which SQLAlchemy
+    # has already begun for this connection
+    cursor.execute(f"SET LOCAL statement_timeout = {int(state.budget['statement_timeout_ms'])}")
+    check_plan(state, statement, _explain(cursor, statement, parameters))
+
+    state.capped = True
+    SQL_GUARD_DECISIONS.inc(decision="capped" if state.rows > state.row_cap else "allowed")
+    return cap_rows(statement, state.row_cap), parameters
@@ -0,0 +1,201 @@
+import re
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import SQL_PLAN_CACHE
+from utils.cache_keys import content_key
+from utils.memory_cache import get_cache
+from utils.metrics import record_cache, SQL_GUARD_DECISIONS
+from utils.result_set import ResultSet
+from .sql_guard import current_guard, check_plan, ordered_subquery
+
+logger = logging.getLogger(__name__)
+
+# A literal pulled out of a question: (kind, value), e.g. ("year", 2017) or ("market", "LATAM")
+Literal = Tuple[str, Any]
+
+_LIMIT = re.compile(r"\btop\s+(\d+)\b", re.IGNORECASE)
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+def _vocabulary_pattern(values: List[str]) -> re.Pattern:
+    # Longest first so "Pacific Asia" wins over any shorter overlapping value
+    alternatives = sorted(values, key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(re.escape(v) for v in alternatives) + r")\b", re.IGNORECASE)
+
+
+_VOCABULARIES = {kind: (values, _vocabulary_pattern(values)) for kind, values in SQL_PLAN_CACHE["vocabularies"].items()}
+
+
+def normalize_question(question: str) -> Tuple[str, List[Literal]]:
+    """
+    Reduce a question to its shape: literals (top-N limits, years and known
+    markets/segments) become {kind} placeholders, case and whitespace are folded.
+    Returns the template and the literals in the order they appear.
+    """
+    found: List[Tuple[int, int, str, Any]] = []
+
+    def taken(start: int, end: int) -> bool:
+        return any(start < e and s < end for s, e, _, _ in found)
+
+    for match in _LIMIT.finditer(question):
+        found.append((match.start(1), match.end(1), "limit", int(match.group(1))))
+    for match in _YEAR.finditer(question):
+        if not taken(match.start(), match.end()):
+            found.append((match.start(), match.end(), "year", int(match.group(1))))
+    for kind, (values, pattern) in _VOCABULARIES.items():
+        canonical = {v.lower(): v for v in values}
+        for match in pattern.finditer(question):
+            if not taken(match.start(), match.end()):
+                found.append((match.start(), match.end(), kind, canonical[match.group(1).lower()]))
+
+    found.sort()
+    parts, last = [], 0
+    for start, end, kind, _ in found:
+        parts.append(question[last:start].lower())
+        parts.append("{" + kind + "}")
+        last = end
+    parts.append(question[last:].lower())
+    template = re.sub(r"\s+", " ", "".join(parts)).strip().rstrip("?.! ")
+    return template, [(kind, value) for _, _, kind, value in found]
+
+
+def _literal_pattern(kind: str, value: Any) -> re.Pattern:
+    if kind == "limit":
+        return re.compile(rf"(?<=\bLIMIT\s){value}\b", re.IGNORECASE)
+    if kind == "year":
+        return re.compile(rf"(?<![\w.$']){value}(?![\w.])")
+    return re.compile(rf"'{re.escape(value)}'", re.IGNORECASE)
+
+
+def parameterize(sql: str, literals: List[Literal]) -> Optional[str]:
+    """
+    Replace each literal in generated SQL with a positional parameter ($1..$n,
+    in question order). Returns None when a literal is missing from the SQL or
+    appears more than once, since the slot it belongs to is then ambiguous.
+    """
+    spans = []
+    for index, (kind, value) in enumerate(literals, start=1):
+        matches = list(_literal_pattern(kind, value).finditer(sql))
+        if len(matches) != 1:
+            return None
+        spans.append((matches[0].start(), matches[0].end(), f"${index}"))
+    spans.sort()
+    if any(a[1] > b[0] for a, b in zip(spans, spans[1:])):
+        return None
+    parts, last = [], 0
+    for start, end, placeholder in spans:
+        parts.append(sql[last:start])
+        parts.append(placeholder)
+        last = end
+    parts.append(sql[last:])
+    return "".join(parts)
+
+
+def render(sql: str, params: List[Any]) -> str:
+    """The statement with its $n placeholders replaced by the bound literals, for display."""
+    def literal(match: re.Match) -> str:
+        value = params[int(match.group(1)) - 1]
+        return str(value) if isinstance(value, (int, float)) else "'" + str(value).replace("'", "''") + "'"
+    return re.sub(r"\$(\d+)\b", literal, sql)
+
+
+def is_read_only_select(sql: str) -> bool:
+    """True for one SELECT (or WITH ... SELECT) statement."""
+    statement = sql.strip().rstrip(";")
+    return statement.lower().startswith(("select", "with")) and ";" not in statement
+
+
+class SQLPlanCache:
+    """
+    Remembers the SQL the LLM generated for a question shape. Plans are keyed by
+    (template, role, region), so a plan is only reused under the same access
+    restrictions it was generated for, and are kept in-process and in Redis so
+    every worker shares them. A repeat shape binds its new literals to the
+    stored statement and runs it through asyncpg's prepared statement cache,
+    skipping the LLM entirely.
+    """
+    def __init__(self, engine, redis_client=None, ttl: int = SQL_PLAN_CACHE["ttl"]):
+        self.engine = engine
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.plans = get_cache("sql_plan", ttl=ttl)
+
+    def _key(self, template: str, user_role: str, user_region: str) -> str:
+        return content_key("sql_plan", template, user_role, user_region)
+
+    async def lookup(self, question: str, user_role: str, user_region: str) -> Optional[Dict[str, Any]]:
+        template, literals = normalize_question(question)
+        key = self._key(template, user_role, user_region)
+        plan = self.plans.get(key)
+        if plan is None and self.redis_client:
+            try:
+                cached = await self.redis_client.get(key)
+                if cached:
+                    plan = json.loads(cached)
+                    self.plans[key] = plan
+            except Exception as e:
+                logger.warning(f"SQL plan lookup failed: {str(e)}")
+        record_cache("sql_plan", plan is not None)
+        if plan is None or [kind for kind, _ in literals] != plan["kinds"]:
+            return None
+        return {"key": key, "sql": plan["sql"], "columns": plan["columns"], "params": [value for _, value in literals]}
+
+    async def store(self, question: str, user_role: str, user_region: str, sql: str, columns: List[str],
+                    cost: float = 0.001):
+        if not is_read_only_select(sql):
+            return
+        template, literals = normalize_question(question)
+        statement = parameterize(sql.strip().rstrip(";"), literals)
+        if statement is None:
+            logger.debug(f"Not caching SQL plan for '{template}': literals do not map onto the SQL")
+            return
+        key = self._key(template, user_role, user_region)
+        plan = {"template": template, "kinds": [kind for kind, _ in literals], "sql": statement, "columns": list(columns)}
+        self.plans.set(key, plan, cost)
+        if self.redis_client:
+            try:
+                await self.redis_client.set(key, json.dumps(plan), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"SQL plan store failed: {str(e)}")
+
+    async def evict(self, key: str):
+        self.plans.discard(key)
+        if self.redis_client:
+            try:
+                await self.redis_client.delete(key)
+            except Exception as e:
+                logger.warning(f"SQL plan evict failed: {str(e)}")
+
+    async def execute(self, plan: Dict[str, Any], statement_timeout_ms: Optional[int] = None,
+                      row_cap: Optional[int] = None) -> Tuple[ResultSet, bool]:
+        """
+        Run a plan; returns the rows (at most row_cap) and whether more were
+        available. Inside SQLGuard.guarded() the statement is EXPLAINed with
+        this call's literals first and SQLBudgetExceeded is raised if it is
+        over the role's budget, as for freshly generated SQL.
+        """
+        rows = []
+        async with self.engine.connect() as conn:
+            driver = (await conn.get_raw_connection()).driver_connection
+            async with driver.transaction():
+                if statement_timeout_ms:
+                    await driver.execute(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+                guard = current_guard()
+                if guard is not None:
+                    # The raw driver connection bypasses the guard's engine hook
+                    explained = await driver.fetchval(f"EXPLAIN (FORMAT JSON) {plan['sql']}", *plan["params"])
+                    if isinstance(explained, str):
+                        explained = json.loads(explained)
+                    check_plan(guard, render(plan["sql"], plan["params"]), explained[0]["Plan"])
+                    SQL_GUARD_DECISIONS.inc(decision="allowed")
+                # asyncpg prepares the statement on first use and reuses it on this
+                # connection from then on (statement_cache_size); rows are streamed in
+                # the same order the result pager uses for the following pages
+                async for row in driver.cursor(ordered_subquery(plan["sql"], "plan_source"), *plan["params"]):
+                    rows.append(tuple(row))
+                    if row_cap and len(rows) > row_cap:
+                        break
+                columns = list(row.keys()) if rows else plan["columns"]
+        truncated = bool(row_cap) and len(rows) > row_cap
+        return ResultSet.from_rows(columns, rows[:row_cap] if truncated else rows), truncated
@@ -1,49 +1,161 @@
-import aiohttp
+import os
+import sys
+import json
 import time
+import asyncio
 import logging
-from cachetools import TTLCache
+import subprocess
+from typing import Dict, Iterable, List, Optional
+from config.settings import WEB_SEARCH_CACHE, SEARCH_PROVIDERS
+from utils.tracing import traced
+from utils.metrics import record_cache, SEARCH_LATENCY
+from utils.memory_cache import get_cache
+from utils.search_cache import SearchCache, normalize_query
 from .base_agent import BaseAgent
+from .search_providers import SearchHit, SerperProvider, LocalIndexProvider
 
 logger = logging.getLogger(__name__)
 
+_MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
 class WebSearchAgent(BaseAgent):
-    def __init__(self, api_key: str, url: str, serper_api_key: str):
-        super().__init__(api_key, url, serper_api_key)
-        self.web_search_cache = TTLCache(maxsize=1000, ttl=7200)
+    def __init__(self, api_key: str, url: str, serper_api_key: str, resources=None):
+        super().__init__(api_key, url, serper_api_key, resources=resources)
+        self.web_search_cache = get_cache("web_search")
+        self.store = SearchCache(WEB_SEARCH_CACHE["path"], WEB_SEARCH_CACHE["max_bytes"]) if WEB_SEARCH_CACHE["enabled"] else None
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # One-request processes (--api-mode) hand stale entries to a detached
+        # `main.py --refresh-search` on close instead of refreshing in process
+        self.detach_refreshes = False
+        self._detached: Dict[str, str] = {}
+        self.providers = {
+            "local": LocalIndexProvider(SEARCH_PROVIDERS["index_path"]),
+            "serper": SerperProvider(serper_api_key, self.http_session),
+        }
+
+    @staticmethod
+    def context_query(question: str) -> str:
+        """The search query used for a question's explanation context."""
+        return f"{question} supply chain context"
 
+    @traced("web_search")
     async def web_search(self, query: str) -> str:
-        if query in self.web_search_cache:
+        key = normalize_query(query)
+        hit = key in self.web_search_cache
+        record_cache("web_search", hit)
+        if hit:
             logger.info("Web search cache hit")
-            return self.web_search_cache[query]
+            return self.web_search_cache[key]
 
-        url = "https://google.serper.dev/search"
-        headers = {
-            "X-API-KEY": self.serper_api_key,
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "q": query,
-            "num": 2
-        }
+        # SQLite I/O (busy timeout, eviction) runs in a worker thread, off the event loop
+        stored = await asyncio.to_thread(self.store.get, key) if self.store else None
+        if stored and stored[1] < WEB_SEARCH_CACHE["max_stale"]:
+            record_cache("web_search_disk", True)
+            value, age = stored
+            if age >= WEB_SEARCH_CACHE["fresh_ttl"]:
+                logger.info(f"Serving {age:.0f}s old web search result while refreshing")
+                await self._refresh_in_background(key, query)
+            self.web_search_cache.set(key, value)
+            return value
+        record_cache("web_search_disk", False)
+
+        web_search_knowledge = await self._fetch(key, query)
+        if web_search_knowledge is None:
+            return "No external knowledge available due to a web search error."
+        return web_search_knowledge
 
+    async def _search(self, query: str) -> Optional[List[SearchHit]]:
+        """Hits from the first provider (in SEARCH_PROVIDERS order) scoring above its threshold; None if all failed."""
+        num, order = SEARCH_PROVIDERS["num_results"], SEARCH_PROVIDERS["order"]
+        fallback = None
+        for i, name in enumerate(order):
+            start_time = time.perf_counter()
+            try:
+                hits = await self.providers[name].search(query, num)
+            except Exception as e:
+                SEARCH_LATENCY.observe(time.perf_counter() - start_time, provider=name, outcome="error")
+                logger.error(f"Error in {name} search request: {str(e)}")
+                continue
+            elapsed = time.perf_counter() - start_time
+            best = hits[0]["score"] if hits else 0.0
+            if i == len(order) - 1 or (hits and best >= SEARCH_PROVIDERS["min_score"].get(name, 0.0)):
+                SEARCH_LATENCY.observe(elapsed, provider=name, outcome="used")
+                logger.info(f"{name} search latency: {elapsed * 1000:.2f} ms")
+                return hits if hits or fallback is None else fallback
+            SEARCH_LATENCY.observe(elapsed, provider=name, outcome="below_threshold")
+            logger.info(f"{name} search best score {best:.2f} below threshold; trying next provider")
+            fallback = fallback or hits or None
+        return fallback
+
+    async def _fetch(self, key: str, query: str) -> Optional[str]:
+        """Search and cache the result in memory and on disk; None on error."""
+        start_time = time.time()
+        hits = await self._search(query)
+        if hits is None:
+            return None
+        snippets = [hit["snippet"] for hit in hits]
+        web_search_knowledge = " ".join(snippets) if snippets else "No relevant web search results found."
+        self.web_search_cache.set(key, web_search_knowledge, time.time() - start_time)
+        if self.store:
+            await asyncio.to_thread(self.store.put, key, web_search_knowledge)
+        return web_search_knowledge
+
+    async def _refresh_in_background(self, key: str, query: str):
+        if key in self._refreshing or key in self._detached:
+            return
+        # Only one process refreshes a given stale entry at a time
+        if not await asyncio.to_thread(self.store.claim_refresh, key, WEB_SEARCH_CACHE["refresh_lease"]):
+            return
+        if self.detach_refreshes:
+            self._detached[key] = query
+            return
+        task = asyncio.create_task(self._fetch(key, query))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def prewarm(self, questions: Iterable[str]) -> Dict[str, int]:
+        """Fetch the context search for each question unless a fresh result is already stored."""
+        report = {"warmed": 0, "fresh": 0, "failed": 0}
+        for question in questions:
+            query = self.context_query(question)
+            key = normalize_query(query)
+            stored = await asyncio.to_thread(self.store.get, key) if self.store else None
+            if stored and stored[1] < WEB_SEARCH_CACHE["fresh_ttl"]:
+                report["fresh"] += 1
+            elif await self._fetch(key, query) is None:
+                report["failed"] += 1
+            else:
+                report["warmed"] += 1
+        return report
+
+    async def refresh(self, queries: Iterable[str]) -> Dict[str, int]:
+        """Re-fetch the given queries into the cache (the detached --refresh-search job)."""
+        report = {"refreshed": 0, "failed": 0}
+        for query in queries:
+            if await self._fetch(normalize_query(query), query) is None:
+                report["failed"] += 1
+            else:
+                report["refreshed"] += 1
+        return report
+
+    def _spawn_refresh(self, queries: List[str]):
+        # Detached from this process and its stdout, so the caller's response is not held up
         try:
-            start_time = time.time()
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-            end_time = time.time()
-            logger.info(f"Serper API latency: {(end_time - start_time) * 1000:.2f} ms")
-
-            snippets = []
-            if "organic" in result:
-                for item in result["organic"][:2]:
-                    if "snippet" in item:
-                        snippets.append(item["snippet"])
-            web_search_knowledge = " ".join(snippets) if snippets else "No relevant web search results found."
-            self.web_search_cache[query] = web_search_knowledge
-            return web_search_knowledge
-
-        except Exception as e:
-            logger.error(f"Error in Serper API request: {str(e)}")
-            return "No external knowledge available due to a web search error."
\ No newline at end of file
+            process = subprocess.Popen([sys.executable, _MAIN, "--refresh-search"], stdin=subprocess.PIPE,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(_MAIN), start_new_session=True)
+            process.stdin.write(json.dumps(queries).encode())
+            process.stdin.close()
+            logger.info(f"Handed {len(queries)} stale web search entries to refresh job {process.pid}")
+        except OSError as e:
+            logger.warning(f"Failed to start web search refresh job: {str(e)}")
+
+    async def close(self):
+        if self._detached:
+            self._spawn_refresh(list(self._detached.values()))
+            self._detached = {}
+        # Long-lived processes: let in-flight refreshes land before the session closes
+        if self._refreshing:
+            await asyncio.wait(list(self._refreshing.values()), timeout=WEB_SEARCH_CACHE["refresh_wait"])
+        if self.store:
+            self.store.close()
@@ -1,9 +1,31 @@
-from .settings import schema, few_shot_examples, ROLE_HIERARCHY, USER_ROLES, AUDIT_LOG_FILE
+from .settings import schema, few_shot_examples, ROLE_HIERARCHY, USER_ROLES, AUDIT_DB_FILE, LOGGING, SPECULATIVE_EXECUTION, SESSION_STORE, LEADERBOARD, TRACING, METRICS, PROFILING, MEMORY_CACHE, RESOURCES, SNAPSHOT, FORK_SERVER, CPU_GOVERNOR, SQL_PLAN_CACHE, FEW_SHOT, SCHEMA_CATALOG, SQL_GUARD, ROLLUPS, PAGINATION, PREDICTION_CUBE, WEB_SEARCH_CACHE, SEARCH_PROVIDERS, LEARNING_PACK
 
 __all__ = [
     "schema",
     "few_shot_examples",
     "ROLE_HIERARCHY",
     "USER_ROLES",
-    "AUDIT_LOG_FILE",
+    "AUDIT_DB_FILE",
+    "LOGGING",
+    "SPECULATIVE_EXECUTION",
+    "SESSION_STORE",
+    "LEADERBOARD",
+    "TRACING",
+    "METRICS",
+    "PROFILING",
+    "MEMORY_CACHE",
+    "RESOURCES",
+    "SNAPSHOT",
+    "FORK_SERVER",
+    "CPU_GOVERNOR",
+    "SQL_PLAN_CACHE",
+    "FEW_SHOT",
+    "SCHEMA_CATALOG",
+    "SQL_GUARD",
+    "ROLLUPS",
+    "PAGINATION",
+    "PREDICTION_CUBE",
+    "WEB_SEARCH_CACHE",
+    "SEARCH_PROVIDERS",
+    "LEARNING_PACK",
 ]
\ No newline at end of file
@@ -0,0 +1,193 @@
+import gc
+import os
+import json
+import time
+import signal
+import socket
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config.settings import FORK_SERVER
+from utils.logging_config import setup_logging, stop_logging, reinit_logging_after_fork
+from utils.json_utils import dumps
+
+logger = logging.getLogger(__name__)
+
+# Pre-fork worker pool. The parent loads the embedding model and BERT classifier
+# once, freezes the heap (gc.freeze) so the collector never touches, and thereby
+# copies, the inherited objects, then forks workers that share those pages
+# copy-on-write. Workers accept requests on one inherited Unix socket: the client
+# sends a JSON payload (same shape as main.py --api-mode stdin), half-closes, and
+# reads back the JSON response (or, for exports, the raw streamed bytes).
+
+
+def memory_usage(pid: int) -> Dict[str, int]:
+    """RSS split into pages private to the process and pages shared with others (bytes)."""
+    fields: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "unique": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+class ForkServer:
+    def __init__(
+        self,
+        make_resources: Callable[[], Any],
+        make_agent: Callable[[Any], Awaitable[Any]],
+        handle: Callable[[Any, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        workers: int = FORK_SERVER["workers"],
+        socket_path: str = FORK_SERVER["socket"],
+    ):
+        self.make_resources = make_resources
+        self.make_agent = make_agent
+        self.handle = handle
+        self.workers = workers
+        self.socket_path = socket_path
+        self.children: Dict[int, int] = {}
+        self._stopping = False
+        self._sock: Optional[socket.socket] = None
+
+    def _listen(self) -> socket.socket:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.socket_path)
+        sock.listen(FORK_SERVER["backlog"])
+        sock.setblocking(False)
+        return sock
+
+    def _spawn(self, slot: int, resources):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            return
+        # Child: never returns into the parent's supervision loop
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            gc.enable()
+            reinit_logging_after_fork(slot)
+            asyncio.run(self._worker(slot, resources))
+        except Exception as e:
+            logger.error(f"Worker {slot} crashed: {str(e)}")
+            code = 1
+        finally:
+            stop_logging()
+            os._exit(code)
+
+    async def _worker(self, slot: int, resources):
+        await resources.start()
+        master_agent = await self.make_agent(resources)
+        loop = asyncio.get_running_loop()
+        logger.info(f"Worker {slot} (pid {os.getpid()}) ready")
+        try:
+            for _ in range(FORK_SERVER["max_requests"]):
+                conn, _ = await loop.sock_accept(self._sock)
+                with conn:
+                    await self._serve(loop, conn, master_agent)
+        finally:
+            await master_agent.close()
+
+    async def _serve(self, loop, conn: socket.socket, master_agent):
+        chunks = []
+        while True:
+            chunk = await loop.sock_recv(conn, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        try:
+            response = await self.handle(master_agent, json.loads(b"".join(chunks)))
+        except Exception as e:
+            logger.error(f"Worker request failed: {str(e)}")
+            response = {"summary": "Agent execution error.", "error": str(e)}
+        if hasattr(response, "__aiter__"):
+            # Exports are streamed as raw bytes, one chunk per result batch
+            try:
+                async for chunk in response:
+                    await loop.sock_sendall(conn, chunk)
+            except Exception as e:
+                logger.error(f"Worker export failed: {str(e)}")
+            return
+        await loop.sock_sendall(conn, dumps(response).encode())
+
+    def report_memory(self) -> Dict[str, Any]:
+        parent = memory_usage(os.getpid())
+        workers = {pid: memory_usage(pid) for pid in self.children}
+        unique_total = sum(w.get("unique", 0) for w in workers.values())
+        mib = 1024 * 1024
+        for pid, usage in workers.items():
+            if usage:
+                logger.info(f"Worker {self.children[pid]} (pid {pid}): rss={usage['rss'] / mib:.1f} MiB "
+                            f"unique={usage['unique'] / mib:.1f} MiB shared={usage['shared'] / mib:.1f} MiB")
+        if parent:
+            logger.info(f"Parent rss={parent['rss'] / mib:.1f} MiB; {len(workers)} workers add "
+                        f"{unique_total / mib:.1f} MiB unique memory")
+        return {"parent": parent, "workers": workers, "workers_unique_total": unique_total}
+
+    def _stop(self, *_):
+        self._stopping = True
+
+    def run(self):
+        setup_logging()
+        # HF tokenizers' thread pool does not survive fork
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        resources = self.make_resources()
+        start = time.perf_counter()
+        resources.embedding_model
+        resources.classifier
+        logger.info(f"Models loaded in parent in {(time.perf_counter() - start) * 1000:.0f} ms")
+        self._sock = self._listen()
+
+        # Move everything allocated so far into the permanent generation so the
+        # collector's refcount/flag writes do not dirty the shared pages in workers
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for slot in range(self.workers):
+            self._spawn(slot, resources)
+        logger.info(f"Fork server listening on {self.socket_path} with {self.workers} workers")
+
+        next_report = time.monotonic() + FORK_SERVER["memory_report_interval"]
+        while not self._stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self.children:
+                slot = self.children.pop(pid)
+                logger.info(f"Worker {slot} (pid {pid}) exited with status {status}; respawning")
+                self._spawn(slot, resources)
+                continue
+            if time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + FORK_SERVER["memory_report_interval"]
+            time.sleep(0.2)
+
+        logger.info("Stopping fork server")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self._sock.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
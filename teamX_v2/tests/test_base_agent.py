@@ -0,0 +1,18 @@
+import sys
+import os
+import asyncio
+import aiohttp
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.base_agent import BaseAgent
+
+
+def test_agent_without_resources_opens_its_own_session():
+    async def run():
+        agent = BaseAgent("", "", "dummy-key")
+        async with agent.http_session() as session:
+            assert isinstance(session, aiohttp.ClientSession) and not session.closed
+        assert session.closed
+    asyncio.run(run())
@@ -0,0 +1,32 @@
+import sys
+import os
+import subprocess
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.cache_keys import content_key
+from utils.result_set import ResultSet
+
+
+def test_key_ignores_dict_order_but_not_types():
+    assert content_key("t", {"a": 1, "b": [1, 2]}) == content_key("t", {"b": [1, 2], "a": 1})
+    assert content_key("t", 1) != content_key("t", "1")
+    assert content_key("t", ["ab", "c"]) != content_key("t", ["a", "bc"])
+
+
+def test_result_set_key_matches_equivalent_rows():
+    rows = [{"segment": "Consumer", "total_order_value": 10.5}, {"segment": "Corporate", "total_order_value": 3.0}]
+    assert content_key("t", ResultSet.from_records(rows)) == content_key("t", ResultSet.from_records(list(rows)))
+    assert content_key("t", ResultSet.from_records(rows)) != content_key("t", ResultSet.from_records(rows[:1]))
+
+
+def test_key_is_stable_across_processes():
+    code = "from utils.cache_keys import content_key; print(content_key('t', {'q': 'late deliveries', 'k': {1, 2}}))"
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    keys = {
+        subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True,
+                       env={**os.environ, "PYTHONHASHSEED": seed}).stdout.strip()
+        for seed in ("1", "2")
+    }
+    assert len(keys) == 1 and keys != {""}
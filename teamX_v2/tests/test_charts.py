@@ -0,0 +1,86 @@
+import sys
+import os
+import time
+import numpy as np
+import pytest
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.chart_utils import build_sql_chart, lttb, MAX_LINE_POINTS
+
+
+def test_segment_region_pivot():
+    rows = [
+        {"segment": "Consumer", "region": "LATAM", "order_count": 10},
+        {"segment": "Consumer", "region": "Europe", "order_count": 4},
+        {"segment": "Corporate", "region": "Europe", "order_count": 7},
+    ]
+    chart = build_sql_chart(rows)
+    assert chart["type"] == "bar"
+    assert chart["data"]["labels"] == ["LATAM", "Europe"]
+    datasets = {d["label"]: d["data"] for d in chart["data"]["datasets"]}
+    assert datasets == {"Consumer": [10.0, 4.0], "Corporate": [0.0, 7.0]}
+
+
+def test_partial_results_are_flagged():
+    rows = [{"segment": "Consumer", "region": "LATAM", "order_count": 10}]
+    assert "partial" not in build_sql_chart(rows)
+    chart = build_sql_chart(rows, partial=True)
+    assert chart["partial"] is True
+    assert chart["options"]["plugins"]["title"]["text"].endswith("(first 1 rows only)")
+
+
+def test_unmatched_columns_have_no_chart():
+    assert build_sql_chart([{"shipping_mode": "Standard Class", "on_time_delivery_rate": 0.4}]) is None
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[500] = 10.0
+    keep = lttb(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+
+
+def test_large_results_are_aggregated_and_downsampled():
+    rng = np.random.default_rng(0)
+    n_rows = 3 * MAX_LINE_POINTS
+    segments = np.array(["Consumer", "Corporate", "Home Office"])
+    regions = np.array(["LATAM", "Europe", "Pacific Asia", "USCA", "Africa"])
+    rows = [
+        {"segment": s, "region": r, "order_count": int(c)}
+        for s, r, c in zip(segments[rng.integers(0, 3, n_rows)], regions[rng.integers(0, 5, n_rows)], rng.integers(1, 100, n_rows))
+    ]
+    chart = build_sql_chart(rows)
+    assert len(chart["data"]["datasets"]) == 3
+
+    trend = [{"year": 2000 + i, "avg_late_risk": float(v)} for i, v in enumerate(rng.random(n_rows))]
+    chart = build_sql_chart(trend)
+    assert len(chart["data"]["datasets"][0]["data"]) == MAX_LINE_POINTS
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("n_rows", [100_000])
+def test_chart_builders_scale(n_rows):
+    rng = np.random.default_rng(0)
+    segments = np.array(["Consumer", "Corporate", "Home Office"])
+    regions = np.array(["LATAM", "Europe", "Pacific Asia", "USCA", "Africa"])
+    rows = [
+        {"segment": s, "region": r, "order_count": int(c)}
+        for s, r, c in zip(segments[rng.integers(0, 3, n_rows)], regions[rng.integers(0, 5, n_rows)], rng.integers(1, 100, n_rows))
+    ]
+    start = time.perf_counter()
+    chart = build_sql_chart(rows)
+    bar_ms = (time.perf_counter() - start) * 1000
+    assert len(chart["data"]["datasets"]) == 3
+
+    trend = [{"year": 2000 + i, "avg_late_risk": float(v)} for i, v in enumerate(rng.random(n_rows))]
+    start = time.perf_counter()
+    chart = build_sql_chart(trend)
+    line_ms = (time.perf_counter() - start) * 1000
+    assert len(chart["data"]["datasets"][0]["data"]) == MAX_LINE_POINTS
+
+    print(f"\n{n_rows} rows: segment/region bar {bar_ms:.1f} ms, trend line {line_ms:.1f} ms")
@@ -0,0 +1,48 @@
+import sys
+import os
+import json
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import FEW_SHOT, schema, few_shot_examples
+from agents.example_store import ExampleStore
+
+
+def test_select_keeps_relevant_examples_and_their_tables():
+    store = ExampleStore(few_shot_examples, schema, k=2)
+    assert len(store.examples) == 9
+    context = store.select("Which shipping mode has the fewest on-time deliveries?")
+    assert "Question: Which shipping mode has the lowest rate of on-time deliveries?" in context["examples"]
+    assert "products" not in context["tables"] and "shipping" in context["tables"]
+    assert "idx_shipping_order_id" in context["schema"] and "idx_order_items_order_id" not in context["schema"]
+    assert context["prompt_tokens"]["after"] < context["prompt_tokens"]["before"] / 2
+
+
+def test_verified_examples_join_the_pool():
+    store = ExampleStore(few_shot_examples, schema)
+    sql = "SELECT p.product_name, COUNT(*) AS item_count FROM order_items oi JOIN products p ON oi.product_card_id = p.product_card_id GROUP BY p.product_name"
+    assert asyncio.run(store.add_verified("How many items were sold per product?", sql))["status"] == "added"
+    assert "error" in asyncio.run(store.add_verified("Drop it", "DELETE FROM orders"))
+    context = store.select("How many items were sold per product?", k=1)
+    assert "item_count" in context["examples"] and context["tables"] == ["products", "order_items"]
+
+
+def test_verified_examples_are_reread_after_the_refresh_interval(monkeypatch):
+    class FakeRedis:
+        def __init__(self):
+            self.entries = []
+
+        async def lrange(self, key, start, end):
+            return list(self.entries)
+
+    redis_client = FakeRedis()
+    store = ExampleStore(few_shot_examples, schema, redis_client=redis_client)
+    asyncio.run(store.load_verified())
+    redis_client.entries.append(json.dumps({"question": "How many orders are there?", "sql": "SELECT COUNT(*) FROM orders"}))
+    asyncio.run(store.load_verified())
+    assert len(store.examples) == store.base_count
+    monkeypatch.setitem(FEW_SHOT, "refresh_interval", 0)
+    asyncio.run(store.load_verified())
+    assert store.questions[store.base_count:] == ["How many orders are there?"]
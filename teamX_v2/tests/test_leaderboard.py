@@ -0,0 +1,97 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.leaderboard import LeaderboardWriter
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.batches = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def zadd(self, key, mapping):
+        self.batches.append(dict(mapping))
+
+    async def execute(self):
+        if self.redis.failures:
+            self.redis.failures -= 1
+            raise ConnectionError("redis unavailable")
+        for batch in self.batches:
+            self.redis.scores.update(batch)
+            self.redis.zadds.append(batch)
+
+
+class FakeRedis:
+    """Sorted-set stub; the first `failures` pipeline executes raise."""
+    def __init__(self, scores, failures=0):
+        self.scores = dict(scores)
+        self.failures = failures
+        self.zadds = []
+        self.zrange_calls = 0
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    async def zrange(self, key, start, end, withscores=False):
+        self.zrange_calls += 1
+        return sorted(self.scores.items(), key=lambda item: item[1])
+
+
+def _leaderboard(failures=0):
+    redis = FakeRedis({"alice": 100.0, "bob": 90.0, "carol": 80.0}, failures)
+    return LeaderboardWriter(redis, max_staleness=60), redis
+
+
+def test_rank_uses_latest_score_and_skips_own_stale_entry():
+    leaderboard, _ = _leaderboard()
+
+    async def run():
+        await leaderboard.refresh()
+        # alice dropped from 100 to 70: her old snapshot score must not count against her
+        assert (await leaderboard.rank("alice", 70))[0] == 3
+        # Ties share the rank: only strictly higher scores count
+        assert (await leaderboard.rank("dave", 90))[0] == 2
+        # Unflushed submissions are used before the snapshot
+        leaderboard.submit("carol", 95)
+        assert (await leaderboard.rank("carol"))[0] == 2
+        assert (await leaderboard.rank("erin"))[0] == 4
+    asyncio.run(run())
+
+
+def test_stale_snapshot_is_refreshed_inline():
+    leaderboard, redis = _leaderboard()
+
+    async def run():
+        await leaderboard.rank("alice")
+        assert redis.zrange_calls == 1
+        await leaderboard.rank("alice")
+        assert redis.zrange_calls == 1
+        leaderboard._snapshot_time -= 61
+        await leaderboard.rank("alice")
+        assert redis.zrange_calls == 2
+    asyncio.run(run())
+
+
+def test_failed_flush_is_retried_without_overwriting_newer_scores():
+    leaderboard, redis = _leaderboard(failures=1)
+
+    async def run():
+        leaderboard.submit("alice", 101)
+        leaderboard.submit("bob", 91)
+        await leaderboard.flush()
+        assert redis.zadds == []
+        leaderboard.submit("alice", 102)
+        await leaderboard.flush()
+        await leaderboard.flush()
+    asyncio.run(run())
+    assert redis.zadds == [{"alice": 102, "bob": 91}]
@@ -0,0 +1,36 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import LEARNING_PACK
+from agents.learning_module_agent import LearningModuleAgent, load_pack
+
+
+def test_pack_is_built_once_and_served_without_llm(tmp_path, monkeypatch):
+    path = str(tmp_path / "learning_pack.json")
+    monkeypatch.setitem(LEARNING_PACK, "path", path)
+    monkeypatch.setitem(LEARNING_PACK, "topics", ["load optimization", "sustainability"])
+    prompts = []
+
+    async def fake_llm(prompt, model_id="claude-3-haiku"):
+        prompts.append(prompt)
+        if '"sustainability"' in prompt:
+            return {"error": "timeout"}
+        return "Load optimization fills each vehicle as fully as possible."
+
+    builder = LearningModuleAgent("", "", "")
+    monkeypatch.setattr(builder, "call_llm", fake_llm)
+    report = asyncio.run(builder.build_pack(LEARNING_PACK["topics"], path))
+    assert report["topics"] == 1 and report["failed"] == ["sustainability"]
+    assert load_pack(path)["version"] == report["version"]
+
+    agent = LearningModuleAgent("", "", "")
+    monkeypatch.setattr(agent, "call_llm", fake_llm)
+    assert agent.topics == ["load optimization", "sustainability"]
+    calls = len(prompts)
+    assert asyncio.run(agent.provide_learning_content("load optimization")).startswith("Load optimization")
+    assert len(prompts) == calls
+    assert load_pack(str(tmp_path / "missing.json"))["topics"] == {}
@@ -0,0 +1,58 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import memory_cache
+from utils.memory_cache import ByteBoundedCache, get_cache
+
+
+def test_cache_stays_within_byte_budget():
+    cache = ByteBoundedCache("test", max_bytes=20_000)
+    for i in range(100):
+        cache.set(f"key{i}", "x" * 1000, cost=0.1)
+    assert cache.bytes <= 20_000
+    assert cache.evictions > 0
+    assert len(cache) < 100
+
+
+def test_cheap_large_entries_are_evicted_first():
+    cache = ByteBoundedCache("test", max_bytes=10_000)
+    cache.set("large_cheap", "x" * 4000, cost=0.001)
+    cache.set("small_expensive", "y" * 200, cost=2.0)
+    for i in range(8):
+        cache.set(f"filler{i}", "z" * 1000, cost=0.5)
+    assert "small_expensive" in cache
+    assert "large_cheap" not in cache
+
+
+def test_oversized_entry_is_not_cached():
+    cache = ByteBoundedCache("test", max_bytes=1000)
+    cache.set("big", "x" * 5000)
+    assert "big" not in cache
+    assert cache.bytes == 0
+
+
+def test_expired_entries_are_dropped():
+    cache = ByteBoundedCache("test", max_bytes=10_000, ttl=0)
+    cache["key"] = "value"
+    assert "key" not in cache
+    assert cache.bytes == 0
+
+
+def test_namespace_budgets_never_exceed_the_total(monkeypatch):
+    monkeypatch.setattr(memory_cache, "_caches", {})
+    monkeypatch.setitem(memory_cache.MEMORY_CACHE, "budget_bytes", 100_000)
+    monkeypatch.setitem(memory_cache.MEMORY_CACHE, "shares", {"llm": 0.6, "retrieval": 0.3})
+    monkeypatch.setitem(memory_cache.MEMORY_CACHE, "default_share", 0.1)
+    llm = get_cache("llm")
+    for i in range(60):
+        llm.set(f"key{i}", "x" * 900)
+    get_cache("retrieval")
+    assert llm.max_bytes == 60_000
+    for name in ("sql_plan", "schema", "examples"):
+        get_cache(name)
+    caches = memory_cache._caches.values()
+    assert sum(cache.max_bytes for cache in caches) <= 100_000
+    assert llm.max_bytes == 50_000 and llm.bytes <= llm.max_bytes
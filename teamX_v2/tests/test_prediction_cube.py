@@ -0,0 +1,96 @@
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.prediction_cube import PredictionCube, group_cells
+
+
+def test_cells_keep_rank_order_and_match_case_insensitively():
+    cube = PredictionCube(engine=None)
+    cube._cells = group_cells([
+        ("Europe", 2017, "Standard Class", 0.61),
+        ("Europe", 2017, "First Class", 0.48),
+        ("LATAM", 2016, "Same Day", 0.52),
+    ])
+    cube.version = 4
+    # Version already checked: lookups are served from memory without touching the engine
+    cube._checked = float("inf")
+
+    async def run():
+        results, version = await cube.lookup(" europe", "2017")
+        assert version == 4
+        assert [row["shipping_mode"] for row in results] == ["Standard Class", "First Class"]
+        results[0]["avg_predicted_late_risk"] = 0.0
+        assert (await cube.lookup("Europe", 2017))[0][0]["avg_predicted_late_risk"] == 0.61
+        assert await cube.lookup("Europe", 2018) is None
+    asyncio.run(run())
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+    def fetchall(self):
+        return self.value
+
+
+class FakeConnection:
+    """Answers max(order_date), the last watermark and the changed cells; records the cell query's window."""
+    def __init__(self, until, watermark, pairs):
+        self.until, self.watermark, self.pairs = until, watermark, pairs
+        self.windows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if "max(order_date)" in sql:
+            return FakeResult(self.until)
+        if "SELECT watermark" in sql:
+            return FakeResult(self.watermark)
+        if "SELECT DISTINCT market" in sql:
+            self.windows.append(params)
+            return FakeResult(self.pairs)
+        return FakeResult(None)
+
+
+class FakeEngine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return self.conn
+
+    def begin(self):
+        return self.conn
+
+
+class FakePredictive:
+    def __init__(self):
+        self.scored = []
+
+    async def predict_late_delivery_risk(self, market, year):
+        self.scored.append((market, year))
+        return [{"shipping_mode": "Standard Class", "avg_predicted_late_risk": 0.5}]
+
+
+def test_build_rescores_the_watermark_day():
+    watermark = datetime(2018, 1, 31, 23, 0)
+    # No newer orders: an order that landed later at the watermark's timestamp is still picked up
+    conn = FakeConnection(until=watermark, watermark=watermark, pairs=[("Europe", 2018)])
+    predictive = FakePredictive()
+    report = asyncio.run(PredictionCube(FakeEngine(conn), predictive).build())
+    assert conn.windows == [{"since": datetime(2018, 1, 31), "until": watermark}]
+    assert predictive.scored == [("Europe", 2018)]
+    assert report["scored"] == 1
@@ -0,0 +1,39 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.result_pages import ResultPager
+
+QUERY = {"sql": "SELECT segment, order_count FROM rollup_orders_by_day", "params": {}, "columns": ["segment", "order_count"]}
+
+
+def test_tokens_are_signed_and_bound_to_role():
+    async def run():
+        pager = ResultPager(engine=None)
+        token = await pager.issue(QUERY, "planning_manager", "all", 100)
+        payload = await pager.read(token, "planning_manager", "all")
+        assert payload["q"] == QUERY and payload["o"] == 100
+        assert "error" in await pager.read(token, "finance_manager", "all")
+        body, signature = token.split(".")
+        assert "error" in await pager.read(body[:-2] + "AA." + signature, "planning_manager", "all")
+        assert "error" in await pager.read("garbage", "planning_manager", "all")
+    asyncio.run(run())
+
+
+def test_csv_export_streams_batches():
+    class FakePager(ResultPager):
+        async def iter_rows(self, query, user_role, offset=0, limit=None):
+            yield query["columns"], [("Consumer", 3), ("Corporate", 2)]
+            yield query["columns"], [("Home Office", 1)]
+
+    async def run():
+        pager = FakePager(engine=None)
+        token = await pager.issue(QUERY, "planning_manager", "all", 100)
+        chunks = [chunk async for chunk in await pager.export(token, "planning_manager", "all", "csv")]
+        assert len(chunks) == 2
+        assert b"".join(chunks).decode().splitlines() == ["segment,order_count", "Consumer,3", "Corporate,2", "Home Office,1"]
+        assert "error" in await pager.export(token, "planning_manager", "all", "xlsx")
+    asyncio.run(run())
@@ -0,0 +1,22 @@
+import sys
+import os
+from decimal import Decimal
+import numpy as np
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.result_set import ResultSet
+
+
+def test_numeric_columns_are_typed():
+    result = ResultSet.from_rows(["year", "profit"], [(Decimal("2017"), Decimal("1.50")), (2018, 2.25)])
+    assert result.data["year"].dtype == np.int64
+    assert result.data["profit"].dtype == np.float64
+
+
+def test_non_finite_and_oversized_decimals_do_not_break_columns():
+    result = ResultSet.from_rows(["ratio", "big"], [(Decimal("NaN"), Decimal(2) ** 70), (Decimal("1"), Decimal(1))])
+    assert result.data["ratio"].dtype == np.float64 and np.isnan(result.data["ratio"][0])
+    assert result.data["big"].dtype == object and result[0]["big"] == Decimal(2) ** 70
+    assert ResultSet.from_rows(["n"], [(2 ** 63,)]).data["n"].dtype == object
@@ -0,0 +1,51 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import schema, few_shot_examples
+from agents.schema_catalog import SchemaCatalog, allowed_tables
+from agents.example_store import ExampleStore
+
+
+def _catalog():
+    catalog = SchemaCatalog(engine=None)
+    catalog.catalog = {"fingerprint": "f", "tables": {
+        "orders": {"rows": 1000, "indexes": ["CREATE INDEX idx_orders_order_date ON public.orders USING btree (order_date)"], "columns": {
+            "order_id": {"name": "order_id", "type": "integer", "pk": True},
+            "customer_id": {"name": "customer_id", "type": "integer", "fk": "customers"},
+            "market": {"name": "market", "type": "character varying", "n_distinct": 5, "common_values": ["LATAM", "Europe"]},
+        }},
+        "shipping": {"rows": 1000, "indexes": [], "columns": {
+            "order_id": {"name": "order_id", "type": "integer", "fk": "orders"},
+            "late_delivery_risk": {"name": "late_delivery_risk", "type": "integer", "n_distinct": -0.002, "common_values": ["1", "0"]},
+        }},
+        "customers": {"rows": 200, "indexes": [], "columns": {
+            "customer_id": {"name": "customer_id", "type": "integer", "pk": True},
+        }},
+    }}
+    return catalog
+
+
+def test_allowed_tables_include_overseen_roles():
+    assert allowed_tables("logistics_specialist") == ["orders", "shipping"]
+    assert "customers" in allowed_tables("planning_manager")
+    assert allowed_tables("unknown_role") == []
+
+
+def test_role_filtered_rendering():
+    rendered = _catalog().render("logistics_specialist")
+    assert "customers" not in rendered
+    assert "- orders (~1000 rows): order_id (INTEGER, PK), customer_id (INTEGER)," in rendered
+    assert "market (VARCHAR, 5 values: 'LATAM', 'Europe')" in rendered
+    assert "late_delivery_risk (INTEGER, FK" not in rendered and "2 values: '1', '0'" in rendered
+    assert "- CREATE INDEX idx_orders_order_date" in rendered
+
+
+def test_examples_outside_the_role_rank_last():
+    store = ExampleStore(few_shot_examples, schema, k=1)
+    tables = _catalog().tables_for("logistics_specialist")
+    context = store.select("What is the total number of orders per customer segment?", tables=tables)
+    assert "JOIN customers" not in context["examples"]
+    assert set(context["tables"]) <= {"orders", "shipping"}
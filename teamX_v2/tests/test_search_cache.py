@@ -0,0 +1,69 @@
+import sys
+import os
+import time
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import WEB_SEARCH_CACHE
+from utils.memory_cache import clear_caches
+from utils.search_cache import SearchCache, normalize_query
+from agents.web_search_agent import WebSearchAgent
+
+
+def test_normalized_keys_and_lru_eviction(tmp_path):
+    assert normalize_query("What is  Load Optimization? supply chain context") == \
+        normalize_query("what is load optimization supply chain context")
+    store = SearchCache(str(tmp_path / "search.db"), max_bytes=100)
+    store.put("a", "x" * 40)
+    store.put("b", "y" * 40)
+    time.sleep(0.01)
+    assert store.get("a")[0] == "x" * 40
+    store.put("c", "z" * 40)
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+
+
+def test_stale_entries_are_served_and_refreshed(tmp_path, monkeypatch):
+    clear_caches()
+    agent = WebSearchAgent("", "", "")
+    agent.store = SearchCache(str(tmp_path / "search.db"), max_bytes=1 << 20)
+    key = normalize_query(agent.context_query("Why are LATAM shipments late?"))
+    agent.store.put(key, "old snippet")
+    monkeypatch.setitem(WEB_SEARCH_CACHE, "fresh_ttl", 0)
+    fetched = []
+
+    async def fake_fetch(k, query):
+        fetched.append(query)
+        return "new snippet"
+    monkeypatch.setattr(agent, "_fetch", fake_fetch)
+
+    async def run():
+        assert await agent.web_search(agent.context_query("why are latam shipments late")) == "old snippet"
+        await agent.close()
+    asyncio.run(run())
+    assert fetched == ["why are latam shipments late supply chain context"]
+    clear_caches()
+
+
+def test_api_mode_hands_stale_entries_to_a_detached_job(tmp_path, monkeypatch):
+    clear_caches()
+    agent = WebSearchAgent("", "", "")
+    agent.detach_refreshes = True
+    agent.store = SearchCache(str(tmp_path / "search.db"), max_bytes=1 << 20)
+    query = agent.context_query("why are latam shipments late")
+    agent.store.put(normalize_query(query), "old snippet")
+    monkeypatch.setitem(WEB_SEARCH_CACHE, "fresh_ttl", 0)
+    spawned = []
+    monkeypatch.setattr(agent, "_spawn_refresh", spawned.append)
+
+    async def run():
+        assert await agent.web_search(query) == "old snippet"
+        assert not agent._refreshing
+        await agent.close()
+    asyncio.run(run())
+    assert spawned == [[query]]
+    # The claim holds for refresh_lease seconds, so another process leaves it alone
+    assert not agent.store.claim_refresh(normalize_query(query), WEB_SEARCH_CACHE["refresh_lease"])
+    clear_caches()
@@ -0,0 +1,54 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.memory_cache import clear_caches
+from agents.search_providers import SearchProvider, LocalIndexProvider, build_index
+from agents.web_search_agent import WebSearchAgent
+
+
+class FakeProvider(SearchProvider):
+    def __init__(self, name, hits):
+        self.name = name
+        self.hits = hits
+        self.calls = 0
+
+    async def search(self, query, num):
+        self.calls += 1
+        return self.hits[:num]
+
+
+def test_local_index_ranks_relevant_passages(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "transport.md").write_text(
+        "Load optimization packs pallets to maximize trailer utilization.\n\n"
+        "Cross-docking moves inbound goods straight to outbound trucks.\n"
+    )
+    (corpus / "green.txt").write_text("Sustainability programs cut freight emissions through modal shift.\n")
+    index_path = str(tmp_path / "index.db")
+    assert build_index(str(corpus), index_path)["passages"] == 3
+
+    hits = asyncio.run(LocalIndexProvider(index_path).search("how does load optimization work", 2))
+    assert hits[0]["source"] == "transport.md" and hits[0]["snippet"].startswith("Load optimization")
+    assert 0 < hits[0]["score"] <= 1
+    assert asyncio.run(LocalIndexProvider(str(tmp_path / "missing.db")).search("load", 2)) == []
+
+
+def test_local_first_routing_falls_back_below_threshold():
+    clear_caches()
+    agent = WebSearchAgent("", "", "")
+    agent.store = None
+    local = FakeProvider("local", [{"snippet": "local answer", "score": 0.9, "source": "a.md"}])
+    serper = FakeProvider("serper", [{"snippet": "web answer", "score": 1.0, "source": "https://example.com"}])
+    agent.providers = {"local": local, "serper": serper}
+
+    assert asyncio.run(agent.web_search("load optimization")) == "local answer"
+    assert serper.calls == 0
+    local.hits[0]["score"] = 0.1
+    assert asyncio.run(agent.web_search("cross docking")) == "web answer"
+    assert serper.calls == 1
+    clear_caches()
@@ -0,0 +1,106 @@
+import sys
+import os
+import json
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.session_store import SessionStore
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        if self.redis.failures:
+            self.redis.failures -= 1
+            raise ConnectionError("redis unavailable")
+        results = []
+        for name, args, kwargs in self.commands:
+            self.redis.executed.append((name, args, kwargs))
+            if name == "hgetall":
+                results.append(self.redis.hashes.get(args[0], {}))
+            elif name == "xrevrange":
+                results.append(list(reversed(self.redis.streams.get(args[0], []))))
+            else:
+                results.append(None)
+        return results
+
+
+class FakeRedis:
+    """Pipeline-only Redis stub; the first `failures` executes raise."""
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.executed = []
+        self.hashes = {}
+        self.streams = {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    def stream_writes(self):
+        return [(args[0], args[1]) for name, args, _ in self.executed if name == "xadd"]
+
+
+def test_evicted_dirty_session_keeps_unflushed_appends():
+    redis = FakeRedis()
+    store = SessionStore(redis, max_sessions=1)
+
+    async def run():
+        first = await store.get("alice")
+        first.compliance_history.append("Valid query (+1 point)")
+        store.mark_dirty(first)
+        await store.get("bob")
+        assert await store.get("alice") is first
+        await store.flush()
+    asyncio.run(run())
+    assert redis.stream_writes() == [("session:alice:history", {"event": "Valid query (+1 point)"})]
+
+
+def test_failed_flush_retries_stream_entries_exactly_once():
+    redis = FakeRedis()
+    store = SessionStore(redis)
+
+    async def run():
+        session = await store.get("alice")
+        redis.failures = 1
+        session.compliance_history.append("first")
+        store.mark_dirty(session)
+        await store.flush()
+        assert redis.stream_writes() == []
+        session.compliance_history.append("second")
+        await store.flush()
+        await store.flush()
+    asyncio.run(run())
+    assert [fields["event"] for _, fields in redis.stream_writes()] == ["first", "second"]
+
+
+def test_loaded_stream_entries_are_not_written_back():
+    redis = FakeRedis()
+    redis.hashes["session:alice"] = {"compliance_score": "90", "badges": "[]"}
+    redis.streams["session:alice:history"] = [("1-0", {"event": "old event"})]
+    redis.streams["session:alice:memory"] = [("1-0", {"entry": json.dumps({"question": "q"})})]
+    store = SessionStore(redis)
+
+    async def run():
+        session = await store.get("alice")
+        assert session.compliance_score == 90
+        assert list(session.compliance_history) == ["old event"]
+        assert list(session.conversation_memory) == [{"question": "q"}]
+        store.mark_dirty(session)
+        await store.flush()
+    asyncio.run(run())
+    assert redis.stream_writes() == []
+    assert any(name == "hset" for name, _, _ in redis.executed)
@@ -0,0 +1,66 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.speculation import Speculator, record_llm_usage, _branch_usage
+
+
+async def _llm_branch(result, delay=0.0):
+    record_llm_usage(100, 20)
+    await asyncio.sleep(delay)
+    return result
+
+
+def test_mispredicted_branch_is_cancelled_and_not_charged():
+    async def run():
+        request_usage = {"llm_calls": 0, "llm_tokens": 0}
+        _branch_usage.set(request_usage)
+        speculator = Speculator({"retrieval": True, "sql": True})
+        speculator.start("retrieval", lambda: _llm_branch("docs"))
+        speculator.start("sql", lambda: _llm_branch("rows", delay=60))
+        await asyncio.sleep(0.01)
+        await speculator.resolve({"retrieval": True, "sql": False}, classification_ms=10.0)
+
+        sql = speculator.branches["sql"]
+        assert sql.task.cancelled()
+        assert speculator.take("sql") is None
+        assert speculator.report["branches"]["sql"]["used"] is False
+        assert speculator.report["branches"]["sql"]["wasted_llm_calls"] == 1
+        assert request_usage == {"llm_calls": 0, "llm_tokens": 0}
+        await speculator.discard_unconsumed()
+    asyncio.run(run())
+
+
+def test_needed_branch_result_is_reused():
+    async def run():
+        speculator = Speculator({"retrieval": True})
+        started = []
+        speculator.start("retrieval", lambda: started.append(1) or _llm_branch("docs"))
+        speculator.start("sql", lambda: _llm_branch("rows"))  # not in the policy: never started
+        assert "sql" not in speculator.branches
+        await speculator.resolve({"retrieval": True, "sql": True}, classification_ms=10.0)
+        task = speculator.take("retrieval")
+        assert await task == "docs" and started == [1]
+        assert speculator.report["branches"]["retrieval"]["used"] is True
+        assert speculator.report["branches"]["retrieval"]["saved_ms"] <= 10.0
+    asyncio.run(run())
+
+
+def test_discard_unconsumed_leaves_no_pending_tasks():
+    async def run():
+        speculator = Speculator({"retrieval": True, "sql": True})
+        speculator.start("retrieval", lambda: _llm_branch("docs", delay=60))
+        speculator.start("sql", lambda: _llm_branch("rows", delay=60))
+        await asyncio.sleep(0.01)
+        await speculator.resolve({"retrieval": True, "sql": True}, classification_ms=10.0)
+        speculator.take("sql").cancel()  # adopted by the caller, which owns it from here
+        await speculator.discard_unconsumed()
+
+        assert speculator.branches["retrieval"].task.cancelled()
+        assert speculator.report["branches"]["retrieval"]["used"] is False
+        await asyncio.sleep(0)
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+    asyncio.run(run())
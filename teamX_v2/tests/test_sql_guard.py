@@ -0,0 +1,79 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.sql_guard import SQLGuard, SQLBudgetExceeded, cap_rows, has_order_by, _before_cursor_execute
+
+
+class FakeCursor:
+    """Returns a canned EXPLAIN plan and records the statements it was given."""
+    def __init__(self, plan):
+        self.plan = plan
+        self.executed = []
+
+    def execute(self, statement, parameters=None):
+        self.executed.append(statement)
+
+    def fetchall(self):
+        return [([{"Plan": self.plan}],)]
+
+
+def _scan(table, cost=100.0):
+    return {"Node Type": "Seq Scan", "Relation Name": table, "Total Cost": cost, "Plan Rows": 10}
+
+
+def _run(plan, statement, role="logistics_specialist"):
+    cursor = FakeCursor(plan)
+
+    async def call():
+        async with SQLGuard(engine=None).guarded(role) as state:
+            try:
+                return _before_cursor_execute(None, cursor, statement, (), None, False), state, cursor
+            except SQLBudgetExceeded:
+                return None, state, cursor
+    return asyncio.run(call())
+
+
+def test_cap_rows_wraps_the_statement():
+    assert cap_rows("SELECT * FROM orders ORDER BY order_date;", 100) == \
+        "SELECT * FROM (SELECT * FROM orders ORDER BY order_date\n) AS capped LIMIT 101"
+    assert cap_rows("SELECT * FROM orders ORDER BY order_id LIMIT 10 OFFSET 20", 100) == \
+        "SELECT * FROM (SELECT * FROM orders ORDER BY order_id LIMIT 10 OFFSET 20\n) AS capped LIMIT 101"
+    assert cap_rows("SELECT * FROM orders ORDER BY order_id FETCH FIRST 10 ROWS ONLY", 100) == \
+        "SELECT * FROM (SELECT * FROM orders ORDER BY order_id FETCH FIRST 10 ROWS ONLY\n) AS capped LIMIT 101"
+
+
+def test_unordered_statements_get_a_deterministic_order():
+    assert cap_rows("SELECT * FROM orders", 100) == "SELECT * FROM (SELECT * FROM orders\n) AS capped ORDER BY capped LIMIT 101"
+    assert has_order_by("SELECT market, count(*) FROM orders GROUP BY market ORDER BY 2 DESC LIMIT 5")
+    assert not has_order_by("SELECT * FROM (SELECT * FROM orders ORDER BY order_date) AS recent")
+    assert not has_order_by("SELECT rank() OVER (ORDER BY profit) FROM orders WHERE note = 'order by' -- order by")
+
+
+def test_cap_rows_keeps_trailing_comment_out_of_the_cap():
+    capped = cap_rows("SELECT * FROM orders -- all orders", 100)
+    assert capped.splitlines()[-1] == ") AS capped ORDER BY capped LIMIT 101"
+
+
+def test_cheap_query_runs_with_timeout_and_cap():
+    result, state, cursor = _run(_scan("shipping"), "SELECT shipping_mode FROM shipping")
+    assert result == ("SELECT * FROM (SELECT shipping_mode FROM shipping\n) AS capped ORDER BY capped LIMIT 5001", ())
+    assert cursor.executed[0].startswith("SET LOCAL statement_timeout")
+    assert state.rejection is None and state.capped
+
+
+def test_expensive_and_cartesian_queries_are_rejected():
+    _, state, _ = _run(dict(_scan("order_items"), **{"Total Cost": 5e7}), "SELECT * FROM order_items")
+    assert "estimated cost" in state.rejection
+    cartesian = {"Node Type": "Nested Loop", "Total Cost": 10.0, "Plan Rows": 1, "Plans": [_scan("orders"), _scan("order_items")]}
+    _, state, _ = _run(cartesian, "SELECT * FROM orders, order_items")
+    assert "orders x order_items" in state.rejection and state.fingerprint
+
+
+def test_unguarded_statements_pass_through():
+    cursor = FakeCursor(_scan("orders"))
+    assert _before_cursor_execute(None, cursor, "SELECT 1", (), None, False) == ("SELECT 1", ())
+    assert cursor.executed == []
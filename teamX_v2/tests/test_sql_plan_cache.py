@@ -0,0 +1,109 @@
+import sys
+import os
+import json
+import asyncio
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.sql_plan_cache import SQLPlanCache, normalize_question, parameterize, render
+from agents.sql_guard import SQLGuard, SQLBudgetExceeded
+
+
+def test_questions_with_different_literals_share_a_template():
+    a, a_literals = normalize_question("What are the top 5 products by sales in LATAM in 2017?")
+    b, b_literals = normalize_question("what are the top 10 products by sales in europe in 2016")
+    assert a == b == "what are the top {limit} products by sales in {market} in {year}"
+    assert a_literals == [("limit", 5), ("market", "LATAM"), ("year", 2017)]
+    assert b_literals == [("limit", 10), ("market", "Europe"), ("year", 2016)]
+
+
+def test_parameterize_maps_literals_to_positional_parameters():
+    _, literals = normalize_question("Top 5 products by sales in LATAM in 2017")
+    sql = ("SELECT p.product_name, SUM(oi.sales) AS total_sales FROM orders o JOIN order_items oi ON o.order_id = oi.order_id "
+           "JOIN products p ON oi.product_card_id = p.product_card_id WHERE o.market = 'LATAM' "
+           "AND EXTRACT(YEAR FROM o.order_date) = 2017 GROUP BY p.product_name ORDER BY total_sales DESC LIMIT 5")
+    statement = parameterize(sql, literals)
+    assert "o.market = $2" in statement and "= $3 GROUP" in statement and statement.endswith("LIMIT $1")
+    assert render(statement, [value for _, value in literals]) == sql
+
+
+def test_parameterize_refuses_ambiguous_literals():
+    _, literals = normalize_question("Orders in 2017")
+    assert parameterize("SELECT COUNT(*) FROM orders WHERE EXTRACT(YEAR FROM order_date) IN (2017, 2017)", literals) is None
+    assert parameterize("SELECT COUNT(*) FROM orders", literals) is None
+
+
+class FakeRow(tuple):
+    def keys(self):
+        return ["product_name"]
+
+
+class FakeDriver:
+    """asyncpg connection stand-in: EXPLAIN returns a canned plan, the cursor canned rows."""
+    def __init__(self, cost):
+        self.cost = cost
+        self.statements = []
+
+    def transaction(self):
+        return _Nothing(self)
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def fetchval(self, statement, *params):
+        self.statements.append(statement)
+        return json.dumps([{"Plan": {"Node Type": "Seq Scan", "Relation Name": "products", "Total Cost": self.cost, "Plan Rows": 5}}])
+
+    async def cursor(self, statement, *params):
+        self.statements.append(statement)
+        for name in ("Shoes", "Golf bag"):
+            yield FakeRow((name,))
+
+
+class _Nothing:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, driver):
+        self.driver_connection = driver
+
+    async def get_raw_connection(self):
+        return self
+
+
+class FakeEngine:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def connect(self):
+        return _Nothing(FakeConnection(self.driver))
+
+
+def test_cached_plans_are_costed_under_the_guard():
+    plan = {"key": "k", "sql": "SELECT product_name FROM products WHERE market = $1", "params": ["LATAM"], "columns": ["product_name"]}
+
+    async def run(cost):
+        driver = FakeDriver(cost)
+        async with SQLGuard(engine=None).guarded("logistics_specialist", 1) as state:
+            try:
+                result = await SQLPlanCache(FakeEngine(driver)).execute(plan, 1000, state.row_cap)
+            except SQLBudgetExceeded:
+                result = None
+        return result, state, driver
+
+    (results, truncated), state, driver = asyncio.run(run(10.0))
+    assert len(results) == 1 and truncated and state.rejection is None
+    assert driver.statements[1].startswith("EXPLAIN")
+
+    result, state, driver = asyncio.run(run(5e7))
+    assert result is None and "estimated cost" in state.rejection
+    assert not any(s == plan["sql"] for s in driver.statements)
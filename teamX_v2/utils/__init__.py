@@ -1,9 +1,14 @@
 from .logging_config import setup_logging
 from .cache_utils import setup_redis
 from .validation_utils import validate_query
+from .session_store import SessionStore, UserSession
+from .result_set import ResultSet
 
 __all__ = [
     "setup_logging",
     "setup_redis",
     "validate_query",
+    "SessionStore",
+    "UserSession",
+    "ResultSet",
 ]
\ No newline at end of file
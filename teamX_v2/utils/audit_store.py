@@ -0,0 +1,101 @@
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    user_id TEXT,
+    role TEXT,
+    region TEXT,
+    outcome TEXT,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_events (ts);
+CREATE INDEX IF NOT EXISTS idx_audit_user_ts ON audit_events (user_id, ts);
+CREATE INDEX IF NOT EXISTS idx_audit_role_ts ON audit_events (role, ts);
+CREATE INDEX IF NOT EXISTS idx_audit_outcome_ts ON audit_events (outcome, ts);
+CREATE TRIGGER IF NOT EXISTS audit_events_no_update BEFORE UPDATE ON audit_events
+BEGIN SELECT RAISE(ABORT, 'audit_events is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS audit_events_no_delete BEFORE DELETE ON audit_events
+BEGIN SELECT RAISE(ABORT, 'audit_events is append-only'); END;
+"""
+
+
+class AuditStore:
+    """Append-only SQLite audit table indexed on time, user, role and outcome."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def append(self, events: List[Dict[str, Any]]):
+        rows = [
+            (e.get("ts", time.time()), e.get("user_id"), e.get("role"), e.get("region"), e.get("outcome"), e["event"])
+            for e in events
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO audit_events (ts, user_id, role, region, outcome, event) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def query(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        user_id: Optional[str] = None,
+        role: Optional[str] = None,
+        outcome: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        conditions, params = [], []
+        for column, op, value in (("ts", ">=", since), ("ts", "<", until), ("user_id", "=", user_id),
+                                  ("role", "=", role), ("outcome", "=", outcome)):
+            if value is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(value)
+        sql = "SELECT ts, user_id, role, region, outcome, event FROM audit_events"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AuditStoreHandler(logging.Handler):
+    """
+    Logging handler writing 'audit' records to the AuditStore. It runs behind a
+    QueueListener, so inserts happen on the listener thread, off the request path.
+    """
+    def __init__(self, store: AuditStore):
+        super().__init__(level=logging.INFO)
+        self.store = store
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.store.append([{
+                "ts": record.created,
+                "user_id": getattr(record, "user_id", None),
+                "role": getattr(record, "role", None),
+                "region": getattr(record, "region", None),
+                "outcome": getattr(record, "outcome", None),
+                "event": record.getMessage(),
+            }])
+        except Exception:
+            self.handleError(record)
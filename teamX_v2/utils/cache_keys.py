@@ -0,0 +1,93 @@
+import struct
+import hashlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+import numpy as np
+
+
+class ContentHasher:
+    """
+    Streams a canonical, type-tagged encoding of structured values into BLAKE2b.
+    Dict keys are sorted and every value is length-prefixed, so equal content
+    always gives the same digest regardless of process, dict order or
+    PYTHONHASHSEED, and nothing is rendered to one large intermediate string.
+    Objects can take over their own encoding by defining hash_into(hasher).
+    """
+    def __init__(self, digest_size: int = 16):
+        self._h = hashlib.blake2b(digest_size=digest_size)
+
+    def _raw(self, tag: bytes, payload: bytes):
+        self._h.update(tag)
+        self._h.update(struct.pack("<Q", len(payload)))
+        self._h.update(payload)
+
+    def update(self, value: Any) -> "ContentHasher":
+        if value is None:
+            self._h.update(b"N")
+        elif isinstance(value, bool):
+            self._h.update(b"T" if value else b"F")
+        elif isinstance(value, str):
+            self._raw(b"s", value.encode("utf-8"))
+        elif isinstance(value, int):
+            self._raw(b"i", str(value).encode())
+        elif isinstance(value, float):
+            self._raw(b"f", repr(value).encode())
+        elif isinstance(value, Decimal):
+            self._raw(b"d", str(value).encode())
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            self._raw(b"b", bytes(value))
+        elif isinstance(value, dict):
+            self._h.update(b"m" + struct.pack("<Q", len(value)))
+            for key in sorted(value, key=str):
+                self.update(key)
+                self.update(value[key])
+        elif isinstance(value, (list, tuple)):
+            self._h.update(b"l" + struct.pack("<Q", len(value)))
+            for item in value:
+                self.update(item)
+        elif isinstance(value, (set, frozenset)):
+            self._h.update(b"e" + struct.pack("<Q", len(value)))
+            for item in sorted(value, key=repr):
+                self.update(item)
+        elif isinstance(value, np.ndarray):
+            self.update_array(value)
+        elif isinstance(value, np.generic):
+            self.update(value.item())
+        elif isinstance(value, (datetime, date, time)):
+            self._raw(b"t", value.isoformat().encode())
+        elif hasattr(value, "hash_into"):
+            value.hash_into(self)
+        else:
+            self._raw(b"r", repr(value).encode())
+        return self
+
+    def update_array(self, array: np.ndarray):
+        self._raw(b"a", f"{array.dtype.str}{array.shape}".encode())
+        if array.dtype == object:
+            items = array.ravel().tolist()
+            if all(type(item) is str for item in items):
+                # Text columns: one buffer of lengths and one of bytes instead of a call per cell
+                encoded = [item.encode("utf-8") for item in items]
+                self._h.update(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)).data)
+                self._h.update(b"".join(encoded))
+            else:
+                for item in items:
+                    self.update(item)
+        else:
+            self._h.update(np.ascontiguousarray(array).data)
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+def content_digest(*parts: Any) -> str:
+    hasher = ContentHasher()
+    for part in parts:
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+def content_key(namespace: str, *parts: Any) -> str:
+    """Cache key "<namespace>:<digest>", usable both in-process and in Redis."""
+    return f"{namespace}:{content_digest(*parts)}"
@@ -0,0 +1,305 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional, Union
+from .result_set import ResultSet
+
+logger = logging.getLogger(__name__)
+
+COLORS = ["#4CAF50", "#2196F3", "#FF9800", "#F44336", "#9C27B0", "#673AB7", "#FF5722", "#795548", "#607D8B", "#E91E63"]
+BORDER_COLORS = ["#388E3C", "#1976D2", "#F57C00", "#D32F2F", "#7B1FA2", "#512DA8", "#E64A19", "#5D4037", "#455A64", "#C2185B"]
+
+# Upper bounds on what is shipped to ChatInterface.js per chart
+MAX_LINE_POINTS = 500
+MAX_CATEGORIES = 50
+
+# Registry of (required columns, builder); the first matching signature wins
+_CHART_BUILDERS: List[tuple] = []
+
+
+def register_chart(*columns: str):
+    def decorator(fn: Callable[[pd.DataFrame], Dict[str, Any]]):
+        _CHART_BUILDERS.append((frozenset(columns), fn))
+        return fn
+    return decorator
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the
+    points to keep, always including the first and last point.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    # Bucket edges over the interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean() if next_end > next_start else x[-1]
+        avg_y = y[next_start:next_end].mean() if next_end > next_start else y[-1]
+        ax, ay = x[selected], y[selected]
+        areas = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+
+def _top_categories(df: pd.DataFrame, label_col: str, value_col: str, limit: int = MAX_CATEGORIES) -> pd.DataFrame:
+    # Keep the largest categories in their original order
+    if len(df) <= limit:
+        return df
+    return df.loc[df[value_col].nlargest(limit).index.sort_values()]
+
+
+def _values(series: pd.Series) -> List[float]:
+    return series.astype(float).tolist()
+
+
+@register_chart("segment", "total_order_value")
+def _segment_order_value_pie(df: pd.DataFrame) -> Dict[str, Any]:
+    df = _top_categories(df, "segment", "total_order_value")
+    return {
+        "type": "pie",
+        "data": {
+            "labels": df["segment"].astype(str).tolist(),
+            "datasets": [{
+                "label": "Total Order Value ($)",
+                "data": _values(df["total_order_value"]),
+                "backgroundColor": COLORS[:5],
+                "borderColor": BORDER_COLORS[:5],
+                "borderWidth": 1
+            }]
+        },
+        "options": {
+            "plugins": {
+                "legend": {
+                    "display": True,
+                    "position": "right"
+                },
+                "title": {
+                    "display": True,
+                    "text": "Total Order Value by Customer Segment"
+                }
+            }
+        }
+    }
+
+
+@register_chart("segment", "region", "order_count")
+def _segment_region_bar(df: pd.DataFrame) -> Dict[str, Any]:
+    # One pivot instead of filtering the frame per (segment, region) pair
+    segments = pd.unique(df["segment"])
+    regions = pd.unique(df["region"])[:MAX_CATEGORIES]
+    pivot = (
+        df.pivot_table(index="segment", columns="region", values="order_count", aggfunc="sum", fill_value=0, sort=False)
+        .reindex(index=segments, columns=regions, fill_value=0)
+    )
+    datasets = []
+    for i, (segment, values) in enumerate(zip(pivot.index, pivot.to_numpy(dtype=float))):
+        datasets.append({
+            "label": str(segment),
+            "data": values.tolist(),
+            "backgroundColor": COLORS[i % 5],
+            "borderColor": COLORS[i % 5],
+            "borderWidth": 1
+        })
+    return {
+        "type": "bar",
+        "data": {
+            "labels": [str(region) for region in regions],
+            "datasets": datasets
+        },
+        "options": {
+            "scales": {
+                "y": {
+                    "beginAtZero": True,
+                    "title": {
+                        "display": True,
+                        "text": "Number of Orders"
+                    }
+                },
+                "x": {
+                    "title": {
+                        "display": True,
+                        "text": "Region"
+                    }
+                }
+            },
+            "plugins": {
+                "legend": {
+                    "display": True,
+                    "position": "top"
+                },
+                "title": {
+                    "display": True,
+                    "text": "Distribution of Orders by Customer Segment and Region"
+                }
+            }
+        }
+    }
+
+
+@register_chart("customer_id", "total_order_value")
+def _customer_order_value_bar(df: pd.DataFrame) -> Dict[str, Any]:
+    df = _top_categories(df, "customer_id", "total_order_value")
+    return {
+        "type": "bar",
+        "data": {
+            "labels": ("Customer " + df["customer_id"].astype(str)).tolist(),
+            "datasets": [{
+                "label": "Total Order Value ($)",
+                "data": _values(df["total_order_value"]),
+                "backgroundColor": COLORS,
+                "borderColor": BORDER_COLORS,
+                "borderWidth": 1
+            }]
+        },
+        "options": {
+            "scales": {
+                "y": {
+                    "beginAtZero": True,
+                    "title": {
+                        "display": True,
+                        "text": "Total Order Value ($)"
+                    }
+                },
+                "x": {
+                    "title": {
+                        "display": True,
+                        "text": "Customer"
+                    }
+                }
+            },
+            "plugins": {
+                "legend": {
+                    "display": False
+                },
+                "title": {
+                    "display": True,
+                    "text": "Top 10 Customers by Total Order Value"
+                }
+            }
+        }
+    }
+
+
+@register_chart("year", "avg_late_risk")
+def _late_risk_trend_line(df: pd.DataFrame) -> Dict[str, Any]:
+    years = df["year"].to_numpy()
+    values = df["avg_late_risk"].to_numpy(dtype=float)
+    if len(values) > MAX_LINE_POINTS:
+        keep = lttb(years.astype(float), values, MAX_LINE_POINTS)
+        years, values = years[keep], values[keep]
+    return {
+        "type": "line",
+        "data": {
+            "labels": [str(year) for year in years.tolist()],
+            "datasets": [{
+                "label": "Average Late Delivery Risk",
+                "data": values.tolist(),
+                "borderColor": "#4CAF50",
+                "backgroundColor": "rgba(76, 175, 80, 0.2)",
+                "fill": True,
+                "tension": 0.3
+            }]
+        },
+        "options": {
+            "scales": {
+                "y": {
+                    "beginAtZero": True,
+                    "title": {
+                        "display": True,
+                        "text": "Average Late Delivery Risk"
+                    }
+                },
+                "x": {
+                    "title": {
+                        "display": True,
+                        "text": "Year"
+                    }
+                }
+            },
+            "plugins": {
+                "legend": {
+                    "display": True
+                },
+                "title": {
+                    "display": True,
+                    "text": "Trend of Late Delivery Risks Over Years"
+                }
+            }
+        }
+    }
+
+
+def build_sql_chart(sql_results: Union[ResultSet, List[Dict[str, Any]]], partial: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Build the chart for a SQL result set, or None if no builder matches its
+    columns. With partial set (the rows are only the first page of a truncated
+    result) the chart is flagged "partial" and its title says so.
+    """
+    if not sql_results:
+        return None
+    result = ResultSet.coerce(sql_results)
+    columns = set(result.columns)
+    for signature, builder in _CHART_BUILDERS:
+        if signature <= columns:
+            try:
+                chart = builder(result.to_frame())
+            except Exception as e:
+                logger.error(f"Chart builder {builder.__name__} failed: {str(e)}")
+                return None
+            if partial:
+                chart["partial"] = True
+                title = chart["options"]["plugins"]["title"]
+                title["text"] = f"{title['text']} (first {len(result)} rows only)"
+            return chart
+    return None
+
+
+def build_prediction_chart(prediction_results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not prediction_results:
+        return None
+    return {
+        "type": "bar",
+        "data": {
+            "labels": [row["shipping_mode"] for row in prediction_results],
+            "datasets": [{
+                "label": "Predicted Late Delivery Risk",
+                "data": [row["avg_predicted_late_risk"] for row in prediction_results],
+                "backgroundColor": COLORS[:4],
+                "borderColor": BORDER_COLORS[:4],
+                "borderWidth": 1
+            }]
+        },
+        "options": {
+            "scales": {
+                "y": {
+                    "beginAtZero": True,
+                    "title": {
+                        "display": True,
+                        "text": "Predicted Risk"
+                    }
+                },
+                "x": {
+                    "title": {
+                        "display": True,
+                        "text": "Shipping Mode"
+                    }
+                }
+            },
+            "plugins": {
+                "title": {
+                    "display": True,
+                    "text": "Predicted Late Delivery Risks by Shipping Mode"
+                }
+            }
+        }
+    }
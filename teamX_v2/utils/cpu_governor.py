@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config.settings import CPU_GOVERNOR
+from .metrics import INFERENCE_SECONDS, INFERENCE_QUEUE, CPU_UTILIZATION
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class _ModelStats:
+    __slots__ = ("calls", "busy_seconds", "queue_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.busy_seconds = 0.0
+        self.queue_seconds = 0.0
+
+
+class CPUGovernor:
+    """
+    Splits the node's cores between worker processes and, within a worker,
+    between models. Each model gets a dedicated single-thread executor whose
+    thread sets its own torch intra-op budget (OpenMP thread counts are per
+    calling thread), so BERT and MiniLM inference never run on the asyncio
+    loop and never claim every core. Executors are created on first use, so a
+    governor configured in a fork-server parent starts no threads before fork.
+    """
+    def __init__(self, cores: Optional[int] = None, workers: int = 1, shares: Optional[Dict[str, float]] = None):
+        self.cores = cores or available_cores()
+        self.workers = max(1, workers)
+        self.shares = dict(shares or CPU_GOVERNOR["shares"])
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._stats: Dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._cpu_started = time.process_time()
+
+    @property
+    def worker_threads(self) -> int:
+        return max(1, self.cores // self.workers)
+
+    def model_threads(self, model: str) -> int:
+        share = self.shares.get(model, CPU_GOVERNOR["default_share"])
+        return max(1, int(self.worker_threads * share))
+
+    def apply_process_limits(self):
+        """Cap BLAS/OpenMP pools for this process; call before torch is imported."""
+        threads = str(self.worker_threads)
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = threads
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        logger.info(f"CPU governor: {self.cores} cores, {self.workers} workers, {threads} threads per worker, "
+                    + ", ".join(f"{m}={self.model_threads(m)}" for m in self.shares))
+
+    def _init_thread(self, model: str):
+        try:
+            import torch
+            torch.set_num_threads(self.model_threads(model))
+        except ImportError:
+            pass
+
+    def executor(self, model: str) -> ThreadPoolExecutor:
+        executor = self._executors.get(model)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(model)
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"infer-{model}",
+                                                  initializer=self._init_thread, initargs=(model,))
+                    self._executors[model] = executor
+                    self._stats[model] = _ModelStats()
+        return executor
+
+    async def run(self, model: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run CPU-bound inference for model on its dedicated executor."""
+        executor = self.executor(model)
+        stats = self._stats[model]
+        submitted = time.perf_counter()
+        timing = [0.0, 0.0]
+
+        def call():
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timing[0], timing[1] = started - submitted, time.perf_counter() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, call)
+        finally:
+            # Stats and metrics are only touched from the event loop thread
+            stats.calls += 1
+            stats.queue_seconds += timing[0]
+            stats.busy_seconds += timing[1]
+            INFERENCE_QUEUE.observe(timing[0], model=model)
+            INFERENCE_SECONDS.inc(timing[1], model=model)
+
+    def sample(self) -> float:
+        """Process CPU time relative to this worker's thread budget since start."""
+        wall = max(time.monotonic() - self._started, 1e-9)
+        cpu_utilization = (time.process_time() - self._cpu_started) / (wall * self.worker_threads)
+        CPU_UTILIZATION.set(cpu_utilization)
+        return cpu_utilization
+
+    def stats(self) -> Dict[str, Any]:
+        wall = max(time.monotonic() - self._started, 1e-9)
+        cpu_utilization = self.sample()
+        return {
+            "cores": self.cores,
+            "workers": self.workers,
+            "worker_threads": self.worker_threads,
+            "cpu_utilization": round(cpu_utilization, 4),
+            "models": {
+                model: {
+                    "threads": self.model_threads(model),
+                    "calls": s.calls,
+                    "busy_seconds": round(s.busy_seconds, 4),
+                    "queue_seconds": round(s.queue_seconds, 4),
+                    "utilization": round(s.busy_seconds / wall, 4),
+                }
+                for model, s in self._stats.items()
+            },
+        }
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors.clear()
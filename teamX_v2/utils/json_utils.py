@@ -0,0 +1,31 @@
+import logging
+import orjson
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+import numpy as np
+from .result_set import ResultSet
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ResultSet):
+        return obj.to_json_dict()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize an agent response with orjson. Numeric numpy arrays are encoded
+    natively; ResultSet, Decimal and other numpy values go through _default.
+    """
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
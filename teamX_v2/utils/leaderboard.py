@@ -0,0 +1,102 @@
+import time
+import asyncio
+import bisect
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderboardWriter:
+    """
+    Write-behind leaderboard. Score updates are queued and flushed to the Redis
+    sorted set in one pipelined ZADD per interval; ranks are computed from a
+    periodically refreshed local snapshot that is never older than max_staleness.
+    """
+    def __init__(self, redis_client, key: str = "leaderboard", flush_interval: float = 0.5,
+                 refresh_interval: float = 1.0, max_staleness: float = 2.0):
+        self.redis_client = redis_client
+        self.key = key
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self._pending: Dict[str, float] = {}
+        self._scores: Dict[str, float] = {}
+        self._sorted_scores: List[float] = []
+        self._snapshot_time = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, user_id: str, score: float):
+        # Latest score wins; older queued values for the same user are superseded
+        self._pending[user_id] = score
+
+    async def flush(self):
+        if not self._pending or not self.redis_client:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.zadd(self.key, batch)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Leaderboard flush failed, will retry: {str(e)}")
+            for user_id, score in batch.items():
+                self._pending.setdefault(user_id, score)
+
+    async def refresh(self):
+        if not self.redis_client:
+            return
+        async with self._refresh_lock:
+            try:
+                entries = await self.redis_client.zrange(self.key, 0, -1, withscores=True)
+            except Exception as e:
+                logger.error(f"Leaderboard snapshot refresh failed: {str(e)}")
+                return
+            self._scores = {user_id: score for user_id, score in entries}
+            self._sorted_scores = [score for _, score in entries]
+            self._snapshot_time = time.time()
+
+    @property
+    def staleness(self) -> float:
+        return time.time() - self._snapshot_time
+
+    async def rank(self, user_id: str, score: Optional[float] = None) -> Tuple[int, float]:
+        """
+        Return (1-based rank, snapshot age in seconds) for user_id. A snapshot
+        older than max_staleness is refreshed inline, bounding how stale ranks get.
+        """
+        if self.staleness > self.max_staleness:
+            await self.refresh()
+        if score is None:
+            score = self._pending.get(user_id, self._scores.get(user_id, 0))
+        # Number of other users with a strictly higher score, using the caller's
+        # latest score even if it has not been flushed yet
+        higher = len(self._sorted_scores) - bisect.bisect_right(self._sorted_scores, score)
+        previous = self._scores.get(user_id)
+        if previous is not None and previous > score:
+            higher -= 1
+        return higher + 1, self.staleness
+
+    async def _run_every(self, interval: float, fn):
+        while True:
+            await asyncio.sleep(interval)
+            await fn()
+
+    def start(self):
+        if not self._tasks and self.redis_client:
+            self._tasks = [
+                asyncio.create_task(self._run_every(self.flush_interval, self.flush)),
+                asyncio.create_task(self._run_every(self.refresh_interval, self.refresh)),
+            ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.flush()
@@ -1,22 +1,138 @@
-import logging
 import os
-from config.settings import AUDIT_LOG_FILE
-
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("app.log"),
-            logging.StreamHandler()
-        ]
-    )
-
-    audit_handler = logging.FileHandler(AUDIT_LOG_FILE)
-    audit_handler.setLevel(logging.INFO)
-    audit_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+import json
+import queue
+import atexit
+import random
+import logging
+from typing import Optional
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config.settings import AUDIT_DB_FILE, LOGGING, TRACING
+from .audit_store import AuditStore, AuditStoreHandler
+
+_listener = None
+
+# LogRecord attributes that are not user-supplied "extra" fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any fields passed via extra=."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes records logged with extra={"sampled": True} at the given rate; others always pass."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False):
+            return random.random() < self.rate
+        return True
+
+
+class TraceFormatter(logging.Formatter):
+    """The OTLP/JSON trace carried by a trace_export record, one per line."""
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.otlp, default=str)
+
+
+class _LoggerFilter(logging.Filter):
+    """Passes records of the named loggers (only=True), or of every other logger (only=False)."""
+    def __init__(self, names, only: bool):
+        super().__init__()
+        self.names = frozenset(names)
+        self.only = only
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (record.name in self.names) == self.only
+
+
+def stop_logging():
+    """Drain the queue and stop the listener thread. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def worker_log_path(path: str, worker: Optional[int]) -> str:
+    """The log file of a forked worker: app.log -> app.worker3.log. None is the parent's own file."""
+    if worker is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.worker{worker}{ext}"
+
+
+def reinit_logging_after_fork(worker: int):
+    """
+    In a forked child: the listener thread did not survive fork, so start a fresh
+    one writing to the worker's own files. Rotating handlers of several processes
+    on one file would rename it under each other and lose lines.
+    """
+    global _listener
+    _listener = None
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+        root.removeHandler(handler)
+    setup_logging(worker)
+
+
+def setup_logging(worker: Optional[int] = None):
+    """
+    Route application and audit logs through a queue so request handlers never
+    block on disk I/O. A background QueueListener writes size-rotated JSON lines
+    to app.log, plain text to the console, audit events to the SQLite audit
+    store and exported traces to the trace file. A forked worker passes its slot
+    and gets files of its own (see worker_log_path).
+    """
+    global _listener
     audit_logger = logging.getLogger('audit')
-    audit_logger.addHandler(audit_handler)
+    if _listener is not None:
+        return audit_logger
+
+    file_handler = RotatingFileHandler(worker_log_path("app.log", worker), maxBytes=LOGGING["max_bytes"], backupCount=LOGGING["backup_count"])
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    audit_handler = AuditStoreHandler(AuditStore(AUDIT_DB_FILE))
+    handlers = [file_handler, stream_handler, audit_handler]
+
+    # Audit records go only to the audit store, traces only to the trace file;
+    # everything else to file + console
+    audit_handler.addFilter(_LoggerFilter(['audit'], only=True))
+    file_handler.addFilter(_LoggerFilter(['audit', 'trace_export'], only=False))
+    stream_handler.addFilter(_LoggerFilter(['audit', 'trace_export'], only=False))
+    if TRACING["enabled"]:
+        trace_handler = RotatingFileHandler(worker_log_path(TRACING["file"], worker), maxBytes=TRACING["max_bytes"], backupCount=TRACING["backup_count"])
+        trace_handler.setFormatter(TraceFormatter())
+        trace_handler.addFilter(_LoggerFilter(['trace_export'], only=True))
+        handlers.append(trace_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOGGING["verbose_sample_rate"]))
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
     audit_logger.setLevel(logging.INFO)
 
-    return audit_logger
\ No newline at end of file
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    return audit_logger
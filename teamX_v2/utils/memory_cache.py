@@ -0,0 +1,184 @@
+import sys
+import time
+import heapq
+import logging
+import itertools
+from typing import Any, Dict, Hashable, Optional
+import numpy as np
+from config.settings import MEMORY_CACHE
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def estimate_size(obj: Any, _depth: int = 0) -> int:
+    """Approximate deep size in bytes of a cache key or value."""
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes + 112
+    if _depth > 8:
+        return sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return size + sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item, _depth + 1) for item in obj)
+    if hasattr(obj, "__dict__"):
+        return size + estimate_size(vars(obj), _depth + 1)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "cost", "priority", "seq", "expires_at")
+
+    def __init__(self, value: Any, size: int, cost: float, expires_at: float):
+        self.value = value
+        self.size = size
+        self.cost = cost
+        self.priority = 0.0
+        self.seq = 0
+        self.expires_at = expires_at
+
+
+class ByteBoundedCache:
+    """
+    TTL cache bounded by estimated bytes (key + value) rather than entry count.
+
+    Eviction is GreedyDual-Size: an entry's priority is the cache's inflation
+    value plus recompute latency / size, so large entries that are cheap to
+    recompute go first and expensive small ones survive. The inflation value is
+    raised to each evicted priority, which ages out entries that stop being used.
+    """
+    def __init__(self, namespace: str, max_bytes: int, ttl: float = 7200):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._inflation = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return False
+        return True
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self:
+            return default
+        entry = self._entries[key]
+        self._touch(key, entry)
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, cost: float = 0.001):
+        """Store value; cost is the seconds it took to compute (its recompute latency)."""
+        if key in self._entries:
+            self._remove(key)
+        size = estimate_size(key) + estimate_size(value)
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {size} byte entry in '{self.namespace}' (budget {self.max_bytes})")
+            return
+        while self.bytes + size > self.max_bytes and self._entries:
+            self._evict_one()
+        entry = _Entry(value, size, max(cost, 1e-6), time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        self.bytes += size
+        self._touch(key, entry)
+
+    def resize(self, max_bytes: int):
+        """Change the byte budget, evicting down to it if it shrank."""
+        self.max_bytes = max_bytes
+        while self.bytes > self.max_bytes and self._entries:
+            self._evict_one()
+
+    def discard(self, key: Hashable):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._heap.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"bytes": self.bytes, "max_bytes": self.max_bytes, "entries": len(self._entries), "evictions": self.evictions}
+
+    def _touch(self, key: Hashable, entry: _Entry):
+        entry.priority = self._inflation + entry.cost / entry.size
+        entry.seq = next(self._counter)
+        heapq.heappush(self._heap, (entry.priority, entry.seq, key))
+        # Stale heap items accumulate on every access; rebuild when they dominate
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(e.priority, e.seq, k) for k, e in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def _evict_one(self):
+        now = time.monotonic()
+        while self._heap:
+            priority, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry.seq != seq:
+                continue
+            if entry.expires_at > now:
+                self._inflation = priority
+                self.evictions += 1
+            self._remove(key)
+            return
+
+
+_caches: Dict[str, ByteBoundedCache] = {}
+
+
+def _share(namespace: str) -> float:
+    return MEMORY_CACHE["shares"].get(namespace, MEMORY_CACHE["default_share"])
+
+
+def get_cache(namespace: str, ttl: Optional[float] = None) -> ByteBoundedCache:
+    """
+    Process-wide cache for a namespace. Its byte budget is the namespace's share
+    of MEMORY_CACHE["budget_bytes"]; unnamed namespaces get default_share. When
+    the shares of the namespaces in use add up to more than 1, every budget is
+    scaled down (and existing caches evicted) so their sum stays within the budget.
+    """
+    cache = _caches.get(namespace)
+    if cache is None:
+        cache = ByteBoundedCache(namespace, 0, ttl if ttl is not None else MEMORY_CACHE["ttl"])
+        _caches[namespace] = cache
+        scale = min(1.0, 1.0 / sum(_share(name) for name in _caches))
+        for name, existing in _caches.items():
+            existing.resize(int(MEMORY_CACHE["budget_bytes"] * _share(name) * scale))
+    return cache
+
+
+def clear_caches():
+    for cache in _caches.values():
+        cache.clear()
+
+
+def cache_report() -> Dict[str, Dict[str, Any]]:
+    """Current bytes, budget, entry count and evictions for every cache."""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+from config.settings import METRICS
+from .tracing import Span, add_span_listener
+from .memory_cache import cache_report
+
+logger = logging.getLogger(__name__)
+
+# Metrics are aggregated in-process and flushed as deltas to Redis so that
+# every agent process (including short-lived --api-mode subprocesses) adds to
+# the same totals. The backend's /metrics endpoint renders them. Redis layout:
+#   metrics:registry          hash name -> {"type", "help", "buckets"}
+#   metrics:c:<name>          hash <labels> -> counter value
+#   metrics:h:<name>          hash <labels>|le=<bucket> / |sum / |count -> cumulative values
+#   metrics:g:<name>          hash <labels>|<worker> -> gauge value (summed over workers)
+#   metrics:workers           sorted set <worker> -> heartbeat deadline (unix time); gauges
+#                             of workers past their deadline (killed, timed out) are dropped
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _reset_worker_id():
+    # Preforked workers must not report gauges under the parent's pid
+    global WORKER_ID
+    WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+os.register_at_fork(after_in_child=_reset_worker_id)
+
+
+def _labels_key(labels: Dict[str, str]) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        _REGISTRY[name] = self
+
+    def _key(self, labels: Dict[str, str]) -> str:
+        return _labels_key({k: str(labels.get(k, "")) for k in self.labelnames})
+
+    def describe(self) -> Dict:
+        return {"type": self.kind, "help": self.help}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._deltas: Dict[str, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._deltas[key] = self._deltas.get(key, 0.0) + amount
+
+    def drain(self) -> Dict[str, float]:
+        deltas, self._deltas = self._deltas, {}
+        return deltas
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        self._deltas: Dict[str, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        d = self._deltas
+        for bound in self.buckets:
+            if value <= bound:
+                field = f"{key}|le={bound}"
+                d[field] = d.get(field, 0.0) + 1
+        d[f"{key}|le=+Inf"] = d.get(f"{key}|le=+Inf", 0.0) + 1
+        d[f"{key}|sum"] = d.get(f"{key}|sum", 0.0) + value
+        d[f"{key}|count"] = d.get(f"{key}|count", 0.0) + 1
+
+    def drain(self) -> Dict[str, float]:
+        deltas, self._deltas = self._deltas, {}
+        return deltas
+
+    def describe(self) -> Dict:
+        return {"type": self.kind, "help": self.help, "buckets": list(self.buckets)}
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[str, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def values(self) -> Dict[str, float]:
+        return dict(self._values)
+
+
+_REGISTRY: Dict[str, _Metric] = {}
+
+REQUEST_LATENCY = Histogram("agent_request_latency_seconds", "End-to-end handle_query latency", ["intent"])
+STAGE_LATENCY = Histogram("agent_stage_latency_seconds", "Latency of pipeline stages (tracing spans)", ["stage"])
+LLM_CALLS = Counter("agent_llm_calls_total", "LLM calls by agent, model and outcome", ["agent", "model", "outcome"])
+LLM_TOKENS = Counter("agent_llm_tokens_total", "LLM tokens by model and kind", ["model", "kind"])
+LLM_RATE_LIMITED = Counter("agent_llm_rate_limited_total", "LLM responses with HTTP 429", ["model"])
+CACHE_REQUESTS = Counter("agent_cache_requests_total", "Cache lookups by namespace and result", ["namespace", "result"])
+DB_POOL = Gauge("agent_db_pool_connections", "SQLAlchemy pool connections by state", ["state"])
+CLASSIFIER_BATCH_SIZE = Histogram("agent_classifier_batch_size", "Query parts classified per classify_query call", [], buckets=(1, 2, 3, 4, 8, 16))
+WORKERS_BUSY = Gauge("agent_workers_busy", "handle_query calls in flight")
+INFERENCE_SECONDS = Counter("agent_inference_busy_seconds_total", "CPU inference time by model executor", ["model"])
+INFERENCE_QUEUE = Histogram("agent_inference_queue_seconds", "Wait for a model's inference executor", ["model"])
+CPU_UTILIZATION = Gauge("agent_cpu_utilization_ratio", "Process CPU time relative to the worker's thread budget")
+CACHE_BYTES = Gauge("agent_cache_bytes", "Estimated bytes held by in-process caches", ["namespace"])
+CACHE_BUDGET_BYTES = Gauge("agent_cache_budget_bytes", "Byte budget of in-process caches", ["namespace"])
+SQL_GUARD_DECISIONS = Counter("agent_sql_guard_decisions_total", "Generated SQL statements by preflight decision", ["decision"])
+SQL_PROMPT_TOKENS = Histogram("agent_sql_prompt_context_tokens", "Schema + few-shot tokens per SQL prompt, full vs selected", ["context"],
+                              buckets=(250, 500, 750, 1000, 1500, 2000, 3000, 5000))
+SEARCH_LATENCY = Histogram("agent_search_latency_seconds", "Web search latency by provider and outcome", ["provider", "outcome"])
+
+
+def _observe_stage(span: Span):
+    STAGE_LATENCY.observe(span.duration_ms / 1000, stage=span.name)
+
+
+add_span_listener(_observe_stage)
+
+
+def record_cache(namespace: str, hit: bool):
+    CACHE_REQUESTS.inc(namespace=namespace, result="hit" if hit else "miss")
+
+
+def sample_db_pool(engine):
+    # AsyncEngine wraps a sync Engine whose QueuePool exposes the counters
+    pool = getattr(getattr(engine, "sync_engine", engine), "pool", None)
+    if pool is None or not hasattr(pool, "checkedout"):
+        return
+    DB_POOL.set(pool.checkedout(), state="checked_out")
+    DB_POOL.set(pool.checkedin(), state="idle")
+    DB_POOL.set(max(pool.overflow(), 0), state="overflow")
+    DB_POOL.set(pool.size(), state="size")
+
+
+def sample_caches():
+    for namespace, stats in cache_report().items():
+        CACHE_BYTES.set(stats["bytes"], namespace=namespace)
+        CACHE_BUDGET_BYTES.set(stats["max_bytes"], namespace=namespace)
+
+
+class MetricsFlusher:
+    """Periodically pushes metric deltas to Redis in one pipeline."""
+    def __init__(self, redis_client, interval: float = 5.0, engine=None):
+        self.redis_client = redis_client
+        self.interval = interval
+        self.engine = engine
+        self._task: Optional[asyncio.Task] = None
+        self._registered = False
+
+    async def flush(self):
+        if not self.redis_client:
+            return
+        if self.engine is not None:
+            sample_db_pool(self.engine)
+        sample_caches()
+        writes: Tuple = tuple((metric, metric.drain()) for metric in _REGISTRY.values() if metric.kind != "gauge")
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                if not self._registered:
+                    pipe.hset("metrics:registry", mapping={name: json.dumps(m.describe()) for name, m in _REGISTRY.items()})
+                for metric, deltas in writes:
+                    prefix = "c" if metric.kind == "counter" else "h"
+                    for field, value in deltas.items():
+                        pipe.hincrbyfloat(f"metrics:{prefix}:{metric.name}", field, value)
+                for metric in _REGISTRY.values():
+                    if metric.kind == "gauge":
+                        for key, value in metric.values().items():
+                            pipe.hset(f"metrics:g:{metric.name}", f"{key}|{WORKER_ID}", value)
+                pipe.zadd("metrics:workers", {WORKER_ID: time.time() + METRICS["worker_ttl"]})
+                await pipe.execute()
+            self._registered = True
+        except Exception as e:
+            logger.error(f"Metrics flush failed: {str(e)}")
+            # Put the deltas back so they are retried with the next flush
+            for metric, deltas in writes:
+                for field, value in deltas.items():
+                    metric._deltas[field] = metric._deltas.get(field, 0.0) + value
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None and self.redis_client:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        # This worker's gauges no longer contribute to the live sum
+        if self.redis_client:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for metric in _REGISTRY.values():
+                        if metric.kind == "gauge":
+                            for key in metric.values():
+                                pipe.hdel(f"metrics:g:{metric.name}", f"{key}|{WORKER_ID}")
+                    pipe.zrem("metrics:workers", WORKER_ID)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to clear worker gauges: {str(e)}")
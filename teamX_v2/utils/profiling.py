@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads every `interval` seconds from a daemon
+    thread and aggregates them in collapsed-stack format ("frame;frame;frame count"),
+    which flamegraph.pl, speedscope and inferno read directly. The event loop thread
+    idling in selector.select shows up as its own stack, separating I/O waits from CPU.
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            frames.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(frames))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_collapsed(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _allocation_report(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top_n: int) -> str:
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"Traced memory: current={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB", "",
+             f"Top {top_n} allocation sites by net growth:"]
+    for stat in after.compare_to(before, "lineno")[:top_n]:
+        lines.append(str(stat))
+    lines += ["", f"Top {top_n} live allocation sites:"]
+    for stat in after.statistics("lineno")[:top_n]:
+        lines.append(str(stat))
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile(name: str, enabled: bool, output_dir: str = "profiles", interval: float = 0.005, top_n: int = 25):
+    """
+    Profile the enclosed block with the sampling profiler and tracemalloc. When
+    disabled this is a bare yield, so it can wrap production code paths.
+    Yields a dict that receives the output paths once the block exits.
+    """
+    if not enabled:
+        yield None
+        return
+
+    result: Dict[str, str] = {}
+    os.makedirs(output_dir, exist_ok=True)
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(25)
+    before = tracemalloc.take_snapshot()
+    profiler = SamplingProfiler(interval)
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        yield result
+    finally:
+        profiler.stop()
+        elapsed = time.perf_counter() - start
+        after = tracemalloc.take_snapshot()
+        stem = os.path.join(output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        try:
+            profiler.write_collapsed(f"{stem}.collapsed")
+            with open(f"{stem}.alloc.txt", "w") as f:
+                f.write(_allocation_report(before, after, top_n))
+            result.update({"stacks": f"{stem}.collapsed", "allocations": f"{stem}.alloc.txt"})
+            logger.info(f"Profile of {name}: {elapsed * 1000:.1f} ms, {profiler.samples} samples, written to {stem}.*")
+        except OSError as e:
+            logger.error(f"Failed to write profile {stem}: {str(e)}")
+        finally:
+            if started_tracemalloc:
+                tracemalloc.stop()
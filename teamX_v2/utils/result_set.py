@@ -0,0 +1,119 @@
+import logging
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Sequence, Union
+import numpy as np
+from .cache_keys import content_digest
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+_INT64 = np.iinfo(np.int64)
+
+
+def _is_integral(value: Any) -> bool:
+    # Integral NUMERICs such as EXTRACT(YEAR ...) have a non-negative exponent;
+    # NaN/Infinity Decimals have a letter exponent and are not integral
+    if isinstance(value, Decimal):
+        return value.is_finite() and value.as_tuple().exponent >= 0
+    return isinstance(value, int)
+
+
+def _column_array(values: Sequence[Any]) -> np.ndarray:
+    # Numeric columns (including Postgres NUMERIC -> Decimal) become typed arrays;
+    # anything else, columns containing NULLs, or integers beyond int64 stay as
+    # an object array.
+    if values and all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in values):
+        if all(_is_integral(v) for v in values):
+            if all(_INT64.min <= v <= _INT64.max for v in values):
+                return np.array([int(v) for v in values], dtype=np.int64)
+        else:
+            return np.array([float(v) for v in values], dtype=np.float64)
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+
+def _python_value(value: Any) -> Any:
+    # NumPy scalars -> builtin types so row views behave like the old row dicts
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ResultSet:
+    """
+    Columnar SQL result: one NumPy array per column. Supports the row-oriented
+    access the rest of the pipeline was written against (len, indexing, slicing
+    and iteration yield dict rows) so it can replace a list of row dicts.
+    """
+    def __init__(self, columns: List[str], data: Dict[str, np.ndarray]):
+        self.columns = list(columns)
+        self.data = data
+        self._length = len(data[self.columns[0]]) if self.columns else 0
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> "ResultSet":
+        """Build from a cursor's column names and row tuples, transposing once."""
+        rows = list(rows)
+        columns = list(columns)
+        transposed = list(zip(*rows)) if rows else [() for _ in columns]
+        return cls(columns, {name: _column_array(values) for name, values in zip(columns, transposed)})
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "ResultSet":
+        if not records:
+            return cls([], {})
+        columns = list(records[0].keys())
+        return cls(columns, {name: _column_array([row.get(name) for row in records]) for name in columns})
+
+    @classmethod
+    def coerce(cls, results: Union["ResultSet", List[Dict[str, Any]], None]) -> "ResultSet":
+        if isinstance(results, cls):
+            return results
+        return cls.from_records(results or [])
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ResultSet(self.columns, {name: self.data[name][index] for name in self.columns})
+        return {name: _python_value(self.data[name][index]) for name in self.columns}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._length):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"ResultSet(columns={self.columns}, rows={self._length})"
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[name]
+
+    def head(self, n: int = 5) -> "ResultSet":
+        return self[:n]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        lists = [self.data[name].tolist() for name in self.columns]
+        return [dict(zip(self.columns, values)) for values in zip(*lists)]
+
+    def to_frame(self) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.DataFrame({name: self.data[name] for name in self.columns}, columns=self.columns)
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        """Columnar JSON shape: {"columns": [...], "data": {column: [values]}}."""
+        return {"columns": self.columns, "data": self.data}
+
+    def hash_into(self, hasher):
+        # Content hash over the raw column buffers; avoids str() on every row
+        hasher.update(self.columns)
+        for name in self.columns:
+            hasher.update_array(self.data[name])
+
+    def digest(self) -> str:
+        return content_digest(self)
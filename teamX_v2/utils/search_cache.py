@@ -0,0 +1,116 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache (accessed_at);
+CREATE TABLE IF NOT EXISTS search_refresh (
+    key TEXT PRIMARY KEY,
+    claimed_at REAL NOT NULL
+);
+"""
+
+_PUNCTUATION = re.compile(r"[^\w\s-]")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a search query: case, punctuation and spacing don't change the results."""
+    return " ".join(_PUNCTUATION.sub(" ", query.lower()).split())
+
+
+class SearchCache:
+    """
+    Persistent SQLite store of search results shared by every process on the
+    host, so results survive --api-mode's one-request processes. get() returns
+    an entry with its age and leaves freshness to the caller; put() evicts the
+    least recently read entries once the file holds more than max_bytes of
+    results. claim_refresh() lets one process at a time refresh a stale entry.
+    The connection is opened lazily per process, after any fork.
+    """
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=1.0)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, age in seconds) for the key, or None."""
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT value, fetched_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                with conn:
+                    conn.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache read failed: {str(e)}")
+            return None
+        return row[0], time.time() - row[1]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO search_cache (key, value, fetched_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+                        (key, value, now, now, len(key) + len(value.encode()))
+                    )
+                    conn.execute("DELETE FROM search_refresh WHERE key = ?", (key,))
+                    # LRU: keep the most recently read entries that fit in max_bytes
+                    conn.execute(
+                        "DELETE FROM search_cache WHERE key IN (SELECT key FROM "
+                        "(SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running FROM search_cache) "
+                        "WHERE running > ?)",
+                        (self.max_bytes,)
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache write failed: {str(e)}")
+
+    def claim_refresh(self, key: str, lease: float) -> bool:
+        """True if this caller should refresh the key: nobody else claimed it in the last lease seconds."""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    claimed = conn.execute(
+                        "INSERT INTO search_refresh (key, claimed_at) VALUES (?, ?) "
+                        "ON CONFLICT (key) DO UPDATE SET claimed_at = excluded.claimed_at WHERE claimed_at < ?",
+                        (key, now, now - lease)
+                    ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache refresh claim failed: {str(e)}")
+            return False
+        return claimed == 1
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
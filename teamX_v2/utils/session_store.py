@@ -0,0 +1,176 @@
+import json
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+from cachetools import LRUCache
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingDeque(deque):
+    """Bounded deque that also remembers entries appended since the last flush."""
+    def __init__(self, maxlen: int):
+        super().__init__(maxlen=maxlen)
+        self.pending: List = []
+
+    def append(self, item):
+        super().append(item)
+        self.pending.append(item)
+
+    def take_pending(self) -> List:
+        pending, self.pending = self.pending, []
+        return pending
+
+
+class UserSession:
+    """Per-user gamification and conversation state."""
+    def __init__(self, user_id: str, history_limit: int = 50, memory_limit: int = 10):
+        self.user_id = user_id
+        self.compliance_score = 100
+        # Appends (including those made by validate_query) are queued for the Redis streams
+        self.compliance_history = _PendingDeque(history_limit)
+        self.badges: List[str] = []
+        self.query_count = 0
+        self.successful_queries = 0
+        # Running count for the Policy Expert badge, so awarding it needs no history scan
+        self.policy_queries = 0
+        self.conversation_memory = _PendingDeque(memory_limit)
+
+    def to_hash(self) -> Dict[str, str]:
+        return {
+            "compliance_score": str(self.compliance_score),
+            "query_count": str(self.query_count),
+            "successful_queries": str(self.successful_queries),
+            "policy_queries": str(self.policy_queries),
+            "badges": json.dumps(self.badges),
+        }
+
+    def load_hash(self, data: Dict[str, str]):
+        self.compliance_score = int(data.get("compliance_score", self.compliance_score))
+        self.query_count = int(data.get("query_count", self.query_count))
+        self.successful_queries = int(data.get("successful_queries", self.successful_queries))
+        self.policy_queries = int(data.get("policy_queries", self.policy_queries))
+        self.badges = json.loads(data.get("badges", "[]"))
+
+
+class SessionStore:
+    """
+    User-keyed session state: a hot in-process LRU in front of Redis.
+    Scalars live in a hash (session:<user>), compliance history and conversation
+    memory in capped streams. Sessions load lazily on first access and dirty
+    sessions are written back in pipelined batches.
+    """
+    def __init__(self, redis_client=None, max_sessions: int = 1000, history_limit: int = 50,
+                 memory_limit: int = 10, flush_interval: float = 1.0):
+        self.redis_client = redis_client
+        self.history_limit = history_limit
+        self.memory_limit = memory_limit
+        self.flush_interval = flush_interval
+        self._sessions = LRUCache(maxsize=max_sessions)
+        self._dirty: Dict[str, UserSession] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _keys(user_id: str):
+        return f"session:{user_id}", f"session:{user_id}:history", f"session:{user_id}:memory"
+
+    async def get(self, user_id: str) -> UserSession:
+        # Dirty sessions stay reachable after LRU eviction until they are flushed
+        session = self._sessions.get(user_id) or self._dirty.get(user_id)
+        record_cache("session", session is not None)
+        if session is not None:
+            self._sessions[user_id] = session
+            return session
+
+        # Coalesce concurrent loads of the same user
+        if user_id in self._loading:
+            return await self._loading[user_id]
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        try:
+            session = await self._load(user_id)
+            self._sessions[user_id] = session
+            future.set_result(session)
+            return session
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._loading[user_id]
+
+    async def _load(self, user_id: str) -> UserSession:
+        session = UserSession(user_id, self.history_limit, self.memory_limit)
+        if not self.redis_client:
+            return session
+        hash_key, history_key, memory_key = self._keys(user_id)
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hgetall(hash_key)
+                pipe.xrevrange(history_key, count=self.history_limit)
+                pipe.xrevrange(memory_key, count=self.memory_limit)
+                data, history, memory = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to load session for {user_id}: {str(e)}")
+            return session
+        if data:
+            session.load_hash(data)
+        # extend() bypasses append(), so loaded entries are not queued for write-back
+        deque.extend(session.compliance_history, (fields["event"] for _, fields in reversed(history)))
+        deque.extend(session.conversation_memory, (json.loads(fields["entry"]) for _, fields in reversed(memory)))
+        return session
+
+    def mark_dirty(self, session: UserSession):
+        self._dirty[session.user_id] = session
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        # Detach pending stream entries up front so appends made while the
+        # pipeline is in flight land in the next batch
+        writes = {
+            user_id: (session.to_hash(), session.compliance_history.take_pending(), session.conversation_memory.take_pending())
+            for user_id, session in batch.items()
+        }
+        if not self.redis_client:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for user_id, (scalars, history, memory) in writes.items():
+                    hash_key, history_key, memory_key = self._keys(user_id)
+                    pipe.hset(hash_key, mapping=scalars)
+                    for event in history:
+                        pipe.xadd(history_key, {"event": event}, maxlen=self.history_limit, approximate=True)
+                    for entry in memory:
+                        pipe.xadd(memory_key, {"entry": json.dumps(entry)}, maxlen=self.memory_limit, approximate=True)
+                await pipe.execute()
+            logger.info(f"Flushed {len(batch)} session(s) to Redis")
+        except Exception as e:
+            logger.error(f"Session write-back failed, will retry: {str(e)}")
+            for user_id, session in batch.items():
+                _, history, memory = writes[user_id]
+                session.compliance_history.pending[:0] = history
+                session.conversation_memory.pending[:0] = memory
+                self._dirty.setdefault(user_id, session)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,48 @@
+import os
+import json
+import logging
+from typing import List, Optional
+import numpy as np
+from config.settings import SNAPSHOT
+from .cache_keys import content_digest
+
+logger = logging.getLogger(__name__)
+
+# Precomputed artifacts (e.g. embeddings of fixed question lists) stored as .npy
+# files plus a manifest. Each entry records a digest of the model name and input
+# texts, so a snapshot built from different texts or another model is ignored.
+
+
+def _manifest_path() -> str:
+    return os.path.join(SNAPSHOT["dir"], "manifest.json")
+
+
+def _read_manifest() -> dict:
+    try:
+        with open(_manifest_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_embeddings(name: str, texts: List[str], embeddings: np.ndarray, model_name: str):
+    os.makedirs(SNAPSHOT["dir"], exist_ok=True)
+    np.save(os.path.join(SNAPSHOT["dir"], f"{name}.npy"), np.asarray(embeddings, dtype=np.float32))
+    manifest = _read_manifest()
+    manifest[name] = {"digest": content_digest(model_name, texts), "model": model_name, "count": len(texts)}
+    tmp_path = _manifest_path() + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path())
+
+
+def load_embeddings(name: str, texts: List[str], model_name: str) -> Optional[np.ndarray]:
+    """Memory-map a snapshot's embeddings, or None if missing or stale."""
+    entry = _read_manifest().get(name)
+    if not entry or entry.get("digest") != content_digest(model_name, texts):
+        return None
+    try:
+        return np.load(os.path.join(SNAPSHOT["dir"], f"{name}.npy"), mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to load snapshot '{name}': {str(e)}")
+        return None
@@ -0,0 +1,34 @@
+import time
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase took. mark(name) closes the phase that
+    began at the previous mark (or at import of this module); record() adds
+    phases timed elsewhere, such as lazily materialized models.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def record(self, name: str, duration_ms: float):
+        self.phases.append((name, duration_ms))
+
+    def report(self) -> Dict[str, float]:
+        report = {name: round(ms, 1) for name, ms in self.phases}
+        report["total"] = round((self._last - self.started) * 1000, 1)
+        logger.info("Startup phases: " + ", ".join(f"{name}={ms:.1f} ms" for name, ms in report.items()))
+        return report
+
+
+startup_timer = StartupTimer()
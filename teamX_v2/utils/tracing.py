@@ -0,0 +1,163 @@
+import os
+import time
+import json
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# The active trace and span. asyncio copies the context into every task it
+# creates (including those made by asyncio.gather), so spans opened inside
+# gathered coroutines are parented to the span that was current at the gather.
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+# Callbacks invoked with every finished child span (e.g. stage latency metrics)
+_span_listeners: List[Callable[["Span"], None]] = []
+
+
+def add_span_listener(listener: Callable[["Span"], None]):
+    _span_listeners.append(listener)
+
+
+def set_trace_attribute(key: str, value: Any):
+    """Set an attribute on the root span of the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.root.set_attribute(key, value)
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in self.attributes.items()],
+            "status": {"code": 1 if self.status == "ok" else 2},
+        }
+
+
+class Trace:
+    def __init__(self, name: str, **attributes):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.root = Span(name, self.trace_id, None, attributes)
+        self.spans.append(self.root)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.trace_id, "spans": [s.to_dict() for s in self.spans]}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        # One OTLP/JSON ExportTraceServiceRequest per trace
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "supply-chain-chatbot"}}]},
+                "scopeSpans": [{"scope": {"name": "teamX_v2"}, "spans": [s.to_otlp() for s in self.spans]}]
+            }]
+        }
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    trace = Trace(name, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException:
+        trace.root.status = "error"
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Open a child span of the current span. A no-op outside of a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(name, trace.trace_id, parent.span_id if parent else None, attributes)
+    trace.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = str(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        for listener in _span_listeners:
+            try:
+                listener(current)
+            except Exception as e:
+                logger.error(f"Span listener failed: {str(e)}")
+
+
+def traced(name: str):
+    """Decorator wrapping an async function in a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceExporter:
+    """
+    Hands finished traces, as OTLP/JSON, to the logging queue: the listener
+    thread set up by setup_logging() appends them to the size-rotated trace
+    file (TRACING["file"]), so exporting never blocks the event loop on disk.
+    """
+    def __init__(self):
+        self._logger = logging.getLogger("trace_export")
+
+    def export(self, trace: Trace):
+        try:
+            self._logger.info(f"Trace {trace.trace_id}", extra={"otlp": trace.to_otlp()})
+        except Exception as e:
+            logger.error(f"Failed to export trace {trace.trace_id}: {str(e)}")